@@ -58,4 +58,32 @@ flights_RE: Pattern[str] = re.compile(r"""
     (?P<blk>\d{4})\s+               #4 digits for RLS or BLK time.  
     (?P<turn>\d{4})\s+              #4 digits for BLK or TURN time.
     (?P<equipment>\w{3})            #3 digits for EQ
-    """, re.VERBOSE)
\ No newline at end of file
+    """, re.VERBOSE)
+
+# Same as trips_total_RE, but used to search a memory-mapped PBS file without decoding it
+trips_total_bytes_RE: Pattern[bytes] = re.compile(rb"""
+    trips:\s+
+    (?P<trips_total>\d{1,4})
+    """, re.VERBOSE | re.DOTALL)
+
+# *******************************************************************
+# FOLLOWING REGEX ARE USED TO RECOGNIZE SINGLE TOKENS (WHITESPACE SEPARATED WORDS)
+# WHEN READING PBS FILES ONE LINE AT A TIME, ALWAYS USE THEM WITH fullmatch
+# *******************************************************************
+trip_number_token_RE: Pattern[str] = re.compile(r'(?P<number>\d{4}).*')         # v.gr. 1234
+check_in_token_RE: Pattern[str] = re.compile(r'\d{2}:\d{2}')                      # v.gr. 05:30
+dated_token_RE: Pattern[str] = re.compile(r'\d{2}[A-Z]{3}\d{4}')                  # v.gr. 01MAY2019
+day_token_RE: Pattern[str] = re.compile(r'(?P<day>\d{2})(?P<month>[A-Z]{3})')     # v.gr. 01MAY
+four_digits_token_RE: Pattern[str] = re.compile(r'\d{4}')                         # v.gr. 0530
+flight_name_token_RE: Pattern[str] = re.compile(r'\w{4,6}')                       # v.gr. 0120, DH0403
+airport_token_RE: Pattern[str] = re.compile(r'[A-Z]{3}')                          # v.gr. MEX, JFK
+equipment_token_RE: Pattern[str] = re.compile(r'(?P<equipment>\w{3}).*')          # v.gr. 7S8
+layover_duration_token_RE: Pattern[str] = re.compile(r'\d{2,3}:\d{2}')            # v.gr. 26:30
+bl_token_RE: Pattern[str] = re.compile(r'(?P<bl>\d{4})BL')                        # v.gr. 0300BL
+crd_token_RE: Pattern[str] = re.compile(r'(?P<crd>[-\d]{4,5})CRD')                # v.gr. -0500CRD
+tl_token_RE: Pattern[str] = re.compile(r'(?P<tl>\d{4})TL')                        # v.gr. 0300TL
+dy_token_RE: Pattern[str] = re.compile(r'(?P<dy>\d{4})DY')                        # v.gr. 0530DY
+totals_tl_token_RE: Pattern[str] = re.compile(r'(?P<tl>\d{1,2}:\d{2})TL')         # v.gr. 10:10TL
+totals_bl_token_RE: Pattern[str] = re.compile(r'(?P<bl>\d{1,2}:\d{2})BL')         # v.gr. 5:10BL
+totals_cr_token_RE: Pattern[str] = re.compile(r'(?P<cr>\d{1,2}:\d{2})CR')         # v.gr. 5:00CR
+totals_tafb_token_RE: Pattern[str] = re.compile(r'(?P<tafb>\d{1,3}:\d{2})TAFB')   # v.gr. 54:40TAFB
@@ -0,0 +1,184 @@
+"""asyncio ingest pipeline: parse -> resolve references -> match flights -> persist
+
+Each stage is a coroutine fed by a bounded queue, so while a batch of trips is being parsed the
+previous ones are being resolved, matched and stored, and up to `persisters` trips are being written
+to Postgres at the same time from a single process.
+
+Built trips are never checked one at a time against the database, resolve asks for a whole batch at once.
+Trips whose airports, routes or equipments are not stored can't be built without asking the user,
+they are returned as unbuilt, as create_trips does, to be worked on later"""
+import asyncio
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Iterable, List
+
+try:
+    import psycopg
+    from psycopg_pool import PoolTimeout
+except ImportError:  # psycopg 3 is only needed by the asyncio ingest, see data.asyncdatabase
+    psycopg = PoolTimeout = None
+
+from AdminApp.exceptions import PreviouslyStoredTrip, UnsavedRoute
+from AdminApp.objectbuilders import TRIPS_PER_BATCH, references_of, flight_keys_of, try_build_trip, assemble_trip
+from data.asyncdatabase import AsyncDatabase
+from models.scheduleclasses import Airport, Route, Equipment, Flight, Trip
+
+# Put into a queue once there is nothing else to process
+DONE = None
+
+
+class IngestCounts(object):
+    """Running totals for a single ingest"""
+
+    def __init__(self):
+        self.read = 0
+        self.saved = 0
+        self.unbuilt_trips = list()
+
+
+def is_resolved(trip_dict: dict, iata_codes: set, route_keys: set, airplane_codes: set) -> bool:
+    """Whether all of trip_dict's airports, routes and equipments were loaded"""
+    if trip_dict['trip_base'] not in iata_codes:
+        return False
+    for duty_day_dict in trip_dict['duty_days']:
+        for flight_dict in duty_day_dict['flights']:
+            if flight_dict['origin'] not in iata_codes or flight_dict['destination'] not in iata_codes or \
+                    (flight_dict['name'][-4:], flight_dict['origin'], flight_dict['destination']) not in route_keys \
+                    or flight_dict['equipment'] not in airplane_codes:
+                return False
+    return True
+
+
+def collided(error: Exception) -> bool:
+    """Whether error was raised because the transaction collided with a concurrent one, so it may be retried
+
+    psycopg 3 derives neither SerializationFailure nor DeadlockDetected from TransactionRollback,
+    all of them are within SQLSTATE class 40 though"""
+    return isinstance(error, psycopg.Error) and (error.sqlstate or '').startswith('40')
+
+
+async def parse(trips_as_dict: Iterable[dict], batches: asyncio.Queue, batch_size: int, counts: IngestCounts):
+    """Read batch_size trips at a time, files are read in another thread so the other stages keep going"""
+    loop = asyncio.get_running_loop()
+    trips_as_dict = iter(trips_as_dict)
+    while True:
+        trips_batch = await loop.run_in_executor(None, partial(list, islice(trips_as_dict, batch_size)))
+        if not trips_batch:
+            break
+        counts.read += len(trips_batch)
+        await batches.put(trips_batch)
+    await batches.put(DONE)
+
+
+async def resolve(batches: asyncio.Queue, resolved: asyncio.Queue, counts: IngestCounts):
+    """Load each batch's airports, routes and equipments, dropping stored trips and those with unknown ones"""
+    while True:
+        trips_batch = await batches.get()
+        if trips_batch is DONE:
+            break
+        iata_codes, route_keys, airplane_codes = references_of(trips_batch)
+        trip_keys = {(trip_dict['number'], datetime.strptime(trip_dict['dated'], '%d%b%Y').date())
+                     for trip_dict in trips_batch}
+        airports, equipments, stored_keys = await asyncio.gather(Airport.load_many_async(iata_codes),
+                                                                 Equipment.load_many_async(airplane_codes),
+                                                                 Trip.fetch_stored_keys_async(trip_keys))
+        # Routes need their airports to be loaded
+        routes = await Route.load_many_async(route_keys)
+
+        iata_codes = {airport.iata_code for airport in airports}
+        route_keys = {(route.name, route.origin.iata_code, route.destination.iata_code) for route in routes}
+        airplane_codes = {equipment.airplane_code for equipment in equipments}
+        unstored_trips = list()
+        for trip_dict in trips_batch:
+            if (int(trip_dict['number']), datetime.strptime(trip_dict['dated'], '%d%b%Y').date()) in stored_keys:
+                print("Trip {0} dated {1} was already stored!".format(trip_dict['number'], trip_dict['dated']))
+            elif not is_resolved(trip_dict, iata_codes, route_keys, airplane_codes):
+                print("Trip {0} dated {1} unsaved! "
+                      "Unknown airport, route or equipment".format(trip_dict['number'], trip_dict['dated']))
+                counts.unbuilt_trips.append(trip_dict)
+            else:
+                unstored_trips.append(trip_dict)
+        await resolved.put((unstored_trips, routes))
+    await resolved.put(DONE)
+
+
+async def match(resolved: asyncio.Queue, built: asyncio.Queue, persisters: int, counts: IngestCounts):
+    """Fetch each batch's candidate flights at once and build its trips"""
+    loop = asyncio.get_running_loop()
+    while True:
+        resolved_batch = await resolved.get()
+        if resolved_batch is DONE:
+            break
+        trips_batch, routes = resolved_batch
+        flight_candidates = await Flight.fetch_all_matching_many_async(flight_keys_of(trips_batch, routes))
+        for trip_dict in trips_batch:
+            # Building is cpu bound, keep it out of the event loop
+            trip = await loop.run_in_executor(None, partial(try_build_trip, trip_dict=trip_dict, postpone=True,
+                                                            flight_candidates=flight_candidates,
+                                                            builder=assemble_trip))
+            if trip:
+                await built.put(trip)
+            else:
+                counts.unbuilt_trips.append(trip_dict)
+    for _ in range(persisters):
+        await built.put(DONE)
+
+
+async def persist(built: asyncio.Queue, counts: IngestCounts, attempts: int = 3):
+    """Store each trip within its own transaction, retrying when it collides with a concurrent one"""
+    while True:
+        trip = await built.get()
+        if trip is DONE:
+            break
+        for _ in range(attempts):
+            try:
+                await trip.save_to_db_async()
+            except PreviouslyStoredTrip:
+                print("Trip {0.number} dated {0.dated} was already stored!".format(trip))
+            except (psycopg.Error, PoolTimeout, UnsavedRoute) as e:
+                if collided(e):
+                    continue
+                print("Trip {0.number} dated {0.dated} unsaved! {1}".format(trip, e))
+            else:
+                print("Trip {0.number} dated {0.dated} saved!".format(trip))
+                counts.saved += 1
+            break
+        else:
+            print("Trip {0.number} dated {0.dated} unsaved! Too many concurrent transactions".format(trip))
+
+
+async def ingest(trips_as_dict: Iterable[dict], expected_trips: int = None, batch_size: int = TRIPS_PER_BATCH,
+                 queue_size: int = 2, persisters: int = 100) -> List[dict]:
+    """Same as create_trips with postpone, for an initialised AsyncDatabase
+
+    Up to queue_size batches wait between each stage and up to persisters trips are stored at once.
+    Returns the trip_dicts that could not be built"""
+    counts = IngestCounts()
+    batches = asyncio.Queue(maxsize=queue_size)
+    resolved = asyncio.Queue(maxsize=queue_size)
+    built = asyncio.Queue(maxsize=persisters)
+    await asyncio.gather(parse(trips_as_dict, batches, batch_size, counts),
+                         resolve(batches, resolved, counts),
+                         match(resolved, built, persisters, counts),
+                         *(persist(built, counts) for _ in range(persisters)))
+
+    if expected_trips is not None and expected_trips != counts.read:
+        print("Warning! {} trips should be processed but only {} were found".format(
+            expected_trips, counts.read
+        ))
+    print("{} json trips found ".format(counts.saved))
+    return counts.unbuilt_trips
+
+
+def create_trips_async(trips_as_dict: Iterable[dict], expected_trips: int = None, maxconn: int = 20,
+                       persisters: int = 100, **kwargs) -> List[dict]:
+    """Run ingest from synchronous code, connecting with kwargs as Database.initialise would"""
+    async def connect_and_ingest():
+        await AsyncDatabase.initialise(maxconn=maxconn, wait_timeout=120.0, **kwargs)
+        try:
+            return await ingest(trips_as_dict, expected_trips=expected_trips, persisters=persisters)
+        finally:
+            await AsyncDatabase.close_all_connections()
+
+    return asyncio.run(connect_and_ingest())
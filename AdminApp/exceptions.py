@@ -59,6 +59,12 @@ class UnsavedAirport(Exception):
         self.airport_iata_code = airport_iata_code
 
 
+class TripsTotalNotFound(Exception):
+    def __init__(self, file):
+        super().__init__("No 'Total number of trips' found in file {}".format(file))
+        self.file = file
+
+
 class UnstoredTrip(Exception):
     def __init__(self, trip_number, dated):
         super().__init__("Trip {} dated  {} not found in the Data Base"
@@ -67,3 +73,6 @@ class UnstoredTrip(Exception):
         self.dated = dated
 
 
+class SnapshotError(Exception):
+    """A snapshot file is damaged or was written by an unknown version"""
+    pass
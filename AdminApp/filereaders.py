@@ -1,6 +1,22 @@
 """This module holds functions needed to read pbs.txt files and turn them into schedule classes"""
-from typing import Dict, List
-from AdminApp.adminregex import page_number_RE, trips_total_RE, trip_RE, dutyday_RE, flights_RE
+import locale
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, List, Iterator, Iterable, Tuple
+from AdminApp.exceptions import TripsTotalNotFound
+from AdminApp.adminregex import page_number_RE, trips_total_RE, trip_RE, dutyday_RE, flights_RE, \
+    trips_total_bytes_RE, trip_number_token_RE, check_in_token_RE, dated_token_RE, day_token_RE, \
+    four_digits_token_RE, flight_name_token_RE, airport_token_RE, equipment_token_RE, layover_duration_token_RE, \
+    bl_token_RE, crd_token_RE, tl_token_RE, dy_token_RE, totals_tl_token_RE, totals_bl_token_RE, \
+    totals_cr_token_RE, totals_tafb_token_RE
+
+TRIP_BEGINS = '#'
+TRIP_ENDS = 'TAFB'
+# How many trips are sent at once to each worker process when parsing in parallel
+TRIPS_PER_CHUNK = 200
 
 
 def verify_files(data_folder: str, file_names: list) -> list:
@@ -41,20 +57,140 @@ def number_of_trips_in_pbs_file(pbs_file_content: str) -> int:
     return total_trips
 
 
+def pbs_lines(file: str, encoding: str = None) -> Iterator[str]:
+    """
+    Yield each line of a PBS file with its =======pagenumber======= strings already removed
+
+    The file is memory-mapped, so only the line being yielded is ever decoded and held in memory
+
+    """
+    encoding = encoding if encoding else locale.getpreferredencoding(False)
+    with open(file, 'rb') as f:
+        if not f.seek(0, 2):
+            # Empty files can't be memory-mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            for line in iter(content.readline, b''):
+                yield page_number_RE.sub(repl='', string=line.decode(encoding))
+
+
+def trip_blocks_from_file(file: str, encoding: str = None) -> Iterator[str]:
+    """
+    Yield, one at a time, each trip in a PBS file as a cleaned string
+
+    A trip block begins with the '#' before its number and ends with its TAFB legend, anything
+    in between blocks (headers, page legends) is dropped
+
+    """
+    block = []
+    for line in pbs_lines(file, encoding):
+        while line:
+            if not block:
+                trip_begins = line.find(TRIP_BEGINS)
+                if trip_begins < 0:
+                    break
+                line = line[trip_begins:]
+            trip_ends = line.find(TRIP_ENDS)
+            if trip_ends < 0:
+                block.append(line)
+                break
+            trip_ends += len(TRIP_ENDS)
+            block.append(line[:trip_ends])
+            yield ''.join(block)
+            block = []
+            line = line[trip_ends:]
+
+
+def trips_total_from_file(file: str) -> int:
+    """Same as number_of_trips_in_pbs_file, but searches the memory-mapped file instead of its content"""
+    total_trips = None
+    with open(file, 'rb') as f:
+        # Empty files can't be memory-mapped
+        if f.seek(0, 2):
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                match_obj = trips_total_bytes_RE.search(content)
+                if match_obj:
+                    total_trips = int(match_obj.groupdict()['trips_total'])
+    if total_trips is None:
+        raise TripsTotalNotFound(file)
+    return total_trips
+
+
+def trips_as_dict_from_file(file: str, crew_position: str, trip_base: str, encoding: str = None) -> Iterator[dict]:
+    """Stream each trip_as_dict found in a PBS file, peak memory is bound to the size of a single trip"""
+    for trip_as_dict in TripTokenizer(crew_position, trip_base).trips(pbs_lines(file, encoding)):
+        print_found_trip(trip_as_dict)
+        yield trip_as_dict
+
+
+def trips_as_dict_from_files(pbs_files: Iterable[Tuple[str, str, str]], max_workers: int = None,
+                             chunk_size: int = TRIPS_PER_CHUNK) -> List[List[dict]]:
+    """
+    Parse many PBS files at once using a pool of worker processes
+
+    pbs_files holds a (file, crew_position, trip_base) tuple for each file. Each file is split into
+    trip blocks, and blocks are sent in chunks to the workers. Results are merged back in their original
+    order, so the returned list holds, for each file, the same trips_as_dict the serial path would return
+
+    """
+    pbs_files = list(pbs_files)
+    max_workers = max_workers if max_workers else os.cpu_count() or 1
+    trips_per_file = [[] for _ in pbs_files]
+    pending = deque()
+
+    def collect_oldest_chunk():
+        file_index, parsed_chunk = pending.popleft()
+        for trip_as_dict in parsed_chunk.result():
+            print_found_trip(trip_as_dict)
+            trips_per_file[file_index].append(trip_as_dict)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Only a few chunks per worker are kept in flight, so memory stays bound
+        max_pending_chunks = 2 * max_workers
+        for file_index, (file, crew_position, trip_base) in enumerate(pbs_files):
+            trip_blocks = trip_blocks_from_file(file)
+            chunk = list(islice(trip_blocks, chunk_size))
+            while chunk:
+                pending.append((file_index, executor.submit(trips_as_dict_from_blocks, chunk,
+                                                            crew_position, trip_base)))
+                if len(pending) >= max_pending_chunks:
+                    collect_oldest_chunk()
+                chunk = list(islice(trip_blocks, chunk_size))
+        while pending:
+            collect_oldest_chunk()
+
+    return trips_per_file
+
+
+def trips_as_dict_from_blocks(trip_blocks: List[str], crew_position: str, trip_base: str) -> List[dict]:
+    """Turn a chunk of trip blocks into trip_as_dict, run within each worker process"""
+    return list(TripTokenizer(crew_position, trip_base).trips(trip_blocks))
+
+
 def create_trips_as_dict(trips_as_strings: str, crew_position: str, trip_base: str) -> list:
     """Return a list containing all trip_as_dict from its corresponding trip_string"""
 
     dict_trips = []
     for trip_match in trip_RE.finditer(trips_as_strings):
-        trip_as_dict = get_trip_as_dict(trip_match.groupdict())
-        trip_as_dict['crew_position'] = crew_position
-        trip_as_dict['trip_base'] = trip_base
+        trip_as_dict = trip_as_dict_from_match(trip_match, crew_position, trip_base)
+        print_found_trip(trip_as_dict)
         dict_trips.append(trip_as_dict)
-        print("Trip {} dated {} found!".format(trip_as_dict['number'], trip_as_dict['dated']))
 
     return dict_trips
 
 
+def trip_as_dict_from_match(trip_match, crew_position: str, trip_base: str) -> dict:
+    """Turn a trip_RE match into a trip_as_dict for the given crew_position and trip_base"""
+    trip_as_dict = get_trip_as_dict(trip_match.groupdict())
+    trip_as_dict['crew_position'] = crew_position
+    trip_as_dict['trip_base'] = trip_base
+    return trip_as_dict
+
+
+def print_found_trip(trip_as_dict: dict) -> None:
+    print("Trip {} dated {} found!".format(trip_as_dict['number'], trip_as_dict['dated']))
+
+
 def get_trip_as_dict(trip_dict: dict) -> dict:
     """
     Given a dictionary containing PBS trip data, turn it into a dictionary
@@ -88,3 +224,204 @@ def get_dutyday_as_dict(duty_day_dict: dict) -> dict:
     duty_day_dict['flights'] = dictionary_flights
 
     return duty_day_dict
+
+
+class TripTokenizer(object):
+    """
+    Single pass, line oriented, reader of PBS trips
+
+    Each line is split into tokens and every token moves a state machine forward, so lines are read
+    only once and no backtracking is ever needed, even over malformed pages. Each state is a method
+    receiving a token, when a token does not fit, the state hands it over to the next one.
+
+    Yields the same trip_as_dict that get_trip_as_dict and get_dutyday_as_dict build from the regex path
+    """
+
+    def __init__(self, crew_position: str, trip_base: str) -> None:
+        self.crew_position = crew_position
+        self.trip_base = trip_base
+        self.trip = None
+        self.duty_day = None
+        self.duty_day_tokens = []
+        self.state = self.seek_trip
+
+    def trips(self, lines: Iterable[str]) -> Iterator[dict]:
+        """Yield each trip_as_dict found within lines"""
+        for line in lines:
+            trip_begins = TRIP_BEGINS in line
+            if not trip_begins:
+                # Whole lines that can't change the state need not be read one token at a time
+                if self.state == self.seek_trip:
+                    continue
+                if self.state == self.duty_day_body and 'BL' not in line and 'TOTALS' not in line:
+                    self.duty_day_tokens.extend(line.split())
+                    continue
+            for token in line.split():
+                if trip_begins and token.startswith(TRIP_BEGINS):
+                    # A new trip always begins here, whatever was left of an unfinished one is dropped
+                    self.trip = None
+                    self.state = self.number
+                    token = token[len(TRIP_BEGINS):]
+                    if not token:
+                        continue
+                trip = self.state(token)
+                if trip:
+                    yield trip
+
+    def seek_trip(self, token: str) -> None:
+        pass
+
+    def number(self, token: str) -> None:
+        match = trip_number_token_RE.fullmatch(token)
+        if match:
+            self.trip = {'number': match.group('number')}
+            self.state = self.check_in
+        else:
+            self.state = self.seek_trip
+
+    def check_in(self, token: str) -> None:
+        """Ignore the 'CHECK IN AT' legend until a HH:MM check in time is found"""
+        if check_in_token_RE.fullmatch(token):
+            self.trip['check_in'] = token
+            self.state = self.dated
+
+    def dated(self, token: str) -> None:
+        if dated_token_RE.fullmatch(token):
+            self.trip['dated'] = token
+            self.trip['duty_days'] = []
+            self.state = self.duty_days
+        else:
+            self.state = self.check_in
+            self.state(token)
+
+    def duty_days(self, token: str) -> None:
+        """Between duty days, look for the DDMMM date of the next one or the trip's TOTALS"""
+        if token == 'TOTALS':
+            self.state = self.totals_tl
+        else:
+            match = day_token_RE.fullmatch(token)
+            if match:
+                self.duty_day = match.groupdict()
+                self.state = self.report
+
+    def report(self, token: str) -> None:
+        if four_digits_token_RE.fullmatch(token):
+            self.duty_day['report'] = token
+            self.duty_day_tokens = []
+            self.state = self.duty_day_body
+        else:
+            self.state = self.duty_days
+            self.state(token)
+
+    def duty_day_body(self, token: str) -> None:
+        """Gather all flights and layover tokens until the duty day's BL legend"""
+        match = bl_token_RE.fullmatch(token)
+        if match:
+            self.duty_day['bl'] = match.group('bl')
+            self.state = self.crd
+        elif token == 'TOTALS':
+            # Unfinished duty day, drop it
+            self.state = self.totals_tl
+        else:
+            self.duty_day_tokens.append(token)
+
+    def crd(self, token: str) -> None:
+        match = crd_token_RE.fullmatch(token)
+        if match:
+            self.duty_day['crd'] = match.group('crd')
+            self.state = self.tl
+        else:
+            self.state = self.duty_days
+            self.state(token)
+
+    def tl(self, token: str) -> None:
+        match = tl_token_RE.fullmatch(token)
+        if match:
+            self.duty_day['tl'] = match.group('tl')
+            self.state = self.dy
+        else:
+            self.state = self.duty_days
+            self.state(token)
+
+    def dy(self, token: str) -> None:
+        match = dy_token_RE.fullmatch(token)
+        if match:
+            self.duty_day['dy'] = match.group('dy')
+            self.close_duty_day()
+            self.state = self.duty_days
+        else:
+            self.state = self.duty_days
+            self.state(token)
+
+    def close_duty_day(self) -> None:
+        """Read the gathered flights and layover, and do the same formatting as get_dutyday_as_dict"""
+        tokens = self.duty_day_tokens
+        if len(tokens) >= 2 and airport_token_RE.fullmatch(tokens[-2]) and \
+                layover_duration_token_RE.fullmatch(tokens[-1]):
+            self.duty_day['layover_city'] = tokens[-2]
+            self.duty_day['layover_duration'] = tokens[-1]
+            tokens = tokens[:-2]
+        else:
+            self.duty_day['layover_city'] = None
+            self.duty_day['layover_duration'] = '0000'
+
+        flights = []
+        i = 0
+        while i + 8 <= len(tokens):
+            flight = self.read_flight(tokens[i:i + 8])
+            if flight:
+                flights.append(flight)
+                i += 8
+            else:
+                i += 1
+        if not flights:
+            # A duty day without flights can't be built
+            return
+
+        # The last flight in a duty_day must be re-arranged
+        self.duty_day['rls'] = flights[-1]['blk']
+        flights[-1]['blk'] = flights[-1]['turn']
+        flights[-1]['turn'] = '0000'
+        self.duty_day['flights'] = flights
+        self.trip['duty_days'].append(self.duty_day)
+
+    @staticmethod
+    def read_flight(tokens: List[str]) -> dict:
+        """tokens should be NAME ORG BEGIN DES END BLK TURN EQ, return them as a flight dict or None"""
+        name, origin, begin, destination, end, blk, turn, equipment = tokens
+        equipment_match = equipment_token_RE.fullmatch(equipment)
+        if (flight_name_token_RE.fullmatch(name) and airport_token_RE.fullmatch(origin) and
+                four_digits_token_RE.fullmatch(begin) and airport_token_RE.fullmatch(destination) and
+                four_digits_token_RE.fullmatch(end) and four_digits_token_RE.fullmatch(blk) and
+                four_digits_token_RE.fullmatch(turn) and equipment_match):
+            return {'name': name, 'origin': origin, 'begin': begin, 'destination': destination, 'end': end,
+                    'blk': blk, 'turn': turn, 'equipment': equipment_match.group('equipment')}
+
+    def totals_tl(self, token: str) -> None:
+        self.read_total(totals_tl_token_RE, 'tl', token, self.totals_bl)
+
+    def totals_bl(self, token: str) -> None:
+        self.read_total(totals_bl_token_RE, 'bl', token, self.totals_cr)
+
+    def totals_cr(self, token: str) -> None:
+        self.read_total(totals_cr_token_RE, 'cr', token, self.totals_tafb)
+
+    def totals_tafb(self, token: str) -> dict:
+        self.read_total(totals_tafb_token_RE, 'tafb', token, self.seek_trip)
+        if self.trip and 'tafb' in self.trip:
+            trip = self.trip
+            self.trip = None
+            trip['date_and_time'] = trip['dated'] + trip['check_in']
+            trip['crew_position'] = self.crew_position
+            trip['trip_base'] = self.trip_base
+            return trip
+
+    def read_total(self, total_RE, key: str, token: str, next_state) -> None:
+        match = total_RE.fullmatch(token)
+        if match:
+            self.trip[key] = match.group(key)
+            self.state = next_state
+        else:
+            # Malformed TOTALS, drop the trip
+            self.trip = None
+            self.state = self.seek_trip
@@ -1,8 +1,16 @@
 """This module contains functions that turn each dictionary into an object"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date
+from itertools import islice, repeat
+from typing import Iterable, Iterator, List, Tuple
+
 from AdminApp.exceptions import TripBlockError, UnbuiltTripError, DutyDayBlockError, UndefinedBlockTime, \
     PreviouslyStoredTrip, UnsavedRoute, UnstoredTrip, UnsavedAirport
 from models.scheduleclasses import Equipment, Route, Airport, Itinerary, Flight, DutyDay, Trip, Airline
 from models.timeclasses import DateTimeTracker
+from data.database import Database, UnitOfWork
+import psycopg2
+import psycopg2.extensions
 import pytz
 
 # Set up these variables that will be used thru out
@@ -10,6 +18,9 @@ airport = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City')
 route = Route(name='X', origin=airport, destination=airport, route_id=361)
 equipment = Equipment(airplane_code='789', cabin_members=9)
 
+# Number of trips whose airports, routes and equipments are loaded together
+TRIPS_PER_BATCH = 500
+
 
 def get_carrier_code(flight_dict: dict) -> str:
     carrier_code = 'AM'
@@ -18,6 +29,120 @@ def get_carrier_code(flight_dict: dict) -> str:
     return carrier_code
 
 
+def flight_key(carrier_code: str, route: Route, begin: datetime) -> tuple:
+    """Key under which flights fetched for a batch of trips are grouped"""
+    return carrier_code, route.route_id, begin.astimezone(pytz.utc).date()
+
+
+def duty_day_dates(trip_dict: dict) -> Iterator[date]:
+    """Yield the local date in which each duty_day_dict begins"""
+    dated = datetime.strptime(trip_dict['dated'], '%d%b%Y').date()
+    for duty_day_dict in trip_dict['duty_days']:
+        duty_day_date = datetime.strptime(duty_day_dict['day'] + duty_day_dict['month'] + str(dated.year),
+                                          '%d%b%Y').date()
+        if duty_day_date < dated:
+            # Trip continues into the next year
+            duty_day_date = duty_day_date.replace(year=dated.year + 1)
+        yield duty_day_date
+
+
+def references_of(trips_as_dict: List[dict]) -> Tuple[set, set, set]:
+    """Return the airports' iata_codes, route keys and airplane_codes used by trips_as_dict"""
+    iata_codes = set()
+    route_keys = set()
+    airplane_codes = set()
+    for trip_dict in trips_as_dict:
+        iata_codes.add(trip_dict['trip_base'])
+        for duty_day_dict in trip_dict['duty_days']:
+            for flight_dict in duty_day_dict['flights']:
+                iata_codes.update((flight_dict['origin'], flight_dict['destination']))
+                route_keys.add((flight_dict['name'][-4:], flight_dict['origin'], flight_dict['destination']))
+                airplane_codes.add(flight_dict['equipment'])
+    return iata_codes, route_keys, airplane_codes
+
+
+def flight_keys_of(trips_as_dict: List[dict], routes: List[Route]) -> set:
+    """Return the flight_keys any of the flights in trips_as_dict might be stored under
+
+    A flight's UTC date may differ from its duty day's local date, so each duty day's flights are
+    looked for from the day before until two days after it. Flights whose route is not within routes
+    are left out"""
+    routes = {(route.name, route.origin.iata_code, route.destination.iata_code): route for route in routes}
+    flight_keys = set()
+    for trip_dict in trips_as_dict:
+        for duty_day_dict, duty_day_date in zip(trip_dict['duty_days'], duty_day_dates(trip_dict)):
+            for flight_dict in duty_day_dict['flights']:
+                route = routes.get((flight_dict['name'][-4:], flight_dict['origin'], flight_dict['destination']))
+                if route:
+                    carrier_code = get_carrier_code(flight_dict=flight_dict)
+                    flight_keys.update((carrier_code, route, duty_day_date + timedelta(days=days))
+                                       for days in range(-1, 3))
+    return flight_keys
+
+
+def prefetch_references(trips_as_dict: List[dict]) -> dict:
+    """Load every airport, route, equipment and flight used by trips_as_dict with one query per table
+
+    Once loaded, build_trip finds airports, routes and equipments in memory instead of querying the
+    database for each flight. Returns a dict with the stored flights each flight_key might match"""
+    iata_codes, route_keys, airplane_codes = references_of(trips_as_dict)
+    Airport.load_many(iata_codes)
+    routes = Route.load_many(route_keys)
+    Equipment.load_many(airplane_codes)
+    return Flight.fetch_all_matching_many(flight_keys_of(trips_as_dict, routes))
+
+
+def prefetched_batches(trips_as_dict: Iterable[dict],
+                       batch_size: int = TRIPS_PER_BATCH) -> Iterator[Tuple[List[dict], dict]]:
+    """Yield batches of batch_size trip_dicts along the flight candidates fetched for them"""
+    trips_as_dict = iter(trips_as_dict)
+    while True:
+        trips_batch = list(islice(trips_as_dict, batch_size))
+        if not trips_batch:
+            break
+        yield trips_batch, prefetch_references(trips_batch)
+
+
+def save_trips(trips: List[Trip]) -> int:
+    """Store all trips within one transaction and return how many of them were saved
+
+    Trips are stored at once with Trip.save_many. Should that fail, each trip is stored on its own
+    within a savepoint, so a failing trip does not keep its neighbours from being stored"""
+    if not trips:
+        return 0
+    unsaved_trips = set()
+    with UnitOfWork() as unit_of_work:
+        try:
+            with unit_of_work.savepoint():
+                saved_trips = Trip.save_many(trips)
+        except (psycopg2.Error, UnsavedRoute) as e:
+            print("Unable to store trips at once: {}".format(e))
+            saved_trips = list()
+            for trip in trips:
+                new_flights = [flight for duty_day in trip.duty_days for flight in duty_day.events
+                               if not flight.event_id]
+                try:
+                    with unit_of_work.savepoint():
+                        trip.save_to_db()
+                except PreviouslyStoredTrip:
+                    pass
+                except (psycopg2.Error, UnsavedRoute) as e:
+                    for flight in new_flights:
+                        flight.event_id = None
+                    print("Trip {0.number} dated {0.dated} unsaved! {1}".format(trip, e))
+                    unsaved_trips.add(id(trip))
+                else:
+                    saved_trips.append(trip)
+
+    saved_trips = {id(trip) for trip in saved_trips}
+    for trip in trips:
+        if id(trip) in saved_trips:
+            print("Trip {0.number} dated {0.dated} saved!".format(trip))
+        elif id(trip) not in unsaved_trips:
+            print("Trip {0.number} dated {0.dated} was already stored!".format(trip))
+    return len(saved_trips)
+
+
 def build_airport(airport_iata_code: str) -> Airport:
     try:
         stored_airport = Airport.load_from_db(iata_code=airport_iata_code)
@@ -67,7 +192,8 @@ def build_itinerary(dt_tracker: DateTimeTracker, flight_dict: dict, suggested_bl
     return Itinerary.from_timedelta(begin=begin, a_timedelta=td)
 
 
-def build_flight(dt_tracker: DateTimeTracker, flight_dict: dict, postpone: bool, suggested_blk: str) -> Flight:
+def build_flight(dt_tracker: DateTimeTracker, flight_dict: dict, postpone: bool, suggested_blk: str,
+                 flight_candidates: dict = None) -> Flight:
     origin = build_airport(airport_iata_code=flight_dict['origin'])
     destination = build_airport(airport_iata_code=flight_dict['destination'])
     flight_route = build_route(flight_dict['name'][-4:], origin, destination)
@@ -75,10 +201,14 @@ def build_flight(dt_tracker: DateTimeTracker, flight_dict: dict, postpone: bool,
     flight_equipment = Equipment.load_from_db(airplane_code=flight_dict['equipment'])
     itinerary = build_itinerary(dt_tracker=dt_tracker, flight_dict=flight_dict, suggested_blk=suggested_blk)
 
-    # 1. Try loading the flight from the database
-    loaded_flights = Flight.fetch_all_matching(airline_iata_code=carrier_code,
-                                               scheduled_begin=itinerary._begin,
-                                               route=flight_route)
+    # 1. Try loading the flight from the candidates fetched for the whole batch, or else from the database
+    key = flight_key(carrier_code, flight_route, itinerary._begin)
+    if flight_candidates is not None and key in flight_candidates:
+        loaded_flights = flight_candidates[key]
+    else:
+        loaded_flights = Flight.fetch_all_matching(airline_iata_code=carrier_code,
+                                                   scheduled_begin=itinerary._begin,
+                                                   route=flight_route)
     flight = Flight(route=flight_route, scheduled_itinerary=itinerary, equipment=flight_equipment,
                     carrier=carrier_code)
 
@@ -182,7 +312,8 @@ def build_flight(dt_tracker: DateTimeTracker, flight_dict: dict, postpone: bool,
     #     dt_tracker.forward(str(flight.duration))
 
 
-def build_duty_day(dt_tracker: DateTimeTracker, duty_day_dict: dict, postpone: bool) -> DutyDay:
+def build_duty_day(dt_tracker: DateTimeTracker, duty_day_dict: dict, postpone: bool,
+                   flight_candidates: dict = None) -> DutyDay:
     """Given a duty_day_dict return it as DutyDay object"""
     dt_tracker.move('1:00')
     duty_day = DutyDay()
@@ -190,7 +321,7 @@ def build_duty_day(dt_tracker: DateTimeTracker, duty_day_dict: dict, postpone: b
     for flight_dict in duty_day_dict['flights']:
         try:
             flight = build_flight(dt_tracker=dt_tracker, flight_dict=flight_dict, postpone=postpone,
-                                  suggested_blk=duty_day_dict['crd'])
+                                  suggested_blk=duty_day_dict['crd'], flight_candidates=flight_candidates)
         except UndefinedBlockTime as e:
             print(80 * "*")
             print("FLT {} {} {} {} {} {} ".format(dt_tracker.date, e.flight_dict['name'],
@@ -217,82 +348,164 @@ def build_duty_day(dt_tracker: DateTimeTracker, duty_day_dict: dict, postpone: b
     return duty_day
 
 
-def build_trip(trip_dict: dict, postpone: bool) -> Trip:
+def build_trip(trip_dict: dict, postpone: bool, flight_candidates: dict = None) -> Trip:
     trip_base = Airport.load_from_db(trip_dict['trip_base'])
     dt_tracker = DateTimeTracker(trip_dict['date_and_time'], timezone=trip_base.timezone)
     try:
         trip = Trip.load_trip_info(trip_number=trip_dict['number'], dated=dt_tracker.date)
     except UnstoredTrip:
-        trip = Trip(number=trip_dict['number'], dated=dt_tracker.date,
-                    crew_position=trip_dict['crew_position'],
-                    trip_base=trip_base)
-        dt_tracker.change_to_timezone(pytz.utc)
-
-        for json_dd in trip_dict['duty_days']:
-            try:
-                duty_day = build_duty_day(dt_tracker, json_dd, postpone)
-                trip.append(duty_day)
-
-            except DutyDayBlockError as e:
-                print("For trip {0} dated {1}, ".format(trip_dict['number'], trip_dict['dated']), end=' ')
-                print("found inconsistent duty day : ")
-                print("       ", e.duty_day)
-                if postpone:
-                    e.delete_invalid_flights()
-                    raise UnbuiltTripError
-                else:
-                    print("... Correcting for inconsistent duty day: ")
-                    for flight in e.duty_day.events:
-                        print(flight)
-                        r = input("Is flight properly built? y/n ").capitalize()
-                        if 'N' in r:
-                            itinerary_string = input("Enter itinerary as string (date, begin, blk) 31052018 2206 0122 ")
-                            itinerary = Itinerary.from_string(itinerary_string)
-                            flight.scheduled_itinerary = itinerary
-                            flight.update_to_db()
-                    print("Corrected duty day")
-                    print(e.duty_day)
-                    trip.append(e.duty_day)
-
-        if int(str(trip.duration)) != int(trip_dict['tafb'].replace(':', '')):
-            print(trip_dict)
-            raise TripBlockError(trip_dict['tafb'], trip)
-
+        trip = assemble_trip(trip_dict=trip_dict, postpone=postpone, flight_candidates=flight_candidates)
     return trip
 
 
-def create_trips(trips_as_dict: list, postpone: bool = True) -> list:
-    # 2. Turn each trip_dict into a Trip object
-    built_trips_count: int = 0
-    unbuilt_trips = list()
-    for trip_dict in trips_as_dict:
+def assemble_trip(trip_dict: dict, postpone: bool, flight_candidates: dict = None) -> Trip:
+    """Turn trip_dict into a new Trip, without looking whether it has been stored before"""
+    trip_base = Airport.load_from_db(trip_dict['trip_base'])
+    dt_tracker = DateTimeTracker(trip_dict['date_and_time'], timezone=trip_base.timezone)
+    trip = Trip(number=trip_dict['number'], dated=dt_tracker.date,
+                crew_position=trip_dict['crew_position'],
+                trip_base=trip_base)
+    dt_tracker.change_to_timezone(pytz.utc)
+
+    for json_dd in trip_dict['duty_days']:
         try:
-            # if trip_dict['number'] == '6384':
-            #     print("found trip {}".format(trip_dict['number']))
-            trip = build_trip(trip_dict=trip_dict, postpone=postpone)
+            duty_day = build_duty_day(dt_tracker, json_dd, postpone, flight_candidates)
+            trip.append(duty_day)
+
+        except DutyDayBlockError as e:
+            print("For trip {0} dated {1}, ".format(trip_dict['number'], trip_dict['dated']), end=' ')
+            print("found inconsistent duty day : ")
+            print("       ", e.duty_day)
+            if postpone:
+                e.delete_invalid_flights()
+                raise UnbuiltTripError
+            else:
+                print("... Correcting for inconsistent duty day: ")
+                for flight in e.duty_day.events:
+                    print(flight)
+                    r = input("Is flight properly built? y/n ").capitalize()
+                    if 'N' in r:
+                        itinerary_string = input("Enter itinerary as string (date, begin, blk) 31052018 2206 0122 ")
+                        itinerary = Itinerary.from_string(itinerary_string)
+                        flight.scheduled_itinerary = itinerary
+                        flight.update_to_db()
+                print("Corrected duty day")
+                print(e.duty_day)
+                trip.append(e.duty_day)
+
+    if int(str(trip.duration)) != int(trip_dict['tafb'].replace(':', '')):
+        print(trip_dict)
+        raise TripBlockError(trip_dict['tafb'], trip)
 
-        except TripBlockError as e:
-            # TODO : Granted, there's a trip block error, what actions should be taken to correct it? (missing)
-            print("trip {0.number} dated {0.dated} {0.duration}"
-                  " does not match expected TAFB {1}".format(e.trip, e.expected_block_time))
-            print("Trip {0} dated {1} unsaved!".format(trip_dict['number'], trip_dict['dated']))
-            unbuilt_trips.append(trip_dict)
+    return trip
 
-        except UnbuiltTripError:
-            print("Trip {0} dated {1} unsaved!".format(trip_dict['number'], trip_dict['dated']))
-            unbuilt_trips.append(trip_dict)
 
-        else:
-            trip.astimezone('local')
-            # print(trip)
-            trip.astimezone(pytz.utc)
-            # print(trip)
-            try:
-                trip.save_to_db()
-                print("Trip {0.number} dated {0.dated} saved!".format(trip))
-                built_trips_count += 1
-            except PreviouslyStoredTrip:
-                print("Trip {0.number} dated {0.dated} was already stored!".format(trip))
+def try_build_trip(trip_dict: dict, postpone: bool, flight_candidates: dict = None, builder=build_trip) -> Trip:
+    """Return trip_dict as a Trip in the UTC timezone, or None if it could not be built
+
+    builder is build_trip, or assemble_trip whenever trip_dict is known not to be stored"""
+    try:
+        # if trip_dict['number'] == '6384':
+        #     print("found trip {}".format(trip_dict['number']))
+        trip = builder(trip_dict=trip_dict, postpone=postpone, flight_candidates=flight_candidates)
+
+    except TripBlockError as e:
+        # TODO : Granted, there's a trip block error, what actions should be taken to correct it? (missing)
+        print("trip {0.number} dated {0.dated} {0.duration}"
+              " does not match expected TAFB {1}".format(e.trip, e.expected_block_time))
+        print("Trip {0} dated {1} unsaved!".format(trip_dict['number'], trip_dict['dated']))
+        return None
+
+    except UnbuiltTripError:
+        print("Trip {0} dated {1} unsaved!".format(trip_dict['number'], trip_dict['dated']))
+        return None
+
+    trip.astimezone('local')
+    # print(trip)
+    trip.astimezone(pytz.utc)
+    # print(trip)
+    return trip
 
+
+def save_trip(trip: Trip, attempts: int = 3) -> bool:
+    """Store trip on its own and return whether it was saved
+
+    Concurrent workers saving trips that share new flights may deadlock each other, the trip is then
+    saved again up to attempts times"""
+    new_flights = [flight for duty_day in trip.duty_days for flight in duty_day.events if not flight.event_id]
+    for _ in range(attempts):
+        try:
+            trip.save_to_db()
+        except PreviouslyStoredTrip:
+            print("Trip {0.number} dated {0.dated} was already stored!".format(trip))
+            return False
+        except psycopg2.extensions.TransactionRollbackError:
+            for flight in new_flights:
+                flight.event_id = None
+        except (psycopg2.Error, UnsavedRoute) as e:
+            for flight in new_flights:
+                flight.event_id = None
+            print("Trip {0.number} dated {0.dated} unsaved! {1}".format(trip, e))
+            return False
+        else:
+            print("Trip {0.number} dated {0.dated} saved!".format(trip))
+            return True
+    print("Trip {0.number} dated {0.dated} unsaved! Too many concurrent transactions".format(trip))
+    return False
+
+
+def build_and_save_trip(trip_dict: dict, flight_candidates: dict) -> Tuple[bool, bool]:
+    """Build and store a single trip, return whether it was built and whether it was saved"""
+    trip = try_build_trip(trip_dict=trip_dict, postpone=True, flight_candidates=flight_candidates)
+    if not trip:
+        return False, False
+    return True, save_trip(trip)
+
+
+def create_trips(trips_as_dict: Iterable[dict], postpone: bool = True, expected_trips: int = None,
+                 workers: int = 1) -> list:
+    """Turn each trip_dict into a Trip object and store it
+
+    trips_as_dict may be any iterable, i.e. the generator returned by trips_as_dict_from_file, so trips
+    are consumed TRIPS_PER_BATCH at a time, loading all their airports, routes, equipments and flights at once
+    and storing the batch's trips with Trip.save_many.
+    If workers > 1 and trips are postponed, each trip in a batch is built and stored by one of up to workers
+    threads, no more than the pool's connections, so their round trips to the database overlap.
+    If expected_trips is given, warn whenever fewer trips were read"""
+    # 2. Turn each trip_dict into a Trip object
+    built_trips_count: int = 0
+    read_trips_count: int = 0
+    unbuilt_trips = list()
+    workers = min(workers, Database.max_connections()) if postpone else 1
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for trips_batch, flight_candidates in prefetched_batches(trips_as_dict):
+            read_trips_count += len(trips_batch)
+            if executor:
+                outcomes = executor.map(build_and_save_trip, trips_batch, repeat(flight_candidates))
+                for trip_dict, (built, saved) in zip(trips_batch, outcomes):
+                    if not built:
+                        unbuilt_trips.append(trip_dict)
+                    built_trips_count += saved
+                continue
+
+            built_trips = list()
+            for trip_dict in trips_batch:
+                trip = try_build_trip(trip_dict=trip_dict, postpone=postpone, flight_candidates=flight_candidates)
+                if trip:
+                    built_trips.append(trip)
+                else:
+                    unbuilt_trips.append(trip_dict)
+
+            # 3. Store the whole batch at once
+            built_trips_count += save_trips(built_trips)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if expected_trips is not None and expected_trips != read_trips_count:
+        print("Warning! {} trips should be processed but only {} were found".format(
+            expected_trips, read_trips_count
+        ))
     print("{} json trips found ".format(built_trips_count))
     return unbuilt_trips
@@ -0,0 +1,131 @@
+"""Export stored trips, duty days, flights and their credits to Parquet
+
+Each table is written as a dataset partitioned by month, base and position, i.e.
+
+    export/flights/month=2019-05/base=MEX/position=SOB/part-0-0.parquet
+
+Trips are read thru a server side cursor and written batch_size trips at a time, so memory stays bounded.
+The datasets may be queried with pyarrow, pandas or duckdb without the database, see open_dataset"""
+from datetime import date
+from pathlib import Path
+from typing import Iterable
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from data.database import ServerCursorFromConnectionPool
+from models.scheduleclasses import Trip, TRIP_GRAPH_SELECT, TRIP_GRAPH_ORDER
+
+TRIPS_PER_BATCH = 5000
+PARTITIONS = ['month', 'base', 'position']
+
+timestamp = pa.timestamp('s', tz='UTC')
+partition_fields = [pa.field('month', pa.string()), pa.field('base', pa.string()), pa.field('position', pa.string())]
+trip_fields = [pa.field('number', pa.string()), pa.field('dated', pa.date32())]
+SCHEMAS = {
+    'trips': pa.schema(trip_fields + [
+        pa.field('report', timestamp), pa.field('release', timestamp), pa.field('duty_days', pa.int16()),
+        pa.field('block', pa.int32()), pa.field('dh', pa.int32()), pa.field('daily', pa.int32()),
+        pa.field('tafb', pa.int32())] + partition_fields),
+    'duty_days': pa.schema(trip_fields + [
+        pa.field('duty_day', pa.int16()), pa.field('report', timestamp), pa.field('release', timestamp),
+        pa.field('block', pa.int32()), pa.field('dh', pa.int32()), pa.field('daily', pa.int32()),
+        pa.field('delay', pa.int32())] + partition_fields),
+    'flights': pa.schema(trip_fields + [
+        pa.field('duty_day', pa.int16()), pa.field('flight_id', pa.int64()), pa.field('carrier', pa.string()),
+        pa.field('route_id', pa.int64()), pa.field('name', pa.string()), pa.field('origin', pa.string()),
+        pa.field('destination', pa.string()), pa.field('scheduled_begin', timestamp),
+        pa.field('scheduled_block', pa.int32()), pa.field('actual_begin', timestamp),
+        pa.field('actual_block', pa.int32()), pa.field('equipment', pa.string()),
+        pa.field('dh_flight', pa.bool_())] + partition_fields),
+}
+
+
+class ExportBatch(object):
+    """Rows of each table for the trips added since the last write, kept column by column"""
+
+    def __init__(self):
+        self.trips = 0
+        self.columns = {table: {field.name: [] for field in schema} for table, schema in SCHEMAS.items()}
+
+    def add_row(self, table: str, **row):
+        columns = self.columns[table]
+        for name, value in row.items():
+            columns[name].append(value)
+
+    def add(self, trip: Trip):
+        """Trips without duty days have nothing to export and are not counted"""
+        if not trip.duty_days:
+            return
+        trip.compute_credits()
+        key = dict(number=trip.number, dated=trip.dated, month=trip.dated.strftime('%Y-%m'),
+                   base=trip.trip_base.iata_code, position=trip.crew_position)
+        self.trips += 1
+        self.add_row('trips', report=trip.report_minutes * 60, release=trip.release_minutes * 60,
+                     duty_days=len(trip.duty_days), block=trip._credits['block'].minutes,
+                     dh=trip._credits['dh'].minutes, daily=trip._credits['daily'].minutes,
+                     tafb=trip._credits['tafb'].minutes, **key)
+        for sequence, duty_day in enumerate(trip.duty_days):
+            self.add_row('duty_days', duty_day=sequence, report=duty_day.report_minutes * 60,
+                         release=duty_day.release_minutes * 60, block=duty_day._credits['block'].minutes,
+                         dh=duty_day._credits['dh'].minutes, daily=duty_day._credits['daily'].minutes,
+                         delay=duty_day.delay.minutes, **key)
+            for flight in duty_day.events:
+                scheduled = flight.scheduled_itinerary
+                actual = flight.actual_itinerary
+                self.add_row('flights', duty_day=sequence, flight_id=flight.event_id, carrier=flight.carrier,
+                             route_id=flight.route.route_id, name=flight.route.name,
+                             origin=flight.route.origin.iata_code, destination=flight.route.destination.iata_code,
+                             scheduled_begin=scheduled.begin_minutes * 60,
+                             scheduled_block=scheduled.end_minutes - scheduled.begin_minutes,
+                             actual_begin=actual.begin_minutes * 60 if actual else None,
+                             actual_block=actual.end_minutes - actual.begin_minutes if actual else None,
+                             equipment=flight.equipment.airplane_code if flight.equipment else None,
+                             dh_flight=bool(flight.dh), **key)
+
+    def write(self, root: Path, batch_number: int):
+        """Write one file per partition and table"""
+        for table, schema in SCHEMAS.items():
+            columns = self.columns[table]
+            if not columns['number']:
+                continue
+            record_batch = pa.RecordBatch.from_arrays([pa.array(columns[field.name], type=field.type)
+                                                       for field in schema], schema=schema)
+            pq.write_to_dataset(pa.Table.from_batches([record_batch]), root_path=str(root / table),
+                                partition_cols=PARTITIONS,
+                                basename_template='part-{}-{{i}}.parquet'.format(batch_number),
+                                existing_data_behavior='overwrite_or_ignore')
+
+
+def export_trips(trips: Iterable[Trip], root, batch_size: int = TRIPS_PER_BATCH) -> int:
+    """Write every trip, its duty days, flights and credits under root, returns how many trips were written"""
+    root = Path(root)
+    exported = 0
+    batch_number = 0
+    batch = ExportBatch()
+    for trip in trips:
+        batch.add(trip)
+        if batch.trips == batch_size:
+            batch.write(root, batch_number)
+            exported += batch.trips
+            batch_number += 1
+            batch = ExportBatch()
+    batch.write(root, batch_number)
+    return exported + batch.trips
+
+
+def export(root, begin: date, end: date, batch_size: int = TRIPS_PER_BATCH) -> int:
+    """Export all stored trips dated within [begin, end), returns how many were exported"""
+    with ServerCursorFromConnectionPool(itersize=batch_size * 20) as cursor:
+        cursor.execute(TRIP_GRAPH_SELECT +
+                       'WHERE trips.dated >= %s AND trips.dated < %s ' +
+                       TRIP_GRAPH_ORDER,
+                       (begin, end))
+        return export_trips(Trip.from_graph_rows(cursor), root, batch_size=batch_size)
+
+
+def open_dataset(root, table: str) -> ds.Dataset:
+    """An exported table, i.e. open_dataset('export', 'flights').to_table(filter=ds.field('base') == 'MEX')"""
+    return ds.dataset(str(Path(root) / table), format='parquet', partitioning='hive',
+                      schema=SCHEMAS[table])
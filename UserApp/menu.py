@@ -6,6 +6,7 @@ from models import creditator
 from models.scheduleclasses import CrewMember, Airport, Trip, Flight
 from models.timeclasses import DateTracker
 from models.txtRoster import RosterReader, Liner
+from UserApp.payroll import run_payroll
 
 summaryFile = "C:\\Users\\Xico\\Google Drive\\Sobrecargo\\Resumen de horas\\2019\\201905 - Resumen de horas.txt"
 #summaryFile = "C:\\Users\\Xico\\Google Drive\\Sobrecargo\\Resumen de horas\\2019\\Rol-2019-05-R.txt"
@@ -26,6 +27,7 @@ class Menu:
             "6": self.read_flights_summary,
             "7": self.retrieve_duties_from_data_base,
             "8": self.print_components,
+            "9": self.payroll,
             "10": self.quit}
 
     @staticmethod
@@ -41,6 +43,7 @@ class Menu:
         6. Cargar tu resumen de horas mensuales.
         7. Cargar tiempos por itinerario de la base de datos.
         8. Imprimir cada componente
+        9. Calcular la nómina de todos los roles en un directorio.
         10. Quit
         ''')
 
@@ -141,6 +144,11 @@ class Menu:
     def print_components(self):
         pass
 
+    def payroll(self):
+        """Credit every roster within a directory, using all cores"""
+        roster_directory = input("Directorio con los roles mensuales: ")
+        run_payroll(roster_directory)
+
     def quit(self):
         answer = input("¿Deseas guardar los cambios? S/N").upper()
         if answer[0] == 'S':
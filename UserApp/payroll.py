@@ -0,0 +1,112 @@
+"""Payroll for a whole directory of monthly roster .txt files
+
+Each roster is read, its line built and credited, as Menu.read_flights_summary and Menu.credits do,
+within a pool of worker processes, one roster at a time per worker, so throughput grows with the number of cores.
+Month credits for all rosters are written into a single payroll table. A roster that cannot be read or credited
+is reported and left out, all others are still paid
+
+    python -m UserApp.payroll <roster directory> [payroll.csv] [workers]
+
+No database is needed, so this module must not import UserApp.menu"""
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Tuple
+
+import pytz
+
+from models.creditator import Creditator
+from models.scheduleclasses import CrewMember, Airport, Line
+from models.timeclasses import Duration, DateTracker
+from models.txtRoster import RosterReader, Liner
+
+ROSTER_TIMEZONE = 'America/Mexico_City'
+CREW_MEMBER_COLUMNS = ('crew_member_id', 'name', 'position', 'crew_group', 'seniority')
+LINE_COLUMNS = ('block', 'dh', 'daily', 'night', 'xblock', 'xduty', 'maxirre', 'delay', 'pending_rest', 'xturn',
+                'sunday', '7day')
+PAYABLE_COLUMNS = ('xblock', 'xduty', 'night', 'maxirre', 'sunday', 'day7')
+PAYROLL_COLUMNS = ('file',) + CREW_MEMBER_COLUMNS + ('base', 'year', 'month') + LINE_COLUMNS + \
+                  tuple('payable_' + column for column in PAYABLE_COLUMNS)
+
+
+def line_from_roster(content: str, timezone: str = ROSTER_TIMEZONE) -> Line:
+    """The crew member's line, with flown itineraries, as found in a roster's content"""
+    roster_reader = RosterReader(content)
+    crew_member = CrewMember(**roster_reader.crew_stats)
+    crew_member.base = Airport(iata_code=crew_member.base, timezone=pytz.timezone(timezone))
+    date_tracker = DateTracker(roster_reader.year, roster_reader.month, roster_reader.carry_in)
+    liner = Liner(date_tracker=date_tracker, roster_days=roster_reader.roster_days, crew_member=crew_member,
+                  line_type='actual_itinerary')
+    liner.build_line()
+    line = liner.line
+    line.crew_member = crew_member
+    return line
+
+
+def as_cell(value) -> str:
+    """Durations are written as HH:MM"""
+    return format(value, ':') if isinstance(value, Duration) else str(value)
+
+
+def payroll_row(file: str, timezone: str = ROSTER_TIMEZONE) -> dict:
+    """Line and payable credits for a single roster file, run within each worker process"""
+    with open(file, 'r') as fp:
+        content = fp.read()
+    line = line_from_roster(content, timezone)
+    line.astimezone(pytz.timezone(timezone))
+    crew_member = line.crew_member
+    creditator = Creditator(crew_member.position, crew_member.crew_group, line.month)
+    line.compute_credits(creditator)
+    payable_credits = creditator.month_credits(line._credits)
+
+    row = {'file': Path(file).name, 'base': crew_member.base.iata_code, 'year': line.year, 'month': line.month}
+    row.update({column: getattr(crew_member, column) for column in CREW_MEMBER_COLUMNS})
+    row.update({column: line._credits[column] for column in LINE_COLUMNS})
+    row.update({'payable_' + column: payable_credits[column] for column in PAYABLE_COLUMNS})
+    return {column: as_cell(value) for column, value in row.items()}
+
+
+def run_payroll(roster_directory, payroll_file=None, max_workers: int = None,
+                timezone: str = ROSTER_TIMEZONE) -> Tuple[List[dict], List[Tuple[str, str]]]:
+    """Credit every roster .txt file within roster_directory and write all of them into payroll_file
+
+    Returns the payroll rows, sorted by file name, and a (file name, error) tuple for each roster left out.
+    payroll_file defaults to payroll.csv within roster_directory"""
+    roster_directory = Path(roster_directory)
+    payroll_file = Path(payroll_file) if payroll_file else roster_directory / 'payroll.csv'
+    files = sorted(roster_directory.glob('*.txt'))
+    max_workers = max_workers if max_workers else os.cpu_count() or 1
+    rows = dict()
+    failures = list()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        credited = {executor.submit(payroll_row, str(file), timezone): file for file in files}
+        for done, future in enumerate(as_completed(credited), start=1):
+            file = credited[future]
+            try:
+                rows[file] = future.result()
+            except Exception as error:
+                failures.append((file.name, '{}: {}'.format(type(error).__name__, error)))
+                print("{:>5}/{} {} FAILED {}".format(done, len(files), file.name, failures[-1][1]))
+            else:
+                print("{:>5}/{} {}".format(done, len(files), file.name))
+
+    rows = [rows[file] for file in files if file in rows]
+    with open(payroll_file, 'w', newline='') as fp:
+        writer = csv.DictWriter(fp, fieldnames=PAYROLL_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print("{} rosters paid into {}, {} left out".format(len(rows), payroll_file, len(failures)))
+    for file_name, error in sorted(failures):
+        print("    {} {}".format(file_name, error))
+    return rows, sorted(failures)
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    if not arguments:
+        print(__doc__)
+        sys.exit(1)
+    run_payroll(arguments[0], *arguments[1:2], *(int(workers) for workers in arguments[2:3]))
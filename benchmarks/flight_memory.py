@@ -0,0 +1,56 @@
+"""Measure how many bytes each Flight takes when a whole season is held in memory
+
+Every flight gets its own scheduled Itinerary, routes, airports and equipments are shared flyweights.
+Flights are grouped three per DutyDay, with their credits computed, as they are after crediting a month
+
+    python -m benchmarks.flight_memory [number_of_flights]
+"""
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytz
+
+from models.scheduleclasses import Airport, Route, Equipment, Itinerary, EpochItinerary, Flight, DutyDay
+
+
+def build_flights(number_of_flights: int, itinerary_class=Itinerary) -> list:
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    gdl = Airport(iata_code='GDL', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    routes = [Route(name='{:04d}'.format(number), origin=mex, destination=gdl, route_id=number + 1)
+              for number in range(100)]
+    equipment = Equipment(airplane_code='738', cabin_members=4)
+    begin = datetime(2019, 5, 1, 6, tzinfo=pytz.utc)
+
+    duty_days = []
+    duty_day = DutyDay()
+    for number in range(number_of_flights):
+        scheduled_begin = begin + timedelta(minutes=37 * number)
+        itinerary = itinerary_class.from_timedelta(begin=scheduled_begin, a_timedelta=timedelta(minutes=85))
+        flight = Flight(route=routes[number % 100], scheduled_itinerary=itinerary, equipment=equipment,
+                        carrier='AM', event_id=number)
+        flight.compute_credits()
+        duty_day.append(flight)
+        if len(duty_day.events) == 3:
+            duty_days.append(duty_day)
+            duty_day = DutyDay()
+    return duty_days
+
+
+def main(number_of_flights: int = 200000) -> None:
+    # Warm up the flyweights and any lazily created module state
+    build_flights(100)
+    for itinerary_class in (Itinerary, EpochItinerary):
+        tracemalloc.start()
+        duty_days = build_flights(number_of_flights, itinerary_class)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("{} flights in {} duty days, using {}".format(number_of_flights, len(duty_days),
+                                                           itinerary_class.__name__))
+        print("    total          : {:9.1f} MB".format(allocated / 2 ** 20))
+        print("    per flight     : {:9.0f} bytes".format(allocated / number_of_flights))
+        del duty_days
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
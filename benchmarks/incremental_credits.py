@@ -0,0 +1,45 @@
+"""Compare crediting a whole line again after each what-if delay, and keeping it credited with IncrementalLineCredits
+
+    python -m benchmarks.incremental_credits [number_of_changes]
+"""
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.line_credits import build_lines
+from models.creditator import Creditator, IncrementalLineCredits
+from models.scheduleclasses import EpochItinerary
+
+
+def delays(line, number_of_changes: int):
+    """Delay a single flight each time, cycling through all trips and duty days in the line"""
+    for change in range(number_of_changes):
+        trip = line.duties[change % len(line.duties)]
+        duty_day = trip.duty_days[change % len(trip.duty_days)]
+        flight = duty_day.events[-1]
+        flight.actual_itinerary = EpochItinerary.from_timedelta(flight.begin + timedelta(minutes=change % 90),
+                                                                timedelta(minutes=125 + change % 60))
+        yield trip, duty_day
+
+
+def main(number_of_changes: int = 2000) -> None:
+    creditator = Creditator(month_scope=5)
+    line = build_lines(1)[0]
+    start = time.perf_counter()
+    for _ in delays(line, number_of_changes):
+        creditator.credits_from_line(line)
+    print("{} changes".format(number_of_changes))
+    print("credits_from_line      {:8.3f} s".format(time.perf_counter() - start))
+    xblock = line._credits['xblock']
+
+    line = build_lines(1)[0]
+    start = time.perf_counter()
+    line_credits = IncrementalLineCredits(line, creditator)
+    for trip, duty_day in delays(line, number_of_changes):
+        line_credits.refresh(changed=[trip], duty_days=[duty_day])
+    print("IncrementalLineCredits {:8.3f} s".format(time.perf_counter() - start))
+    print("Same xblock: {}".format(xblock == line._credits['xblock']))
+
+
+if __name__ == '__main__':
+    main(*(int(argument) for argument in sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""Compare crediting a whole month of lines one by one with Creditator, and at once with BatchCreditator
+
+    python -m benchmarks.line_credits [number_of_lines]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from models.batchcreditator import BatchCreditator
+from models.creditator import Creditator
+from models.scheduleclasses import Airport, Route, EpochItinerary, Flight, DutyDay, Trip, Line
+
+
+def build_lines(number_of_lines: int) -> list:
+    """Lines of three day trips, two flights a day, one trip every five days"""
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    cun = Airport(iata_code='CUN', timezone=pytz.timezone('America/Cancun'), viaticum='low_cost')
+    outbound = Route(name='0530', origin=mex, destination=cun, route_id=9301)
+    inbound = Route(name='0531', origin=cun, destination=mex, route_id=9302)
+    lines = []
+    for number in range(number_of_lines):
+        line = Line(month='MAY', year='2019')
+        begin = datetime(2019, 5, 1, 12, tzinfo=pytz.utc) + timedelta(minutes=number % 600)
+        for trip_number in range(6):
+            trip = Trip(number='{:04d}'.format(trip_number), dated=begin.date(), crew_position='SOB', trip_base=mex)
+            for day in range(3):
+                duty_day = DutyDay()
+                for leg, route in enumerate((outbound, inbound)):
+                    itinerary = EpochItinerary.from_timedelta(begin + timedelta(days=day, hours=3 * leg),
+                                                              timedelta(minutes=125))
+                    duty_day.append(Flight(route=route, scheduled_itinerary=itinerary))
+                trip.append(duty_day)
+            trip.astimezone('local')
+            line.append(trip)
+            begin += timedelta(days=5)
+        lines.append(line)
+    return lines
+
+
+def main(number_of_lines: int = 2000) -> None:
+    lines = build_lines(number_of_lines)
+    print("{} lines, {} duty days".format(len(lines), sum(len(trip.duty_days) for line in lines for trip in line)))
+
+    start = time.perf_counter()
+    creditator = Creditator(month_scope=5)
+    for line in lines:
+        creditator.credits_from_line(line)
+    print("Creditator      {:8.3f} s".format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    credits = BatchCreditator(month_scope=5).credits_from_lines(lines)
+    print("BatchCreditator {:8.3f} s".format(time.perf_counter() - start))
+    print("Same xblock for every line: {}".format(
+        credits.column('xblock').tolist() == [line._credits['xblock'].minutes for line in lines]))
+
+
+if __name__ == '__main__':
+    main(*(int(argument) for argument in sys.argv[1:]))
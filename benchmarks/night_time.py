@@ -0,0 +1,52 @@
+"""Night time of a whole fleet's legs, flight by flight with Creditator and at once with night_minutes_array
+
+    python -m benchmarks.night_time [number_of_flights]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from models.creditator import Creditator
+from models.nighttime import local_minutes, night_minutes, night_minutes_array
+from models.scheduleclasses import Airport, Route, EpochItinerary, Flight
+
+
+def build_flights(number_of_flights: int) -> list:
+    """Legs from 45 minutes up to 16 hours, leaving every 7 minutes"""
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    nrt = Airport(iata_code='NRT', timezone=pytz.timezone('Asia/Tokyo'), viaticum='high_cost')
+    route = Route(name='0058', origin=mex, destination=nrt, route_id=9303)
+    begin = datetime(2019, 5, 1, tzinfo=pytz.utc)
+    flights = [Flight(route=route, scheduled_itinerary=EpochItinerary.from_timedelta(
+        begin + timedelta(minutes=7 * number), timedelta(minutes=45 + number % (15 * 60 + 15))))
+        for number in range(number_of_flights)]
+    for flight in flights:
+        flight.astimezone(pytz.timezone('America/Mexico_City'))
+    return flights
+
+
+def main(number_of_flights: int = 200000) -> None:
+    flights = build_flights(number_of_flights)
+    print("{} flights".format(len(flights)))
+
+    start = time.perf_counter()
+    by_flight = [Creditator.calculate_night_time(flight).minutes for flight in flights]
+    print("calculate_night_time  {:8.3f} s".format(time.perf_counter() - start))
+
+    begin = np.array([local_minutes(flight.begin) for flight in flights], dtype=np.int64)
+    end = np.array([local_minutes(flight.end) for flight in flights], dtype=np.int64)
+    start = time.perf_counter()
+    by_minutes = [night_minutes(b, e) for b, e in zip(begin.tolist(), end.tolist())]
+    print("night_minutes         {:8.3f} s".format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    at_once = night_minutes_array(begin, end)
+    print("night_minutes_array   {:8.3f} s".format(time.perf_counter() - start))
+    print("Same night time for every flight: {}".format(by_flight == by_minutes == at_once.tolist()))
+
+
+if __name__ == '__main__':
+    main(*(int(argument) for argument in sys.argv[1:]))
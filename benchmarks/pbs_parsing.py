@@ -0,0 +1,90 @@
+"""Benchmark the single pass TripTokenizer against the regex path when reading a large PBS file
+
+Also reads a small file where every TAFB legend got mangled by the PDF converter, as happens with
+malformed pages. There, trip_RE's lazy quantifiers backtrack over the whole remaining file for each trip
+
+    python -m benchmarks.pbs_parsing [number_of_trips] [number_of_malformed_trips]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from AdminApp.adminregex import trip_RE
+from AdminApp.filereaders import page_number_remover, trip_as_dict_from_match, pbs_lines, TripTokenizer
+
+trip_template = """
+# {number}                                                  CHECK IN AT 21:10
+01MAY2019
+DATE  RPT  FLIGHT DEPARTS  ARRIVES  RLS  BLK        TURN        EQ
+01MAY 2110 0402   MEX 2210 JFK 0320      0510       0100       7S8
+02MAY      0403   JFK 0420 MEX 0920 0950 0500                  7S8
+                     MEX 23:30                     1010BL 0000CRD 1010TL 1240DY
+03MAY 0920 0120   MEX 1020 GDL 1150      0130       0100       738
+03MAY      0121   GDL 1250 MEX 1420      0130       0100       738
+03MAY      DH0122 MEX 1520 MTY 1650 1720 0130                  738
+                                                   0300BL -0130CRD 0430TL 0800DY
+
+          TOTALS     14:40TL     13:10BL     1:30CR           44:10TAFB
+"""
+LINES_PER_PAGE = 60
+
+
+def write_synthetic_pbs_file(file: Path, number_of_trips: int, malformed: bool = False) -> None:
+    """Write number_of_trips into file, inserting a =====page===== legend every LINES_PER_PAGE lines"""
+    page = 1
+    lines_in_page = 0
+    template = trip_template.replace('TAFB', 'TAF B') if malformed else trip_template
+    with open(file, 'w') as f:
+        f.write("PBS TRIPS SOB MEX MAY 2019\n")
+        for trip_number in range(number_of_trips):
+            for line in template.format(number=1000 + trip_number % 9000).splitlines(keepends=True):
+                f.write(line)
+                lines_in_page += 1
+                if lines_in_page == LINES_PER_PAGE:
+                    f.write("{0}{1}{0}\n".format(37 * '=', page))
+                    page += 1
+                    lines_in_page = 0
+        f.write("Total number of trips:   {}\n".format(number_of_trips))
+
+
+def regex_path(file: Path) -> list:
+    content = page_number_remover(file)
+    return [trip_as_dict_from_match(trip_match, 'SOB', 'MEX') for trip_match in trip_RE.finditer(content)]
+
+
+def tokenizer_path(file: Path) -> list:
+    return list(TripTokenizer('SOB', 'MEX').trips(pbs_lines(file)))
+
+
+def timed(function, file: Path):
+    start = time.perf_counter()
+    result = function(file)
+    return result, time.perf_counter() - start
+
+
+def report(regex_time: float, tokenizer_time: float) -> None:
+    print("    regex path     : {:9.3f} s".format(regex_time))
+    print("    TripTokenizer  : {:9.3f} s".format(tokenizer_time))
+    print("    speedup        : {:9.1f} x".format(regex_time / tokenizer_time))
+
+
+def main(number_of_trips: int = 50000, number_of_malformed_trips: int = 12) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        file = Path(folder) / 'synthetic_pbs.txt'
+        write_synthetic_pbs_file(file, number_of_trips)
+        print("{} well formed trips, {:.1f} MB".format(number_of_trips, file.stat().st_size / 2 ** 20))
+        regex_trips, regex_time = timed(regex_path, file)
+        tokenizer_trips, tokenizer_time = timed(tokenizer_path, file)
+        assert regex_trips == tokenizer_trips, "TripTokenizer and regex path disagree"
+        report(regex_time, tokenizer_time)
+
+        write_synthetic_pbs_file(file, number_of_malformed_trips, malformed=True)
+        print("{} trips with a malformed TAFB legend".format(number_of_malformed_trips))
+        _, regex_time = timed(regex_path, file)
+        _, tokenizer_time = timed(tokenizer_path, file)
+        report(regex_time, tokenizer_time)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""asyncio counterpart of data.database, built on psycopg 3 instead of psycopg2
+
+Queries keep psycopg2's %s placeholders, so the same SQL runs on both layers"""
+try:
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # psycopg 3 is only needed by the asyncio ingest
+    make_conninfo = AsyncConnectionPool = None
+
+
+class AsyncDatabase:
+
+    __connection_pool = None
+
+    @staticmethod
+    async def initialise(minconn: int = 1, maxconn: int = 10, wait_timeout: float = 30.0, **kwargs):
+        """Open the connection pool, kwargs are the same psycopg2.connect receives
+
+        Coroutines wait up to wait_timeout seconds for a free connection, every connection is checked
+        before being handed out"""
+        if AsyncConnectionPool is None:
+            raise ImportError("psycopg 3 and psycopg_pool are needed for the asyncio database layer")
+        AsyncDatabase.__connection_pool = AsyncConnectionPool(make_conninfo(**kwargs),
+                                                              min_size=minconn, max_size=maxconn,
+                                                              timeout=wait_timeout, open=False,
+                                                              check=AsyncConnectionPool.check_connection)
+        await AsyncDatabase.__connection_pool.open(wait=True)
+
+    @staticmethod
+    async def get_connection():
+        return await AsyncDatabase.__connection_pool.getconn()
+
+    @staticmethod
+    async def return_connection(connection):
+        await AsyncDatabase.__connection_pool.putconn(connection)
+
+    @staticmethod
+    async def close_all_connections():
+        await AsyncDatabase.__connection_pool.close()
+
+    @staticmethod
+    def max_connections() -> int:
+        return AsyncDatabase.__connection_pool.max_size
+
+    @staticmethod
+    def pool_stats() -> dict:
+        return AsyncDatabase.__connection_pool.get_stats()
+
+
+class AsyncCursorFromConnectionPool:
+    """Same as CursorFromConnectionPool, to be used as
+
+        async with AsyncCursorFromConnectionPool() as cursor:
+            await cursor.execute(...)
+    """
+    def __init__(self):
+        self.conn = None
+        self.cursor = None
+
+    async def __aenter__(self):
+        self.conn = await AsyncDatabase.get_connection()
+        self.cursor = self.conn.cursor()
+        return self.cursor
+
+    async def __aexit__(self, exception_type, exception_value, exception_traceback):
+        try:
+            if exception_value:
+                await self.conn.rollback()
+            else:
+                await self.cursor.close()
+                await self.conn.commit()
+        finally:
+            await AsyncDatabase.return_connection(self.conn)
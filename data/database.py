@@ -1,41 +1,226 @@
-from psycopg2 import pool
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count
+
+from psycopg2 import pool, OperationalError, InterfaceError
+
+
+class PoolTimeout(pool.PoolError):
+    """No pooled connection was returned within the wait timeout"""
+    pass
 
 
 class Database:
 
     __connection_pool = None
+    __available_connections = None
+    __wait_timeout = None
+    __health_check = False
+    __maxconn = 0
+    __stats_lock = threading.Lock()
+    __stats = dict()
 
     @staticmethod
-    def initialise(**kwargs):
-        Database.__connection_pool = pool.SimpleConnectionPool(1, 10, **kwargs)
+    def initialise(minconn: int = 1, maxconn: int = 10, threaded: bool = True, wait_timeout: float = None,
+                   health_check: bool = False, **kwargs):
+        """Create the connection pool, kwargs are passed on to psycopg2.connect
+
+        A threaded pool may be shared by many threads, when all maxconn connections are checked out
+        get_connection waits up to wait_timeout seconds, forever if None, for one to be returned.
+        Closed connections are always replaced before being handed out. If health_check, every connection
+        is also tested with a query, which costs a round trip per checkout"""
+        pool_class = pool.ThreadedConnectionPool if threaded else pool.SimpleConnectionPool
+        Database.__connection_pool = pool_class(minconn, maxconn, **kwargs)
+        Database.__available_connections = threading.BoundedSemaphore(maxconn)
+        Database.__wait_timeout = wait_timeout
+        Database.__health_check = health_check
+        Database.__maxconn = maxconn
+        Database.reset_pool_stats()
 
     @staticmethod
     def get_connection():
-        return Database.__connection_pool.getconn()
+        started = time.perf_counter()
+        if not Database.__available_connections.acquire(timeout=Database.__wait_timeout):
+            Database.__record(timeouts=1)
+            raise PoolTimeout("No connection available after {} seconds".format(Database.__wait_timeout))
+        waited = time.perf_counter() - started
+        try:
+            connection = Database.__connection_pool.getconn()
+            while not Database.is_healthy(connection, ping=Database.__health_check):
+                Database.__record(discarded=1)
+                Database.__connection_pool.putconn(connection, close=True)
+                connection = Database.__connection_pool.getconn()
+        except Exception:
+            Database.__available_connections.release()
+            raise
+        Database.__record(checkouts=1, waited=waited)
+        return connection
+
+    @staticmethod
+    def is_healthy(connection, ping: bool = True) -> bool:
+        """Whether connection is still open and, if ping, answers"""
+        if connection.closed:
+            return False
+        if not ping:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1;')
+            connection.rollback()
+        except (OperationalError, InterfaceError):
+            return False
+        return True
 
     @staticmethod
     def return_connection(connection):
         Database.__connection_pool.putconn(connection)
+        Database.__available_connections.release()
 
     @staticmethod
     def close_all_connections():
         Database.__connection_pool.closeall()
 
+    @staticmethod
+    def max_connections() -> int:
+        return Database.__maxconn
+
+    @staticmethod
+    def __record(checkouts=0, waited=0.0, timeouts=0, discarded=0):
+        with Database.__stats_lock:
+            stats = Database.__stats
+            stats['checkouts'] += checkouts
+            stats['timeouts'] += timeouts
+            stats['discarded'] += discarded
+            stats['total_wait'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+
+    @staticmethod
+    def reset_pool_stats():
+        with Database.__stats_lock:
+            Database.__stats = dict(checkouts=0, timeouts=0, discarded=0, total_wait=0.0, max_wait=0.0)
+
+    @staticmethod
+    def pool_stats() -> dict:
+        """How many connections were checked out, how long they were waited for, how many waits timed out
+        and how many broken connections were discarded"""
+        with Database.__stats_lock:
+            stats = dict(Database.__stats)
+        stats['mean_wait'] = stats['total_wait'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+
+class UnitOfWork:
+    """Holds one pooled connection and one transaction for everything done within it
+
+    While a UnitOfWork is open, every CursorFromConnectionPool in the same thread uses its connection
+    and leaves committing to it. The transaction is committed when the outermost UnitOfWork exits,
+    or rolled back if it exits with an exception. Nested UnitOfWorks join the outermost one.
+
+        with UnitOfWork() as unit_of_work:
+            for trip in trips:
+                with unit_of_work.savepoint():
+                    trip.save_to_db()
+    """
+
+    _local = threading.local()
+    _savepoint_numbers = count()
+
+    def __init__(self):
+        self.conn = None
+        self.outermost = False
+
+    @classmethod
+    def current(cls):
+        """The UnitOfWork open in this thread, if any"""
+        return getattr(cls._local, 'unit_of_work', None)
+
+    def __enter__(self):
+        current = UnitOfWork.current()
+        if current:
+            self.conn = current.conn
+        else:
+            self.conn = Database.get_connection()
+            self.outermost = True
+            UnitOfWork._local.unit_of_work = self
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        if self.outermost:
+            try:
+                if exception_value:
+                    self.conn.rollback()
+                else:
+                    self.conn.commit()
+            finally:
+                UnitOfWork._local.unit_of_work = None
+                Database.return_connection(self.conn)
+
+    @contextmanager
+    def savepoint(self):
+        """Undo only what was done within this block if it raises an exception, the exception is re-raised"""
+        name = 'savepoint_{}'.format(next(UnitOfWork._savepoint_numbers))
+        with self.conn.cursor() as cursor:
+            cursor.execute('SAVEPOINT {};'.format(name))
+        try:
+            yield self
+        except Exception:
+            with self.conn.cursor() as cursor:
+                cursor.execute('ROLLBACK TO SAVEPOINT {};'.format(name))
+            raise
+        else:
+            with self.conn.cursor() as cursor:
+                cursor.execute('RELEASE SAVEPOINT {};'.format(name))
+
 
 class CursorFromConnectionPool:
     def __init__(self):
         self.conn = None
         self.cursor = None
+        self.unit_of_work = None
 
     def __enter__(self):
-        self.conn = Database.get_connection()
-        self.cursor = self.conn.cursor()
+        self.unit_of_work = UnitOfWork.current()
+        if self.unit_of_work:
+            # Committing or rolling back is up to the UnitOfWork
+            self.conn = self.unit_of_work.conn
+        else:
+            self.conn = Database.get_connection()
+        self.cursor = self.new_cursor()
         return self.cursor
 
+    def new_cursor(self):
+        return self.conn.cursor()
+
     def __exit__(self, exception_type, exception_value, exception_traceback):
+        if self.unit_of_work:
+            self.cursor.close()
+            return
         if exception_value:  # This is equivalent to `if exception_value is not None`
             self.conn.rollback()
         else:
             self.cursor.close()
             self.conn.commit()
         Database.return_connection(self.conn)
+
+
+class ServerCursorFromConnectionPool(CursorFromConnectionPool):
+    """Same as CursorFromConnectionPool, but the query's rows stay in the server until they are iterated over,
+    itersize rows at a time, so memory stays bounded however many rows there are
+
+        with ServerCursorFromConnectionPool() as cursor:
+            cursor.execute(...)
+            for row in cursor:
+                ...
+    """
+
+    _names = count()
+
+    def __init__(self, itersize: int = 2000):
+        super().__init__()
+        self.itersize = itersize
+
+    def new_cursor(self):
+        cursor = self.conn.cursor(name='server_cursor_{}'.format(next(ServerCursorFromConnectionPool._names)))
+        cursor.itersize = self.itersize
+        return cursor
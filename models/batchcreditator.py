@@ -0,0 +1,253 @@
+"""Month credits of many crew lines at once, computed with NumPy
+
+All lines are flattened into one row per event and one row per duty day, times as minutes from the epoch.
+Wall clock minutes, read in whichever timezone each datetime is displayed, are kept alongside,
+since night time, months, dates and sundays are figured from what the crew member's clock says.
+Credits are then those of Creditator.credits_from_line, without building a CreditsDict per duty day
+
+    credits = BatchCreditator(month_scope=5).credits_from_lines(lines)
+    credits[0]['xblock'], credits.column('night')
+"""
+from numbers import Integral
+
+import numpy as np
+
+from models.creditator import Creditator, CreditsDict, DutyType, TRANSOCEANIC, MINIMUM_BLOCK, MINIMUM_DUTY, \
+    WORKED_DAY, MAX_TURN_TIME, RECESO_CONTINENTAL, line_credits_header, line_credits_template
+from models.nighttime import DAY, EARLY_MORNING_BEGIN, EARLY_MORNING_END, local_minutes, night_minutes_array
+from models.scheduleclasses import Flight, DutyDay, Trip
+from models.timeclasses import Duration
+
+# Days from the epoch, a thursday, to the first sunday
+SUNDAY = 3
+
+DURATION_FIELDS = ('block', 'dh', 'daily', 'night', 'xblock', 'xduty', 'maxirre', 'delay', 'pending_rest', 'xturn')
+FIELDS = DURATION_FIELDS + ('sunday', '7day')
+
+
+def positive(minutes: np.ndarray) -> np.ndarray:
+    """As Duration does, negative minutes are taken as 0"""
+    return np.maximum(minutes, 0)
+
+
+def sums(groups: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Sum of values for each group in range(size)"""
+    return np.rint(np.bincount(groups, weights=values, minlength=size)).astype(np.int64)
+
+
+def months(minutes: np.ndarray) -> np.ndarray:
+    """Month number, 1 to 12, of each wall clock minute"""
+    return (minutes // DAY).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+
+def sundays_between(first_day: np.ndarray, last_day: np.ndarray) -> np.ndarray:
+    """How many sundays are there within [first_day, last_day], days counted from the epoch"""
+    return positive((last_day - SUNDAY) // 7 - (first_day - 1 - SUNDAY) // 7)
+
+
+def is_a_non_worked_sunday(release: np.ndarray) -> np.ndarray:
+    """A release on sunday, early enough for the sunday not to be worked"""
+    return ((release // DAY) % 7 == SUNDAY) & (release % DAY <= WORKED_DAY.minutes)
+
+
+class FlatLines(object):
+    """Every line's duties flattened into NumPy arrays
+
+    Duties are trips and duty days, any other duty does not earn credits and is left out.
+    Events point to their duty day, duty days to their duty and duties to their line"""
+
+    def __init__(self, lines):
+        self.lines = len(lines)
+        # One row per event
+        events = ([], [], [], [], [], [], [], [])
+        ev_duty_day, ev_begin, ev_end, ev_begin_wall, ev_end_wall, ev_flight, ev_dh, ev_transoceanic = events
+        # One row per duty day
+        duty_days = ([], [], [], [], [], [])
+        dd_duty, dd_report, dd_release, dd_report_wall, dd_release_wall, dd_transoceanic = duty_days
+        # One row per duty
+        duty_rows = ([], [], [])
+        duty_line, duty_is_trip, duty_first_day = duty_rows
+
+        for line_index, line in enumerate(lines):
+            for duty in line.duties:
+                if isinstance(duty, Trip):
+                    duty_days_in_duty = duty.duty_days
+                elif isinstance(duty, DutyDay):
+                    duty_days_in_duty = [duty]
+                else:
+                    continue
+                duty_line.append(line_index)
+                duty_is_trip.append(isinstance(duty, Trip))
+                duty_first_day.append(len(dd_duty))
+                for duty_day in duty_days_in_duty:
+                    duty_day_index = len(dd_duty)
+                    dd_duty.append(len(duty_line) - 1)
+                    dd_report.append(duty_day.report_minutes)
+                    dd_release.append(duty_day.release_minutes)
+                    dd_report_wall.append(local_minutes(duty_day.report))
+                    dd_release_wall.append(local_minutes(duty_day.release))
+                    dd_transoceanic.append(duty_day.origin.iata_code in TRANSOCEANIC)
+                    for event in duty_day.events:
+                        ev_duty_day.append(duty_day_index)
+                        ev_begin.append(event.begin_minutes)
+                        ev_end.append(event.end_minutes)
+                        ev_begin_wall.append(local_minutes(event.begin))
+                        ev_end_wall.append(local_minutes(event.end))
+                        ev_flight.append(isinstance(event, Flight))
+                        ev_dh.append(bool(getattr(event, 'dh', False)))
+                        ev_transoceanic.append(event.route.destination.iata_code in TRANSOCEANIC)
+
+        (self.ev_duty_day, self.ev_begin, self.ev_end, self.ev_begin_wall, self.ev_end_wall) = \
+            (np.array(column, dtype=np.int64) for column in events[:5])
+        self.ev_flight, self.ev_dh, self.ev_transoceanic = (np.array(column, dtype=bool) for column in events[5:])
+        (self.dd_duty, self.dd_report, self.dd_release, self.dd_report_wall, self.dd_release_wall) = \
+            (np.array(column, dtype=np.int64) for column in duty_days[:5])
+        self.dd_transoceanic = np.array(dd_transoceanic, dtype=bool)
+        self.duty_line = np.array(duty_line, dtype=np.int64)
+        self.duty_is_trip = np.array(duty_is_trip, dtype=bool)
+        self.duty_first_day = np.array(duty_first_day, dtype=np.int64)
+
+
+class LineCredits(object):
+    """Credits for each line, one row per line and one column per field in FIELDS
+
+    Each row reads as the line._credits Creditator.credits_from_line leaves behind"""
+
+    def __init__(self, totals: np.ndarray):
+        self.totals = totals
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def column(self, field: str) -> np.ndarray:
+        return self.totals[:, FIELDS.index(field)]
+
+    def __getitem__(self, index: int) -> CreditsDict:
+        credits = CreditsDict({'day': '', 'routing': 'TOTALS', 'report': '', 'release': '', 'duty_type': '',
+                               'event_names': ''})
+        for field, value in zip(FIELDS, self.totals[index].tolist()):
+            credits[field] = Duration(value) if field in DURATION_FIELDS else value
+        credits['header'] = line_credits_header
+        credits['template'] = line_credits_template
+        return credits
+
+
+class BatchCreditator(Creditator):
+    """Same credits as Creditator.credits_from_line, for many lines at once"""
+
+    def credits_from_lines(self, lines) -> LineCredits:
+        flat = FlatLines(list(lines))
+        duty_day_credits = self.duty_day_credits(flat)
+        return LineCredits(self.line_totals(flat, duty_day_credits))
+
+    def duty_day_credits(self, flat: FlatLines) -> dict:
+        """Credits of each duty day, as Creditator.credits_from_duty_day finds them, minutes as int"""
+        size = len(flat.dd_duty)
+        duty_day = flat.ev_duty_day
+        duration = positive(flat.ev_end - flat.ev_begin)
+        flown = flat.ev_flight & ~flat.ev_dh
+
+        credits = dict()
+        credits['block'] = block = sums(duty_day, duration * flown, size)
+        credits['dh'] = dh = sums(duty_day, duration * (flat.ev_flight & flat.ev_dh), size)
+        credits['night'] = sums(duty_day, BatchCreditator.night_minutes(flat.ev_begin_wall, flat.ev_end_wall) * flown,
+                                size)
+        credits['daily'] = daily = positive(flat.dd_release - flat.dd_report)
+        first_event = np.searchsorted(duty_day, np.arange(size))
+        credits['delay'] = positive(flat.ev_begin[first_event] - flat.dd_report - 60)
+
+        # Turns between consecutive events within the same duty day
+        same_duty_day = duty_day[1:] == duty_day[:-1]
+        turns = positive(flat.ev_begin[1:] - flat.ev_end[:-1] - MAX_TURN_TIME.minutes) * same_duty_day
+        credits['xturn'] = sums(duty_day[1:], turns, size)
+
+        # Classify each duty day as Creditator.duty_day_classifier does
+        transoceanic = flat.dd_transoceanic | (sums(duty_day, flat.ev_transoceanic, size) > 0)
+        special = transoceanic & ((block + dh > MINIMUM_BLOCK.minutes) | (daily > MINIMUM_DUTY.minutes))
+        last_event = np.append(first_event[1:], len(duty_day)) - 1
+        begin = flat.ev_begin_wall[first_event] % DAY
+        end = flat.ev_end_wall[last_event] % DAY
+        early_morning = ((EARLY_MORNING_BEGIN < begin) & (begin < EARLY_MORNING_END)) | \
+                        ((EARLY_MORNING_BEGIN < end) & (end < EARLY_MORNING_END))
+        long_haul = ~transoceanic & (sums(duty_day, np.ones_like(duty_day), size) <= 2) & \
+            (sums(duty_day, duration > 4 * 60 + 30, size) > 0) & \
+            ((block > 10 * 60) | (daily > 12 * 60) | ((daily > 9 * 60 + 30) & early_morning))
+        credits['duty_type'] = duty_type = np.select(
+            [special, transoceanic, long_haul],
+            [DutyType.SPECIAL_TRANS, DutyType.TRANSOCEANIC, DutyType.LONG_HAUL], DutyType.REGULAR)
+
+        # Limits for each duty type, indexed by duty_type
+        ordinary_block, ordinary_duty, maximum_duty = (
+            np.array([limit.minutes for limit in table])
+            for table in (self.rules.ordinary_block, self.rules.ordinary_duty, self.rules.maximum_duty))
+        credits['xblock'] = positive(block - ordinary_block[duty_type])
+        credits['maxirre'] = maxirre = positive(daily - maximum_duty[duty_type])
+        # If there is a maxirre, normal xduty time ends where maxirre starts
+        credits['xduty'] = np.where(maxirre > 0, 5 * 60, positive(daily - ordinary_duty[duty_type]))
+        credits['sunday'] = -is_a_non_worked_sunday(flat.dd_release_wall).astype(np.int64)
+        return credits
+
+    @staticmethod
+    def night_minutes(begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Night time within each [begin, end), wall clock minutes, as Creditator.calculate_night_time finds it"""
+        return night_minutes_array(begin, end)
+
+    def line_totals(self, flat: FlatLines, credits: dict) -> np.ndarray:
+        """Add up duty day credits into each line, as credits_from_trip and credits_from_line do"""
+        duty = flat.dd_duty
+        size = len(flat.duty_line)
+        is_trip = flat.duty_is_trip[duty]
+        first_day = flat.duty_first_day
+        last_day = np.append(first_day[1:], len(duty)) - 1
+
+        # Trips only credit their duty days beginning within month_scope, lone duty days are always credited
+        if isinstance(self.month_scope, Integral):
+            first_event = np.searchsorted(flat.ev_duty_day, np.arange(len(duty)))
+            in_scope = months(flat.ev_begin_wall[first_event]) == self.month_scope
+        else:
+            in_scope = np.zeros(len(duty), dtype=bool)
+        credited = ~is_trip | in_scope
+        duty_credited = sums(duty, credited, size) > 0
+
+        # Pending rest, for any rest under 12 hours after a duty day within month_scope
+        rest = positive(np.append(flat.dd_report[1:], 0) - flat.dd_release)
+        has_rest = is_trip & (np.arange(len(duty)) != last_day[duty])
+        pending_rest = np.where(has_rest & in_scope & (rest < RECESO_CONTINENTAL.minutes),
+                                RECESO_CONTINENTAL.minutes - rest, 0)
+
+        # A trip's sundays are those of its elapsed dates, its second to last duty day tells whether the last one
+        # was worked
+        report_day = flat.dd_report_wall[first_day] // DAY
+        release_day = flat.dd_release_wall[last_day] // DAY
+        telling_day = np.where(last_day > first_day, last_day - 1, first_day)
+        trip_sunday = sundays_between(report_day, release_day) - \
+            is_a_non_worked_sunday(flat.dd_release_wall[telling_day])
+        duty_sunday = np.where(flat.duty_is_trip, trip_sunday, credits['sunday'][first_day])
+
+        dd_line = flat.duty_line[duty]
+        totals = np.zeros((flat.lines, len(FIELDS)), dtype=np.int64)
+        for column, field in enumerate(DURATION_FIELDS[:-2]):
+            totals[:, column] = sums(dd_line, credits[field] * credited, flat.lines)
+        totals[:, FIELDS.index('pending_rest')] = sums(dd_line, pending_rest, flat.lines)
+        totals[:, FIELDS.index('xturn')] = sums(dd_line, credits['xturn'] * credited, flat.lines)
+        totals[:, FIELDS.index('sunday')] = sums(flat.duty_line, duty_sunday * duty_credited, flat.lines)
+        totals[:, FIELDS.index('7day')] = self.seventh_days(flat, report_day[duty_credited],
+                                                            release_day[duty_credited],
+                                                            flat.duty_line[duty_credited])
+        return totals
+
+    @staticmethod
+    def seventh_days(flat: FlatLines, report_day: np.ndarray, release_day: np.ndarray,
+                     line: np.ndarray) -> np.ndarray:
+        """How many 7th consecutive days were worked within each line, as ConsecutiveDays counts them
+
+        Days are counted over runs of duties each reporting the day after the last one released,
+        every 7th day of a run is a 7th day"""
+        if not len(line):
+            return np.zeros(flat.lines, dtype=np.int64)
+        first_in_line = np.append(True, line[1:] != line[:-1])
+        last_release_day = np.append(0, release_day[:-1])
+        run = np.cumsum(first_in_line | (report_day != last_release_day + 1)) - 1
+        days = sums(run, positive(release_day - report_day + 1), run[-1] + 1)
+        run_line = line[np.searchsorted(run, np.arange(run[-1] + 1))]
+        return sums(run_line, days // 7, flat.lines)
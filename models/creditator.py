@@ -3,44 +3,25 @@ Created on 23/06/2016
 
 @author: Xico
 """
+import configparser
 from datetime import timedelta
+from enum import IntEnum
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Tuple
 
-# TODO : Move all this constants into a configuration file, associated to method set_rules
-from models.scheduleclasses import Flight
+from models.nighttime import EARLY_MORNING_BEGIN, EARLY_MORNING_END, local_minutes, night_minutes
+from models.scheduleclasses import Flight, Trip
 from models.timeclasses import Duration
 
+# TABLA 1, 2 and 5 limits for each position and group
+RULES_FILE = Path(__file__).parent.parent / 'data' / 'credit_rules.ini'
+
 TRANSOCEANIC = ['MAD', 'CDG', 'MXP', 'FCO', 'LHR', 'AMS', 'SVO', 'BCN', 'MUC', 'FRA', 'NRT', 'ICN', 'PVG', 'PEK']
 MINIMUM_BLOCK = Duration(13 * 60)
 MINIMUM_DUTY = Duration(15 * 60)
 WORKED_DAY = Duration(1 * 60 + 30)
 
-# TABLA 1  Jornada continental
-JORNADA_ORDINARIA_VUELO_REGULAR = Duration(7 * 60 + 30)
-MAXIMA_IRREBASABLE_VUELO_REGULAR = Duration(10 * 60)
-JORNADA_ORDINARIA_SERVICIO_REGULAR = Duration(9 * 60)
-MAXIMA_IRREBASABLE_SERVICIO_REGULAR = Duration(12 * 60)
-
-# TABLA 1 Jornada transoceanica
-JORNADA_ORDINARIA_VUELO_TRAN = Duration(8 * 60)
-MAXIMA_IRREBASABLE_VUELO_TRAN = Duration(13 * 60)
-JORNADA_ORDINARIA_SERVICIO_TRAN = Duration(10 * 60)
-MAXIMA_IRREBASABLE_SERVICIO_TRAN = Duration(15 * 60)
-
-# TABLA 2 Largo alcance
-JORNADA_ORDINARIA_VUELO_LARGO_ALCANCE = Duration(8 * 60)
-MAXIMA_ASIGNABLE_VUELO_LARGO_ALCANCE = Duration(13 * 60)
-JORNADA_ORDINARIA_SERVICIO_LARGO_ALCANCE = Duration(10 * 60)
-MAXIMA_ASIGNABLE_SERVICIO_LARGO_ALCANCE = Duration(15 * 60)
-
-# TABLA 5 Jornada transoceanica especial
-JORNADA_ORDINARIA_VUELO_TRANSP = Duration(8 * 60)
-MAXIMA_IRREBASABLE_VUELO_TRANSP = Duration(16 * 60)
-JORNADA_ORDINARIA_SERVICIO_TRANSP = Duration(10 * 60)
-# Nota, la tabla 5 especifica que para efectos de pago, se pagara como tiempo
-# de vulo al doble a partir de las 16:00 aunque la maxima asiganble sea 18:00
-
-MAXIMA_IRREBASABLE_SERVICIO_TRANSP = Duration(16 * 60)
-
 # Jornadas mensuales
 JORNADA_ORDINARIA_VUELO_MENSUAL = Duration(65 * 60)
 JORNADA_ORDINARIA_DH_MENSUAL = Duration(3 * 60)
@@ -52,7 +33,7 @@ RECESO_TRANS = Duration(48 * 60)
 MAX_TURN_TIME = Duration(3 * 60)
 
 # Templates
-string_part_template = "{day: >2} {routing!s:20s} {event_names!s:25s} {duty_type:18s} {report:%H:%M} " \
+string_part_template = "{day: >2} {routing!s:20s} {event_names!s:25s} {duty_type!s:18s} {report:%H:%M} " \
                        "{release:%H:%M}    "
 num_part_template = " {daily:<4H} {block:<4H} {dh:<4H} {night:<4H} {xblock:<4H} " \
                     "{xduty:<4H} {maxirre:<4H} {delay:<4H} {xturn:<4H} "
@@ -69,8 +50,46 @@ trip_credits_header = duty_day_credits_header + 'RECE '
 line_credits_header = trip_credits_header + 'DESC FERI'
 
 
-def get_rules_for(position, group):
-    pass
+class DutyType(IntEnum):
+    """Duty day types, as indices into each RuleSet table"""
+    REGULAR = 0
+    TRANSOCEANIC = 1
+    SPECIAL_TRANS = 2
+    LONG_HAUL = 3
+
+    def __str__(self):
+        return self.name.lower().replace('_', ' ')
+
+
+class RuleSet(NamedTuple):
+    """Limits for each DutyType, rule_set.ordinary_block[duty_type]"""
+    ordinary_block: Tuple[Duration, ...]
+    maximum_block: Tuple[Duration, ...]
+    ordinary_duty: Tuple[Duration, ...]
+    maximum_duty: Tuple[Duration, ...]
+
+
+@lru_cache(maxsize=None)
+def read_rules(rules_file: str = str(RULES_FILE)) -> configparser.ConfigParser:
+    rules = configparser.ConfigParser()
+    with open(rules_file, 'r') as fp:
+        rules.read_file(fp)
+    return rules
+
+
+@lru_cache(maxsize=None)
+def get_rules_for(position: str, group: str, rules_file: str = str(RULES_FILE)) -> RuleSet:
+    """The RuleSet found under [position group] or else [position], any limit not found there is taken
+    from DEFAULT. Rule sets are read once and shared by all Creditators"""
+    rules = read_rules(rules_file)
+    section = rules.defaults()
+    for name in ('{} {}'.format(position, group), position):
+        if rules.has_section(name):
+            section = rules[name]
+            break
+    limits = [[Duration.from_string(limit.replace(':', '')) for limit in section[str(duty_type)].split()]
+              for duty_type in DutyType]
+    return RuleSet(*(tuple(column) for column in zip(*limits)))
 
 
 class ConsecutiveDays(object):
@@ -105,7 +124,7 @@ class Creditator(object):
         self.month_scope = month_scope
 
     def set_rules(self):
-        pass
+        self.rules = get_rules_for(self.position, self.group)
 
     @staticmethod
     def calculate_pending_rest(rest):
@@ -113,8 +132,7 @@ class Creditator(object):
         pending_rest = RECESO_CONTINENTAL - rest
         return pending_rest
 
-    @staticmethod
-    def credits_from_duty_day(duty_day):
+    def credits_from_duty_day(self, duty_day):
         """
         Returns
         """
@@ -124,7 +142,7 @@ class Creditator(object):
                                   'routing': FormattedList([duty_day.origin]),
                                   'report': duty_day.report,
                                   'release': duty_day.release,
-                                  'duty_type': 'regular',
+                                  'duty_type': DutyType.REGULAR,
                                   'event_names': FormattedList(['']),
                                   'daily': duty_day.duration,
                                   'block': Duration(0),
@@ -155,28 +173,10 @@ class Creditator(object):
             duty_day._credits['xturn'] += (turn - MAX_TURN_TIME)
 
         # 4. Classify duty
-        Creditator.duty_day_classifier(duty_day)
-
-        if duty_day._credits['duty_type'] == 'regular':
-            duty_day._credits['xblock'] = duty_day._credits['block'] - JORNADA_ORDINARIA_VUELO_REGULAR
-            duty_day._credits['xduty'] = duty_day._credits['daily'] - JORNADA_ORDINARIA_SERVICIO_REGULAR
-            duty_day._credits['maxirre'] = duty_day._credits['daily'] - MAXIMA_IRREBASABLE_SERVICIO_REGULAR
-        elif duty_day._credits['duty_type'] == 'transoceanic':
-            duty_day._credits['xblock'] = duty_day._credits['block'] - JORNADA_ORDINARIA_VUELO_TRAN
-            duty_day._credits['xduty'] = duty_day._credits['daily'] - JORNADA_ORDINARIA_SERVICIO_TRAN
-            duty_day._credits['maxirre'] = duty_day._credits['daily'] - MAXIMA_IRREBASABLE_SERVICIO_TRAN
-        elif duty_day._credits['duty_type'] == 'special trans':
-            duty_day._credits['xblock'] = duty_day._credits['block'] - JORNADA_ORDINARIA_VUELO_TRANSP
-            duty_day._credits['xduty'] = duty_day._credits['daily'] - JORNADA_ORDINARIA_SERVICIO_TRANSP
-            duty_day._credits['maxirre'] = duty_day._credits['daily'] - MAXIMA_IRREBASABLE_SERVICIO_TRANSP
-            # If there is a maxirre, normal xduty time ends where maxirre starts
-        elif duty_day._credits['duty_type'] == 'long haul':
-            duty_day._credits['xblock'] = duty_day._credits['block'] - JORNADA_ORDINARIA_VUELO_LARGO_ALCANCE
-            duty_day._credits['xduty'] = duty_day._credits['daily'] - JORNADA_ORDINARIA_SERVICIO_LARGO_ALCANCE
-            duty_day._credits['maxirre'] = duty_day._credits['daily'] - MAXIMA_ASIGNABLE_SERVICIO_LARGO_ALCANCE
-            # If there is a maxirre, normal xduty time ends where maxirre starts
-            if duty_day._credits['maxirre'] > Duration(0):
-                duty_day._credits['xduty'] = Duration(5 * 60)
+        duty_type = Creditator.duty_day_classifier(duty_day)
+        duty_day._credits['xblock'] = duty_day._credits['block'] - self.rules.ordinary_block[duty_type]
+        duty_day._credits['xduty'] = duty_day._credits['daily'] - self.rules.ordinary_duty[duty_type]
+        duty_day._credits['maxirre'] = duty_day._credits['daily'] - self.rules.maximum_duty[duty_type]
 
         # 5. If there is a maxirre, normal xduty time ends where maxirre starts
         if duty_day._credits['maxirre'] > Duration(0):
@@ -195,8 +195,10 @@ class Creditator(object):
         duty_day._credits['template'] = duty_day_credits_template
 
 
-    def credits_from_trip(self, trip):
-        """Returns a list of all duty_day_credits_dict within the trip_match"""
+    def credits_from_trip(self, trip, duty_days=None):
+        """Returns a list of all duty_day_credits_dict within the trip_match
+
+        If duty_days are given, only those are credited again, all other duty days keep their credits"""
 
         credits_list = []
         trip._credits = CreditsDict()
@@ -214,7 +216,8 @@ class Creditator(object):
         trip._credits['sunday'] = 0
         for duty_day in trip.duty_days:
             if duty_day.begin.month == self.month_scope:
-                duty_day.compute_credits(self)
+                if duty_days is None or duty_day in duty_days or not isinstance(duty_day._credits, CreditsDict):
+                    duty_day.compute_credits(self)
                 trip._credits['block'] += duty_day._credits['block']
                 trip._credits['dh'] += duty_day._credits['dh']
                 trip._credits['daily'] += duty_day._credits['daily']
@@ -233,6 +236,9 @@ class Creditator(object):
                 tempo = Creditator.calculate_pending_rest(rest)
                 duty_day._credits['pending_rest'] = tempo
                 trip._credits['pending_rest'] += duty_day._credits['pending_rest']
+            elif duty_days is not None and duty_day.begin.month == self.month_scope:
+                # A neighbour's rest might have been long enough after all
+                duty_day._credits['pending_rest'] = Duration(0)
 
         # 3. How many sundays?
         trip._credits['sunday'] = trip.how_many_sundays()
@@ -304,25 +310,9 @@ class Creditator(object):
     @staticmethod
     def calculate_night_time(event):
         """
-        Returns the nighttime flown in a given event, value is returned in seconds
+        Returns the nighttime flown in a given event, as read on the clocks its begin and end are displayed in
         """
-
-        BEGIN = event.begin.hour * 60 + event.begin.minute
-        END = event.end.hour * 60 + event.end.minute
-        NIGHTTIME_BEGIN = 22 * 60
-        NIGHTTIME_END = 5 * 60
-        MIDNIGHT = 24 * 60
-        morninginter = [0, NIGHTTIME_END]
-        nightinter = [NIGHTTIME_BEGIN, MIDNIGHT]
-
-        if BEGIN > END:  # Event starts and ends in different days
-            total = Creditator.overlapping(nightinter, [BEGIN, MIDNIGHT]) + Creditator.overlapping(morninginter,
-                                                                                                   [0, END])
-        else:  # Event starts and ends in same day
-            total = Creditator.overlapping(morninginter, [BEGIN, END]) + Creditator.overlapping(nightinter,
-                                                                                                [BEGIN, END])
-
-        return Duration(total)
+        return Duration(night_minutes(local_minutes(event.begin), local_minutes(event.end)))
 
     @staticmethod
     # TODO : Probably this should be integrated into all ScheduleClasses as ScheduledClass.overlapping(00:30, 05:00)
@@ -335,19 +325,17 @@ class Creditator(object):
     @staticmethod
     def has_early_morning_time(event):
         """
-        Returns true if event.overlaps(00:59, 04:59)
+        Returns true if event begins or ends within (00:59, 04:59)
         """
 
         BEGIN = event.begin.hour * 60 + event.begin.minute
         END = event.end.hour * 60 + event.end.minute
-        EARLY_MORNING_BEGIN = 59
-        EARLY_MORNING_END = 4 * 60 + 59
 
         return (EARLY_MORNING_BEGIN < BEGIN < EARLY_MORNING_END) or (EARLY_MORNING_BEGIN < END < EARLY_MORNING_END)
 
     @staticmethod
     def duty_day_classifier(duty_day):
-        """Given a DutyDay, this classifier will insert the following tags:
+        """Given a DutyDay, this classifier will insert, and return, one of the following DutyTypes:
            - regular : any continental flight under 10:00 duty time. It is the default value
            - transoceanic : MAD, CDG, MXP, FCO, LHR, AMS, SVO, BCN, MUC, FRA, NRT, ICN, PVG, PEK
            - special transoceanic :
@@ -364,9 +352,9 @@ class Creditator(object):
            """
         # TODO : I don't like the way this looks
         if set([airport.iata_code for airport in duty_day._credits['routing']]).intersection(TRANSOCEANIC):
-            duty_day._credits['duty_type'] = 'transoceanic'
+            duty_day._credits['duty_type'] = DutyType.TRANSOCEANIC
             if (duty_day._credits['total']) > MINIMUM_BLOCK or duty_day._credits['daily'] > MINIMUM_DUTY:
-                duty_day._credits['duty_type'] = 'special trans'
+                duty_day._credits['duty_type'] = DutyType.SPECIAL_TRANS
         elif len(duty_day.events) <= 2:
             for event in duty_day.events:
                 if event.duration > Duration(4 * 60 + 30):
@@ -374,8 +362,9 @@ class Creditator(object):
                                     duty_day._credits['daily'] > Duration(12 * 60) or \
                             (duty_day._credits['daily'] > Duration(9 * 60 + 30) and
                                  Creditator.has_early_morning_time(duty_day)):
-                        duty_day._credits['duty_type'] = 'long haul'
+                        duty_day._credits['duty_type'] = DutyType.LONG_HAUL
                     break
+        return duty_day._credits['duty_type']
 
     @staticmethod
     def month_credits(credits_dict):
@@ -408,6 +397,150 @@ class Creditator(object):
         return payable_credits
 
 
+LINE_TOTALS = ('block', 'dh', 'daily', 'night', 'xblock', 'xduty', 'maxirre', 'delay', 'pending_rest', 'xturn',
+               'sunday')
+
+
+class DutyCredits(object):
+    """What a single duty adds up into its line's credits"""
+
+    def __init__(self, duty, credits_list):
+        self.duty = duty
+        self.credits_list = credits_list or []
+        self.totals = {field: duty._credits[field] for field in LINE_TOTALS} if credits_list else {}
+        # ConsecutiveDays as left behind by this duty, and the counted duty it followed
+        self.count = None
+        self.last_counted_date = None
+        self.previous = None
+        self.seventh_days = 0
+
+
+class IncrementalLineCredits(object):
+    """Keeps line._credits as Creditator.credits_from_line would leave them while the line is being changed
+
+    Credits are kept for each duty, so after a swap, a delay or a trip reassignment only the changed duties
+    are credited again, and only those duty days given for a trip. Line totals are updated by the difference
+    and consecutive days are counted again only from the first changed duty until the count is back
+    to what it was before:
+
+        line_credits = IncrementalLineCredits(line, Creditator(month_scope=5))
+        line[index] = trip  # after delaying trip's second duty day
+        line_credits.refresh(changed=[trip], duty_days=[trip.duty_days[1]])
+    """
+
+    def __init__(self, line, creditator):
+        self.line = line
+        self.creditator = creditator
+        self.duties = {}
+        self.order = []
+        line._credits.update({'day': '',
+                              'routing': 'TOTALS',
+                              'report': '',
+                              'release': '',
+                              'duty_type': '',
+                              'event_names': '',
+                              'sunday': 0,
+                              '7day': 0,
+                              'header': line_credits_header,
+                              'template': line_credits_template})
+        line._credits.update({field: Duration(0) for field in LINE_TOTALS if field != 'sunday'})
+        self.refresh(changed=line.duties)
+
+    @property
+    def credits_list(self):
+        """All duty day credits, as returned by Creditator.credits_from_line"""
+        credits_list = []
+        for duty in self.line.duties:
+            credits_list.extend(self.duties[id(duty)].credits_list)
+        return credits_list
+
+    def _add(self, duty_credits, sign):
+        for field, value in duty_credits.totals.items():
+            if field == 'sunday':
+                self.line._credits[field] += sign * value
+            elif sign > 0:
+                self.line._credits[field] += value
+            else:
+                self.line._credits[field] = Duration(self.line._credits[field].minutes - value.minutes)
+
+    def refresh(self, changed=(), duty_days=None):
+        """Credit again all changed duties, those added to the line and drop those no longer in it
+
+        If duty_days are given, only those are credited again within a changed trip"""
+        duties = self.line.duties
+        order = [id(duty) for duty in duties]
+        changed = {id(duty) for duty in changed}
+        touched = set()
+
+        # 1. Drop duties no longer in the line
+        for key in set(self.duties) - set(order):
+            duty_credits = self.duties.pop(key)
+            self._add(duty_credits, -1)
+            self.line._credits['7day'] -= duty_credits.seventh_days
+
+        # 2. Credit again changed duties and those just added
+        for index, duty in enumerate(duties):
+            key = order[index]
+            if key not in changed and key in self.duties:
+                continue
+            old = self.duties.get(key)
+            if duty_days is not None and old and isinstance(duty, Trip):
+                credits_list = self.creditator.credits_from_trip(duty, duty_days)
+            else:
+                credits_list = duty.compute_credits(self.creditator)
+            new = DutyCredits(duty, credits_list)
+            if old:
+                self._add(old, -1)
+                if new.credits_list:
+                    new.count, new.last_counted_date, new.previous = old.count, old.last_counted_date, old.previous
+                    new.seventh_days = old.seventh_days
+                else:
+                    self.line._credits['7day'] -= old.seventh_days
+            self._add(new, +1)
+            self.duties[key] = new
+            touched.add(index)
+
+        # 3. Count consecutive days again, from the first duty that moved or was touched
+        previous = None
+        for index, key in enumerate(order):
+            duty_credits = self.duties[key]
+            if duty_credits.credits_list:
+                if duty_credits.previous != previous or duty_credits.count is None:
+                    touched.add(index)
+                previous = key
+        self.order = order
+        if not touched:
+            return self.credits_list
+
+        first, last = min(touched), max(touched)
+        consecutive_days = ConsecutiveDays(duties[0].report.date(), 7)
+        previous = None
+        for key in reversed(order[:first]):
+            if self.duties[key].credits_list:
+                consecutive_days.count = self.duties[key].count
+                consecutive_days.last_counted_date = self.duties[key].last_counted_date
+                previous = key
+                break
+        for index in range(first, len(order)):
+            duty_credits = self.duties[order[index]]
+            if not duty_credits.credits_list:
+                continue
+            before = duty_credits.count, duty_credits.last_counted_date
+            del consecutive_days.dates[:]
+            consecutive_days.calculate(duty_credits.duty)
+            self.line._credits['7day'] += len(consecutive_days.dates) - duty_credits.seventh_days
+            duty_credits.seventh_days = len(consecutive_days.dates)
+            duty_credits.count = consecutive_days.count
+            duty_credits.last_counted_date = consecutive_days.last_counted_date
+            duty_credits.previous = previous
+            previous = order[index]
+            if index >= last and before == (duty_credits.count, duty_credits.last_counted_date):
+                # All duties after this one are counted as they were before
+                break
+
+        return self.credits_list
+
+
 class FormattedList(list):
     """List containing all cities traveled chronologically in a given Duty Day"""
 
@@ -0,0 +1,190 @@
+"""Every flight of a period held column by column in NumPy arrays, for fleet-wide analytics
+
+Times are UTC minutes from the epoch, as EpochItinerary holds them, and durations are minutes.
+Flights that have not been flown have an actual_begin of NOT_FLOWN, unsaved flights and routes an id of NOT_STORED"""
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+from data.database import CursorFromConnectionPool
+from models.nighttime import night_minutes_array
+from models.scheduleclasses import Airport, Route, Equipment, EpochItinerary, Flight
+from models.timeclasses import Duration, to_epoch_minutes, from_epoch_minutes, to_timezone
+
+NOT_FLOWN = -1
+NOT_STORED = -1
+
+# Columns as FlightTable.from_rows expects them
+FLIGHT_TABLE_SELECT = ('SELECT flights.flight_id, flights.airline_iata_code, flights.route_id, '
+                       '       routes.name, routes.origin, routes.destination, '
+                       '       (EXTRACT(EPOCH FROM flights.scheduled_begin) / 60)::bigint, '
+                       '       (EXTRACT(EPOCH FROM flights.scheduled_block) / 60)::integer, '
+                       '       flights.equipment, '
+                       '       (EXTRACT(EPOCH FROM flights.actual_begin) / 60)::bigint, '
+                       '       (EXTRACT(EPOCH FROM flights.actual_block) / 60)::integer '
+                       '    FROM public.flights '
+                       '    INNER JOIN public.routes ON flights.route_id = routes.route_id ')
+
+
+class FlightTable(object):
+    """One row per flight, one NumPy array per field"""
+
+    columns = ('event_id', 'carrier', 'route_id', 'name', 'origin', 'destination', 'scheduled_begin',
+               'scheduled_block', 'actual_begin', 'actual_block', 'equipment', 'dh')
+    dtypes = ('i8', 'U3', 'i8', 'U6', 'U3', 'U3', 'i8', 'i8', 'i8', 'i8', 'U4', '?')
+
+    def __init__(self, **columns):
+        for column, dtype in zip(self.columns, self.dtypes):
+            setattr(self, column, np.asarray(columns[column], dtype=dtype))
+
+    @classmethod
+    def from_rows(cls, rows) -> 'FlightTable':
+        """Build from rows read with FLIGHT_TABLE_SELECT, all of them are taken as non DH flights"""
+        rows = list(rows)
+        fields = list(zip(*rows)) if rows else [()] * 11
+        return cls(event_id=fields[0], carrier=fields[1], route_id=fields[2], name=fields[3], origin=fields[4],
+                   destination=fields[5], scheduled_begin=fields[6], scheduled_block=fields[7],
+                   equipment=[equipment or '' for equipment in fields[8]],
+                   actual_begin=[NOT_FLOWN if begin is None else begin for begin in fields[9]],
+                   actual_block=[block or 0 for block in fields[10]],
+                   dh=np.zeros(len(rows), dtype='?'))
+
+    @classmethod
+    def from_flights(cls, flights) -> 'FlightTable':
+        rows = list()
+        for flight in flights:
+            actual_itinerary = flight.actual_itinerary
+            rows.append((NOT_STORED if flight.event_id is None else flight.event_id,
+                         flight.carrier,
+                         NOT_STORED if flight.route.route_id is None else flight.route.route_id,
+                         flight.route.name, flight.route.origin.iata_code, flight.route.destination.iata_code,
+                         flight.scheduled_itinerary.begin_minutes,
+                         flight.scheduled_itinerary.end_minutes - flight.scheduled_itinerary.begin_minutes,
+                         actual_itinerary.begin_minutes if actual_itinerary else NOT_FLOWN,
+                         actual_itinerary.end_minutes - actual_itinerary.begin_minutes if actual_itinerary else 0,
+                         flight.equipment.airplane_code if flight.equipment else '',
+                         bool(flight.dh)))
+        fields = list(zip(*rows)) if rows else [()] * len(cls.columns)
+        return cls(**dict(zip(cls.columns, fields)))
+
+    @classmethod
+    def load(cls, begin: datetime, end: datetime) -> 'FlightTable':
+        """All stored flights scheduled to begin within [begin, end)"""
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute(FLIGHT_TABLE_SELECT +
+                           'WHERE flights.scheduled_begin >= %s AND flights.scheduled_begin < %s '
+                           'ORDER BY flights.scheduled_begin;',
+                           (begin.astimezone(pytz.utc).replace(tzinfo=None),
+                            end.astimezone(pytz.utc).replace(tzinfo=None)))
+            return cls.from_rows(cursor.fetchall())
+
+    def __len__(self) -> int:
+        return len(self.event_id)
+
+    def select(self, mask) -> 'FlightTable':
+        """A FlightTable holding only the rows where mask is True, or the rows at the given indices"""
+        return FlightTable(**{column: getattr(self, column)[mask] for column in self.columns})
+
+    def between(self, begin: datetime, end: datetime) -> 'FlightTable':
+        """Flights beginning within [begin, end)"""
+        begin_minutes = self.begin
+        return self.select((begin_minutes >= to_epoch_minutes(begin)) & (begin_minutes < to_epoch_minutes(end)))
+
+    @property
+    def flown(self) -> np.ndarray:
+        return self.actual_begin != NOT_FLOWN
+
+    @property
+    def begin(self) -> np.ndarray:
+        """Actual begin if flown, otherwise scheduled begin, as Flight.begin"""
+        return np.where(self.flown, self.actual_begin, self.scheduled_begin)
+
+    @property
+    def block(self) -> np.ndarray:
+        return np.where(self.flown, self.actual_block, self.scheduled_block)
+
+    @property
+    def end(self) -> np.ndarray:
+        return self.begin + self.block
+
+    def block_total(self) -> Duration:
+        return Duration(int(self.block[~self.dh].sum()))
+
+    def dh_total(self) -> Duration:
+        return Duration(int(self.block[self.dh].sum()))
+
+    def local_minutes(self, minutes: np.ndarray, iata_codes: np.ndarray, timezone='local') -> np.ndarray:
+        """minutes shifted by the UTC offset in force at each of them, at each iata_code's airport or in timezone
+
+        pytz is asked only once per airport for each quarter of an hour, time zones change on those"""
+        if timezone == 'local':
+            codes, zone_indices = np.unique(iata_codes, return_inverse=True)
+            zones = [Airport._airports[code].timezone for code in codes]
+        else:
+            zone_indices = np.zeros(len(minutes), dtype='i8')
+            zones = [timezone]
+        quarters = minutes // 15
+        first_quarter = quarters.min() if len(quarters) else 0
+        span = quarters.max() - first_quarter + 1 if len(quarters) else 1
+        keys, inverse = np.unique(zone_indices.reshape(-1) * span + quarters - first_quarter, return_inverse=True)
+        offsets = np.array([to_timezone(from_epoch_minutes(int(first_quarter + quarter) * 15), zones[zone_index])
+                            .utcoffset().total_seconds() // 60
+                            for zone_index, quarter in zip(*np.divmod(keys, span))], dtype='i8')
+        return minutes + offsets[inverse.reshape(-1)]
+
+    def night_minutes(self, timezone='local') -> np.ndarray:
+        """Night time flown by each flight as Creditator.calculate_night_time figures it
+
+        begin is read at the origin and end at the destination, unless another timezone is given"""
+        return night_minutes_array(self.local_minutes(self.begin, self.origin, timezone),
+                                   self.local_minutes(self.end, self.destination, timezone))
+
+    def night_total(self, timezone='local') -> Duration:
+        """Night time of all non DH flights"""
+        return Duration(int(self.night_minutes(timezone)[~self.dh].sum()))
+
+    @staticmethod
+    def totals_by(keys: np.ndarray, values: np.ndarray) -> dict:
+        """Sum of values for each distinct key"""
+        distinct_keys, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse.reshape(-1), weights=values, minlength=len(distinct_keys))
+        return {key.item(): Duration(int(total)) for key, total in zip(distinct_keys, totals)}
+
+    def block_by_route(self) -> dict:
+        """Block time of non DH flights for each route_id"""
+        return self.totals_by(self.route_id[~self.dh], self.block[~self.dh])
+
+    def block_by_month(self, timezone=pytz.utc) -> dict:
+        """Block time of non DH flights for each (year, month) they began in, within timezone or 'local'"""
+        begin = self.local_minutes(self.begin[~self.dh], self.origin[~self.dh], timezone)
+        months = (begin * 60).astype('datetime64[s]').astype('datetime64[M]').astype('i8')
+        totals = self.totals_by(months, self.block[~self.dh])
+        return {(1970 + month // 12, month % 12 + 1): total for month, total in totals.items()}
+
+    def flight(self, index: int) -> Flight:
+        """The index row as a Flight, routes, airports and equipments are taken from their registries
+        or loaded from the database"""
+        route_id = int(self.route_id[index])
+        if route_id != NOT_STORED:
+            route = Route.load_by_id(route_id)
+        else:
+            route = Route(name=str(self.name[index]), origin=Airport.load_from_db(str(self.origin[index])),
+                          destination=Airport.load_from_db(str(self.destination[index])), route_id=None)
+        scheduled_begin = int(self.scheduled_begin[index])
+        scheduled_itinerary = EpochItinerary.from_minutes(scheduled_begin,
+                                                          scheduled_begin + int(self.scheduled_block[index]))
+        actual_itinerary = None
+        if self.actual_begin[index] != NOT_FLOWN:
+            actual_begin = int(self.actual_begin[index])
+            actual_itinerary = EpochItinerary.from_minutes(actual_begin, actual_begin + int(self.actual_block[index]))
+        equipment = Equipment.load_from_db(str(self.equipment[index])) if self.equipment[index] else None
+        event_id = int(self.event_id[index])
+        return Flight(route=route, scheduled_itinerary=scheduled_itinerary, actual_itinerary=actual_itinerary,
+                      equipment=equipment, carrier=str(self.carrier[index]),
+                      event_id=None if event_id == NOT_STORED else event_id, dh=bool(self.dh[index]))
+
+    def flights(self, indices=None):
+        """Yield the rows at indices, all of them if None, as Flights"""
+        for index in range(len(self)) if indices is None else indices:
+            yield self.flight(index)
@@ -0,0 +1,84 @@
+"""Night time and early morning time within a duty, on integer local minutes
+
+Local minutes are wall clock minutes from the epoch, as read on a clock displaying some timezone, so every
+midnight falls on a multiple of DAY. How much of a daily window lies before a given minute is found in
+constant time, so the time within a window is the difference of two such counts, for legs crossing any number
+of midnights, one at a time or for whole NumPy arrays of begin and end minutes
+
+    night_minutes(local_minutes(flight.begin), local_minutes(flight.end))
+    night_minutes_array(table_begin, table_end)
+"""
+from datetime import date
+
+import numpy as np
+
+DAY = 24 * 60
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NIGHTTIME_BEGIN = 22 * 60
+NIGHTTIME_END = 5 * 60
+NIGHTTIME = NIGHTTIME_END + DAY - NIGHTTIME_BEGIN
+EARLY_MORNING_BEGIN = 59
+EARLY_MORNING_END = 4 * 60 + 59
+EARLY_MORNING = EARLY_MORNING_END - EARLY_MORNING_BEGIN
+
+
+def local_minutes(dt) -> int:
+    """Minutes from the epoch as read in dt's wall clock"""
+    return (dt.toordinal() - EPOCH_ORDINAL) * DAY + dt.hour * 60 + dt.minute
+
+
+def clock_end(begin: int, end: int) -> int:
+    """end, one day later if it reads before begin
+
+    begin and end might be read on clocks of different timezones, i.e. at origin and destination"""
+    return end + DAY if end < begin else end
+
+
+def night_before(minute: int) -> int:
+    """Night time within [0, minute), nights last from NIGHTTIME_BEGIN until NIGHTTIME_END"""
+    days, time = divmod(minute, DAY)
+    return days * NIGHTTIME + min(time, NIGHTTIME_END) + max(time - NIGHTTIME_BEGIN, 0)
+
+
+def early_morning_before(minute: int) -> int:
+    """Early morning time within [0, minute)"""
+    days, time = divmod(minute, DAY)
+    return days * EARLY_MORNING + min(max(time - EARLY_MORNING_BEGIN, 0), EARLY_MORNING)
+
+
+def night_minutes(begin: int, end: int) -> int:
+    """Night time within [begin, end), local minutes"""
+    return max(night_before(clock_end(begin, end)) - night_before(begin), 0)
+
+
+def early_morning_minutes(begin: int, end: int) -> int:
+    """Early morning time within [begin, end), local minutes"""
+    return max(early_morning_before(clock_end(begin, end)) - early_morning_before(begin), 0)
+
+
+def clock_end_array(begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+    return np.where(end < begin, end + DAY, end)
+
+
+def night_before_array(minute: np.ndarray) -> np.ndarray:
+    days, time = np.divmod(minute, DAY)
+    return days * NIGHTTIME + np.minimum(time, NIGHTTIME_END) + np.maximum(time - NIGHTTIME_BEGIN, 0)
+
+
+def early_morning_before_array(minute: np.ndarray) -> np.ndarray:
+    days, time = np.divmod(minute, DAY)
+    return days * EARLY_MORNING + np.clip(time - EARLY_MORNING_BEGIN, 0, EARLY_MORNING)
+
+
+def night_minutes_array(begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Night time within each [begin, end), as night_minutes finds it"""
+    begin = np.asarray(begin, dtype=np.int64)
+    end = clock_end_array(begin, np.asarray(end, dtype=np.int64))
+    return np.maximum(night_before_array(end) - night_before_array(begin), 0)
+
+
+def early_morning_minutes_array(begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Early morning time within each [begin, end), as early_morning_minutes finds it"""
+    begin = np.asarray(begin, dtype=np.int64)
+    end = clock_end_array(begin, np.asarray(end, dtype=np.int64))
+    return np.maximum(early_morning_before_array(end) - early_morning_before_array(begin), 0)
@@ -0,0 +1,97 @@
+"""Registries hold the only instance of each flyweight: airlines, airports, equipments and routes"""
+import threading
+from collections import OrderedDict
+from weakref import WeakValueDictionary
+
+
+class Registry(object):
+    """Maps a key to the only instance created for it
+
+    Values are held strongly unless weak, then they are forgotten as soon as nothing else uses them.
+    With a maxsize only the maxsize most recently used values are held strongly, the least recently
+    used one is dropped when another is added. A weak, bounded Registry keeps dropped values for
+    as long as they are in use somewhere else.
+
+    Every lookup thru get is counted as a hit or a miss, loads counts how many values were read from the database
+    """
+
+    def __init__(self, weak: bool = False, maxsize: int = None):
+        self.weak = weak
+        self.maxsize = maxsize
+        self._values = WeakValueDictionary() if weak else dict()
+        self._recent = OrderedDict() if maxsize else None
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    def reconfigure(self, weak: bool = False, maxsize: int = None) -> None:
+        """Change how values are held, keeping those already registered"""
+        with self._lock:
+            values = list(self._values.items())
+            self.__init__(weak=weak, maxsize=maxsize)
+            for key, value in values:
+                self[key] = value
+
+    def get(self, key, default=None, counted: bool = True):
+        """Value registered for key or default, counted as a hit or a miss unless not counted
+
+        Constructors look up their key once more after a counted lookup missed, they are not counted"""
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.misses += counted
+                return default
+            self.hits += counted
+            self._touch(key, value)
+            return value
+
+    def _touch(self, key, value):
+        """Mark value as the most recently used"""
+        if self._recent is None:
+            return
+        self._recent[key] = value
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.maxsize:
+            evicted_key, _ = self._recent.popitem(last=False)
+            self.evictions += 1
+            if not self.weak:
+                self._values.pop(evicted_key, None)
+
+    def record_load(self, loaded: int = 1) -> None:
+        with self._lock:
+            self.loads += loaded
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            self._touch(key, value)
+
+    def __contains__(self, key) -> bool:
+        return key in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def values(self) -> list:
+        return list(self._values.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            if self._recent is not None:
+                self._recent.clear()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return dict(size=len(self), hits=self.hits, misses=self.misses, loads=self.loads, evictions=self.evictions)
+
+    def __repr__(self):
+        return "<{__class__.__name__}> weak={weak} maxsize={maxsize} {stats}".format(
+            __class__=self.__class__, weak=self.weak, maxsize=self.maxsize, stats=self.stats())
@@ -1,16 +1,20 @@
 """This module holds all needed classes"""
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta, date
 import pytz
+from psycopg2.extras import execute_values
 from AdminApp.exceptions import UnsavedRoute, PreviouslyStoredTrip, UnstoredTrip, UnsavedAirport
-from data.database import CursorFromConnectionPool
-from models.timeclasses import Duration
+from data.database import CursorFromConnectionPool, ServerCursorFromConnectionPool, UnitOfWork
+from data.asyncdatabase import AsyncCursorFromConnectionPool
+from models.registry import Registry
+from models.timeclasses import Duration, to_epoch_minutes, from_epoch_minutes, to_timezone
 
 
 class Airline(object):
-    _airlines = dict()
+    _airlines = Registry()
 
     def __new__(cls, airline_code, airline_name):
-        airline = cls._airlines.get(airline_code)
+        airline = cls._airlines.get(airline_code, counted=False)
         if not airline:
             airline = super().__new__(cls)
             cls._airlines[airline_code] = airline
@@ -29,6 +33,7 @@ class Airline(object):
             with CursorFromConnectionPool() as cursor:
                 cursor.execute('SELECT * FROM airlines WHERE iata_code=%s;', (airline_code,))
                 airline_data = cursor.fetchone()
+                cls._airlines.record_load()
                 airline = cls(airline_code=airline_data[0], airline_name=airline_data[1])
         return airline
 
@@ -39,15 +44,19 @@ class Airline(object):
         return "<{__class__.__name__}> {airline_code}".format(__class__=self.__class__, **self.__dict__)
 
 
+AIRPORT_SELECT = 'SELECT * FROM airports WHERE iata_code=%s;'
+AIRPORTS_SELECT = 'SELECT * FROM airports WHERE iata_code = ANY(%s);'
+
+
 class Airport(object):
     """Create airports using the Flyweight pattern
-    Try using the weakref.WeakValueDictionary() if  garbage-collection concerned
-    for our simple app, not needed
+
+    Airports are kept in a Registry, reconfigure it to hold them weakly if garbage-collection concerned
     """
-    _airports = dict()
+    _airports = Registry()
 
     def __new__(cls, iata_code: str = None, timezone=None, viaticum=None):
-        airport = cls._airports.get(iata_code)
+        airport = cls._airports.get(iata_code, counted=False)
         if not airport:
             airport = super().__new__(cls)
             if timezone:
@@ -67,20 +76,91 @@ class Airport(object):
     def __str__(self):
         return "{}".format(self.iata_code)
 
+    @classmethod
+    def from_row(cls, airport_data):
+        """Build an Airport from a row of the airports table"""
+        timezone = pytz.timezone(airport_data[1] + '/' + airport_data[2])
+        return cls(iata_code=airport_data[0], timezone=timezone, viaticum=airport_data[3])
+
+    @classmethod
+    def _from_fetched(cls, iata_code: str, airport_data):
+        """Build the airport read by load_from_db, raise UnsavedAirport if none was"""
+        if not airport_data:
+            raise UnsavedAirport(airport_iata_code=iata_code)
+        cls._airports.record_load()
+        return cls.from_row(airport_data)
+
+    @classmethod
+    def _missing_codes(cls, iata_codes) -> tuple:
+        """Return iata_codes as a set, along those not loaded yet"""
+        iata_codes = {iata_code.upper() for iata_code in iata_codes}
+        return iata_codes, [iata_code for iata_code in iata_codes if not cls._airports.get(iata_code)]
+
+    @classmethod
+    def _from_fetched_many(cls, iata_codes: set, airports_data) -> list:
+        """Build the airports read by load_many, return those loaded among iata_codes"""
+        cls._airports.record_load(len(airports_data))
+        for airport_data in airports_data:
+            cls.from_row(airport_data)
+        return [cls._airports[iata_code] for iata_code in iata_codes if iata_code in cls._airports]
+
     @classmethod
     def load_from_db(cls, iata_code: str):
         airport = cls._airports.get(iata_code.upper())
         if not airport:
             with CursorFromConnectionPool() as cursor:
-                cursor.execute('SELECT * FROM airports WHERE iata_code=%s;', (iata_code,))
+                cursor.execute(AIRPORT_SELECT, (iata_code,))
                 airport_data = cursor.fetchone()
-            if airport_data:
-                timezone = pytz.timezone(airport_data[1] + '/' + airport_data[2])
-                airport = cls(iata_code=airport_data[0], timezone=timezone, viaticum=airport_data[3])
-            else:
-                raise UnsavedAirport(airport_iata_code=iata_code)
+            airport = cls._from_fetched(iata_code, airport_data)
+        return airport
+
+    @classmethod
+    def load_many(cls, iata_codes) -> list:
+        """Load all given airports with a single query, airports already loaded are not queried again
+
+        Unknown iata_codes are skipped, load_from_db will raise UnsavedAirport for them"""
+        iata_codes, missing_codes = cls._missing_codes(iata_codes)
+        airports_data = []
+        if missing_codes:
+            with CursorFromConnectionPool() as cursor:
+                cursor.execute(AIRPORTS_SELECT, (missing_codes,))
+                airports_data = cursor.fetchall()
+        return cls._from_fetched_many(iata_codes, airports_data)
+
+    @classmethod
+    async def load_from_db_async(cls, iata_code: str):
+        """Same as load_from_db, for the asyncio database layer"""
+        airport = cls._airports.get(iata_code.upper())
+        if not airport:
+            async with AsyncCursorFromConnectionPool() as cursor:
+                await cursor.execute(AIRPORT_SELECT, (iata_code,))
+                airport_data = await cursor.fetchone()
+            airport = cls._from_fetched(iata_code, airport_data)
         return airport
 
+    @classmethod
+    async def load_many_async(cls, iata_codes) -> list:
+        """Same as load_many, for the asyncio database layer"""
+        iata_codes, missing_codes = cls._missing_codes(iata_codes)
+        airports_data = []
+        if missing_codes:
+            async with AsyncCursorFromConnectionPool() as cursor:
+                await cursor.execute(AIRPORTS_SELECT, (missing_codes,))
+                airports_data = await cursor.fetchall()
+        return cls._from_fetched_many(iata_codes, airports_data)
+
+    @classmethod
+    def load_all(cls) -> int:
+        """Register every stored airport, returns how many were read"""
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute('SELECT * FROM airports;')
+            airports_data = cursor.fetchall()
+        cls._airports.record_load(len(airports_data))
+        for airport_data in airports_data:
+            if airport_data[0] not in cls._airports:
+                cls.from_row(airport_data)
+        return len(airports_data)
+
     def save_to_db(self):
         continent, tz_city = self.timezone.zone.split('/')
         with CursorFromConnectionPool() as cursor:
@@ -112,12 +192,16 @@ class CrewMember(object):
         return "{0:3s} {1:6s}-{2:12s}".format(self.position, self.crew_member_id, self.name)
 
 
+EQUIPMENT_SELECT = 'SELECT * FROM equipments WHERE airplane_code=%s;'
+EQUIPMENTS_SELECT = 'SELECT * FROM equipments WHERE airplane_code = ANY(%s);'
+
+
 class Equipment(object):
-    _equipments = dict()
+    _equipments = Registry()
 
     def __new__(cls, airplane_code, cabin_members):
         """Use the flyweight pattern to create only one object """
-        equipment = cls._equipments.get(airplane_code)
+        equipment = cls._equipments.get(airplane_code, counted=False)
         if not equipment:
             equipment = super().__new__(cls)
             cls._equipments[airplane_code] = equipment
@@ -138,30 +222,113 @@ class Equipment(object):
     def __repr__(self):
         return "<{__class__.__name__}> {airplane_code}".format(__class__=self.__class__, **self.__dict__)
 
+    @classmethod
+    def from_row(cls, equipment_data):
+        """Build an Equipment from a row of the equipments table"""
+        return cls(airplane_code=equipment_data[0], cabin_members=equipment_data[1])
+
+    @classmethod
+    def _missing_codes(cls, airplane_codes) -> tuple:
+        """Return airplane_codes as a set, along those not loaded yet"""
+        airplane_codes = {airplane_code.upper() for airplane_code in airplane_codes}
+        return airplane_codes, [airplane_code for airplane_code in airplane_codes
+                                if not cls._equipments.get(airplane_code)]
+
+    @classmethod
+    def _from_fetched_many(cls, airplane_codes: set, equipments_data) -> list:
+        """Build the equipments read by load_many, return those loaded among airplane_codes"""
+        cls._equipments.record_load(len(equipments_data))
+        for equipment_data in equipments_data:
+            cls.from_row(equipment_data)
+        return [cls._equipments[airplane_code] for airplane_code in airplane_codes
+                if airplane_code in cls._equipments]
+
     @classmethod
     def load_from_db(cls, airplane_code: str):
         equipment = cls._equipments.get(airplane_code.upper())
         if not equipment:
             with CursorFromConnectionPool() as cursor:
-                cursor.execute('SELECT * FROM equipments WHERE airplane_code=%s;', (airplane_code,))
+                cursor.execute(EQUIPMENT_SELECT, (airplane_code,))
                 equipment_data = cursor.fetchone()
-                equipment = cls(airplane_code=equipment_data[0], cabin_members=equipment_data[1])
+            cls._equipments.record_load()
+            equipment = cls.from_row(equipment_data)
         return equipment
 
+    @classmethod
+    def load_many(cls, airplane_codes) -> list:
+        """Load all given equipments with a single query, equipments already loaded are not queried again"""
+        airplane_codes, missing_codes = cls._missing_codes(airplane_codes)
+        equipments_data = []
+        if missing_codes:
+            with CursorFromConnectionPool() as cursor:
+                cursor.execute(EQUIPMENTS_SELECT, (missing_codes,))
+                equipments_data = cursor.fetchall()
+        return cls._from_fetched_many(airplane_codes, equipments_data)
+
+    @classmethod
+    async def load_from_db_async(cls, airplane_code: str):
+        """Same as load_from_db, for the asyncio database layer"""
+        equipment = cls._equipments.get(airplane_code.upper())
+        if not equipment:
+            async with AsyncCursorFromConnectionPool() as cursor:
+                await cursor.execute(EQUIPMENT_SELECT, (airplane_code,))
+                equipment_data = await cursor.fetchone()
+            cls._equipments.record_load()
+            equipment = cls.from_row(equipment_data)
+        return equipment
+
+    @classmethod
+    async def load_many_async(cls, airplane_codes) -> list:
+        """Same as load_many, for the asyncio database layer"""
+        airplane_codes, missing_codes = cls._missing_codes(airplane_codes)
+        equipments_data = []
+        if missing_codes:
+            async with AsyncCursorFromConnectionPool() as cursor:
+                await cursor.execute(EQUIPMENTS_SELECT, (missing_codes,))
+                equipments_data = await cursor.fetchall()
+        return cls._from_fetched_many(airplane_codes, equipments_data)
+
+    @classmethod
+    def load_all(cls) -> int:
+        """Register every stored equipment, returns how many were read"""
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute('SELECT * FROM equipments;')
+            equipments_data = cursor.fetchall()
+        cls._equipments.record_load(len(equipments_data))
+        for equipment_data in equipments_data:
+            cls.from_row(equipment_data)
+        return len(equipments_data)
+
+
+ROUTE_SELECT = ('SELECT route_id FROM public.routes '
+                '    WHERE name=%s'
+                '      AND origin=%s'
+                '      AND destination=%s')
+# Routes matching any of the aligned name, origin and destination arrays
+ROUTES_SELECT = ('SELECT route_id, name, origin, destination FROM public.routes '
+                 '    WHERE (name, origin, destination) IN '
+                 '          (SELECT * FROM unnest(%s::text[], %s::text[], %s::text[]))')
+
 
 class Route(object):
     """For a given airline, represents a flight number or ground duty name
         with its origin and destination airports
-        Note: flights and ground duties are called Events"""
-    _routes = dict()
+        Note: flights and ground duties are called Events
+
+        Routes are registered by (name, origin iata_code, destination iata_code) and by route_id"""
+    _routes = Registry()
+    # Weak so that routes dropped from a bounded _routes are not kept alive by this index
+    _routes_by_id = Registry(weak=True)
 
     def __new__(cls, name: str, origin: Airport, destination: Airport, route_id: int):
-        route_key = name + origin.iata_code + destination.iata_code
-        route = cls._routes.get(route_key)
+        route_key = (name, origin.iata_code, destination.iata_code)
+        route = cls._routes.get(route_key, counted=False)
         if not route:
-            route = super().__new__(cls)
+            # A route dropped from a bounded _routes may still be in use
+            route = (route_id and cls._routes_by_id.get(route_id, counted=False)) or super().__new__(cls)
             if route_id:
                 cls._routes[route_key] = route
+                cls._routes_by_id[route_id] = route
         return route
 
     def __init__(self, name: str, origin: Airport, destination: Airport, route_id: int = None):
@@ -173,40 +340,122 @@ class Route(object):
             self.destination = destination
             self.initted = True
 
+    @classmethod
+    def initialise(cls, maxsize: int = None) -> None:
+        """Hold at most maxsize routes, dropping the least recently used first, or all of them if None
+
+        Dropped routes still in use are found again by route_id"""
+        cls._routes.reconfigure(maxsize=maxsize)
+
+    @classmethod
+    def _from_fetched(cls, name: str, origin: Airport, destination: Airport, route_data):
+        """Build the route read by load_from_db, raise UnsavedRoute if none was"""
+        if not route_data:
+            raise UnsavedRoute(route=cls(name=name, origin=origin, destination=destination, route_id=None))
+        cls._routes.record_load()
+        return cls(name=name, origin=origin, destination=destination, route_id=route_data[0])
+
+    @classmethod
+    def _missing_keys(cls, route_keys) -> tuple:
+        """Return route_keys as a set, along the arguments to query those not loaded yet, None if all are"""
+        route_keys = set(route_keys)
+        missing_keys = [route_key for route_key in route_keys if not cls._routes.get(route_key)]
+        arguments = tuple(list(field) for field in zip(*missing_keys)) if missing_keys else None
+        return route_keys, arguments
+
+    @classmethod
+    def _from_fetched_many(cls, route_keys: set, routes_data) -> list:
+        """Build the routes read by load_many, return those loaded among route_keys"""
+        for route_id, name, origin, destination in routes_data:
+            cls._routes.record_load()
+            cls(name=name, origin=Airport._airports.get(origin), destination=Airport._airports.get(destination),
+                route_id=route_id)
+        return [cls._routes[route_key] for route_key in route_keys if route_key in cls._routes]
+
     @classmethod
     def load_from_db(cls, name: str, origin: Airport, destination: Airport):
-        route_key = name + origin.iata_code + destination.iata_code
+        route_key = (name, origin.iata_code, destination.iata_code)
         loaded_route = cls._routes.get(route_key)
         origin = Airport.load_from_db(iata_code=origin.iata_code)
         destination = Airport.load_from_db(iata_code=destination.iata_code)
         if not loaded_route:
             with CursorFromConnectionPool() as cursor:
-                cursor.execute('SELECT route_id FROM public.routes '
-                               '    WHERE name=%s'
-                               '      AND origin=%s'
-                               '      AND destination=%s',
-                               (name, origin.iata_code, destination.iata_code))
-                route_id = cursor.fetchone()
-                if route_id:
-                    loaded_route = cls(name=name, origin=origin, destination=destination, route_id=route_id[0])
-                else:
-                    raise UnsavedRoute(route=cls(name=name, origin=origin, destination=destination, route_id=None))
+                cursor.execute(ROUTE_SELECT, (name, origin.iata_code, destination.iata_code))
+                route_data = cursor.fetchone()
+            loaded_route = cls._from_fetched(name, origin, destination, route_data)
         return loaded_route
 
+    @classmethod
+    def load_many(cls, route_keys) -> list:
+        """Load all given routes with a single query, routes already loaded are not queried again
+
+        route_keys should be (name, origin iata_code, destination iata_code) tuples, all airports
+        should have been loaded before. Unknown routes are skipped, load_from_db will raise UnsavedRoute for them"""
+        route_keys, arguments = cls._missing_keys(route_keys)
+        routes_data = []
+        if arguments:
+            with CursorFromConnectionPool() as cursor:
+                cursor.execute(ROUTES_SELECT, arguments)
+                routes_data = cursor.fetchall()
+        return cls._from_fetched_many(route_keys, routes_data)
+
+    @classmethod
+    async def load_from_db_async(cls, name: str, origin: Airport, destination: Airport):
+        """Same as load_from_db, for the asyncio database layer"""
+        route_key = (name, origin.iata_code, destination.iata_code)
+        loaded_route = cls._routes.get(route_key)
+        origin = await Airport.load_from_db_async(iata_code=origin.iata_code)
+        destination = await Airport.load_from_db_async(iata_code=destination.iata_code)
+        if not loaded_route:
+            async with AsyncCursorFromConnectionPool() as cursor:
+                await cursor.execute(ROUTE_SELECT, (name, origin.iata_code, destination.iata_code))
+                route_data = await cursor.fetchone()
+            loaded_route = cls._from_fetched(name, origin, destination, route_data)
+        return loaded_route
+
+    @classmethod
+    async def load_many_async(cls, route_keys) -> list:
+        """Same as load_many, for the asyncio database layer"""
+        route_keys, arguments = cls._missing_keys(route_keys)
+        routes_data = []
+        if arguments:
+            async with AsyncCursorFromConnectionPool() as cursor:
+                await cursor.execute(ROUTES_SELECT, arguments)
+                routes_data = await cursor.fetchall()
+        return cls._from_fetched_many(route_keys, routes_data)
+
     @classmethod
     def load_by_id(cls, route_id: int):
+        route = cls._routes_by_id.get(route_id)
+        if route:
+            return route
         with CursorFromConnectionPool() as cursor:
             cursor.execute('SELECT name, origin, destination '
                            '    FROM public.routes '
                            '    WHERE route_id=%s',
                            (route_id,))
             route_data = cursor.fetchone()
+            cls._routes.record_load()
             origin = Airport.load_from_db(iata_code=route_data[1])
             destination = Airport.load_from_db(iata_code=route_data[2])
 
             return cls(name=route_data[0], origin=origin,
                        destination=destination, route_id=route_id)
 
+    @classmethod
+    def load_all(cls) -> int:
+        """Register every stored route, airports should have been loaded before. Returns how many were read"""
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute('SELECT route_id, name, origin, destination FROM public.routes;')
+            routes_data = cursor.fetchall()
+        cls._routes.record_load(len(routes_data))
+        for route_id, name, origin, destination in routes_data:
+            origin = Airport._airports.get(origin)
+            destination = Airport._airports.get(destination)
+            if origin and destination:
+                cls(name=name, origin=origin, destination=destination, route_id=route_id)
+        return len(routes_data)
+
     def save_to_db(self):
         with CursorFromConnectionPool() as cursor:
             cursor.execute('INSERT INTO public.routes(name, origin, destination) '
@@ -229,37 +478,121 @@ class Route(object):
             __class__=self.__class__, **self.__dict__)
 
 
-class Itinerary(object):
-    """ An Itinerary represents a Duration occurring between a 'begin' and an 'end' datetime.
+def warm_registries() -> dict:
+    """Register every stored airport, equipment and route at once, i.e. on startup
 
-    begin and end datetimes should be time zone aware. Although, python's duck typing feature
-    allows for naive datetimes as well"""
+    Returns how many of each were read"""
+    return dict(airports=Airport.load_all(), equipments=Equipment.load_all(), routes=Route.load_all())
 
-    def __init__(self, begin: datetime, end: datetime):
-        """Enter beginning and ending aware-datetime
 
-        In order to facilitate object retrieval and storing, datetime objects are expected to be timezone aware
-        and in the UTC format
-        """
-        self._begin = begin
-        self._end = end
-        self.begin_timezone_displayed = None
-        self.end_timezone_displayed = None
+def registry_stats() -> dict:
+    """Size, hits, misses, database loads and evictions of every flyweight registry"""
+    return dict(airlines=Airline._airlines.stats(), airports=Airport._airports.stats(),
+                equipments=Equipment._equipments.stats(), routes=Route._routes.stats())
 
-    @property
-    def begin(self):
-        """Will return begin as an aware datetime object set to begin_timezone"""
-        if self.begin_timezone_displayed:
-            return self._begin.astimezone(self.begin_timezone_displayed)
-        else:
-            return self._begin
 
-    @property
-    def end(self):
-        if self.end_timezone_displayed:
-            return self._end.astimezone(self.end_timezone_displayed)
+def memoised(method):
+    """A property computed once, until the instance's changed method is called
+
+    Values are kept in the instance's _cache dict, created the first time one is needed"""
+    name = method.__name__
+
+    def getter(self):
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = {}
+        try:
+            return cache[name]
+        except KeyError:
+            value = cache[name] = method(self)
+            return value
+
+    getter.__doc__ = method.__doc__
+    return property(getter)
+
+
+class MemberList(list):
+    """The events of a DutyDay or the duty days of a Trip, which is their holder
+
+    Every change is told to the holder, so it forgets its memoised values, and members are told when they
+    join or leave it, so their own changes reach the holder too"""
+
+    __slots__ = ('holder',)
+
+    def __init__(self, holder, members=()):
+        super().__init__(members)
+        self.holder = holder
+
+    def __reduce__(self):
+        # Copied members already know their holder
+        return self.__class__, (self.holder, list(self))
+
+    def _changed(self, joined=(), left=()):
+        for member in left:
+            self.holder._left(member)
+        for member in joined:
+            self.holder._joined(member)
+        self.holder.changed()
+
+    def append(self, member):
+        super().append(member)
+        self._changed(joined=(member,))
+
+    def extend(self, members):
+        members = list(members)
+        super().extend(members)
+        self._changed(joined=members)
+
+    def __iadd__(self, members):
+        self.extend(members)
+        return self
+
+    def insert(self, index, member):
+        super().insert(index, member)
+        self._changed(joined=(member,))
+
+    def pop(self, index=-1):
+        member = super().pop(index)
+        self._changed(left=(member,))
+        return member
+
+    def remove(self, member):
+        del self[self.index(member)]
+
+    def clear(self):
+        left = list(self)
+        super().clear()
+        self._changed(left=left)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            left, joined = self[key], list(value)
+            super().__setitem__(key, joined)
         else:
-            return self._end
+            left, joined = (self[key],), (value,)
+            super().__setitem__(key, value)
+        self._changed(joined=joined, left=left)
+
+    def __delitem__(self, key):
+        left = self[key] if isinstance(key, slice) else (self[key],)
+        super().__delitem__(key)
+        self._changed(left=left)
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
+
+
+class BaseItinerary(object):
+    """What every Itinerary does, whichever way its begin and end are held
+
+    Subclasses hold them within their own slots and provide begin, end, begin_minutes and end_minutes"""
+
+    __slots__ = ('begin_timezone_displayed', 'end_timezone_displayed')
 
     @classmethod
     def from_timedelta(cls, begin: datetime, a_timedelta: timedelta):
@@ -294,7 +627,7 @@ class Itinerary(object):
         return itinerary
 
     @classmethod
-    def from_string(cls, input_string: str) -> 'Itinerary':
+    def from_string(cls, input_string: str) -> 'BaseItinerary':
         """
         format DDMMYYYY HHMM    HHMM
                23122019 1340    0320
@@ -329,17 +662,155 @@ class Itinerary(object):
         return (self.begin == other.begin) and (self.end == other.end)
 
 
+class Itinerary(BaseItinerary):
+    """ An Itinerary represents a Duration occurring between a 'begin' and an 'end' datetime.
+
+    begin and end datetimes should be time zone aware. Although, python's duck typing feature
+    allows for naive datetimes as well"""
+
+    __slots__ = ('_begin', '_end')
+
+    def __init__(self, begin: datetime, end: datetime):
+        """Enter beginning and ending aware-datetime
+
+        In order to facilitate object retrieval and storing, datetime objects are expected to be timezone aware
+        and in the UTC format
+        """
+        self._begin = begin
+        self._end = end
+        self.begin_timezone_displayed = None
+        self.end_timezone_displayed = None
+
+    @property
+    def begin(self):
+        """Will return begin as an aware datetime object set to begin_timezone"""
+        if self.begin_timezone_displayed:
+            return to_timezone(self._begin, self.begin_timezone_displayed)
+        else:
+            return self._begin
+
+    @begin.setter
+    def begin(self, begin: datetime):
+        self._begin = begin
+
+    @property
+    def end(self):
+        if self.end_timezone_displayed:
+            return to_timezone(self._end, self.end_timezone_displayed)
+        else:
+            return self._end
+
+    @end.setter
+    def end(self, end: datetime):
+        self._end = end
+
+    @property
+    def begin_minutes(self) -> int:
+        """begin as minutes from the epoch"""
+        return to_epoch_minutes(self._begin)
+
+    @property
+    def end_minutes(self) -> int:
+        return to_epoch_minutes(self._end)
+
+
+class EpochItinerary(BaseItinerary):
+    """An Itinerary holding begin and end as UTC minutes from the epoch
+
+    Durations, turns and rests are computed with ints only, begin and end datetimes are built
+    whenever they are read, i.e. to be printed or stored"""
+
+    __slots__ = ('begin_minutes', 'end_minutes')
+
+    def __init__(self, begin: datetime, end: datetime):
+        self.begin_minutes = to_epoch_minutes(begin)
+        self.end_minutes = to_epoch_minutes(end)
+        self.begin_timezone_displayed = None
+        self.end_timezone_displayed = None
+
+    @classmethod
+    def from_minutes(cls, begin_minutes: int, end_minutes: int) -> 'EpochItinerary':
+        itinerary = cls.__new__(cls)
+        itinerary.begin_minutes = begin_minutes
+        itinerary.end_minutes = end_minutes
+        itinerary.begin_timezone_displayed = None
+        itinerary.end_timezone_displayed = None
+        return itinerary
+
+    @classmethod
+    def from_timedelta(cls, begin: datetime, a_timedelta: timedelta):
+        begin_minutes = to_epoch_minutes(begin)
+        return cls.from_minutes(begin_minutes, begin_minutes + int(a_timedelta.total_seconds() // 60))
+
+    @property
+    def _begin(self) -> datetime:
+        return from_epoch_minutes(self.begin_minutes)
+
+    @property
+    def _end(self) -> datetime:
+        return from_epoch_minutes(self.end_minutes)
+
+    @property
+    def begin(self) -> datetime:
+        return from_epoch_minutes(self.begin_minutes, self.begin_timezone_displayed)
+
+    @begin.setter
+    def begin(self, begin: datetime):
+        self.begin_minutes = to_epoch_minutes(begin)
+
+    @property
+    def end(self) -> datetime:
+        return from_epoch_minutes(self.end_minutes, self.end_timezone_displayed)
+
+    @end.setter
+    def end(self, end: datetime):
+        self.end_minutes = to_epoch_minutes(end)
+
+    @property
+    def duration(self) -> Duration:
+        return Duration(self.end_minutes - self.begin_minutes)
+
+    def __eq__(self, other):
+        return self.begin_minutes == other.begin_minutes and self.end_minutes == other.end_minutes
+
+
 class Event(object):
     """
     Represents  Vacations, GDO's, time-off, etc.
     Markers don't account for duty or block time in a given month
     """
 
-    def __init__(self, route: Route, scheduled_itinerary: Itinerary = None, event_id: int = None):
+    __slots__ = ('route', '_scheduled_itinerary', 'event_id', '_credits', '_holders')
+
+    def __init__(self, route: Route, scheduled_itinerary: BaseItinerary = None, event_id: int = None):
         self.route = route
-        self.scheduled_itinerary = scheduled_itinerary
+        self._scheduled_itinerary = scheduled_itinerary
         self.event_id = event_id
         self._credits = None
+        # The DutyDay holding this event, or a tuple of them when a flight is in many trips
+        self._holders = None
+
+    @property
+    def scheduled_itinerary(self) -> BaseItinerary:
+        return self._scheduled_itinerary
+
+    @scheduled_itinerary.setter
+    def scheduled_itinerary(self, itinerary: BaseItinerary):
+        self._scheduled_itinerary = itinerary
+        self.changed()
+
+    def changed(self):
+        """Make duty days holding this event forget their memoised values"""
+        for duty_day in self.holders:
+            duty_day.changed()
+
+    @property
+    def holders(self) -> tuple:
+        """DutyDays holding this event"""
+        holders = self._holders
+        if holders is None:
+            return ()
+        return holders if isinstance(holders, tuple) else (holders,)
 
     @staticmethod
     def create_event_parameters() -> dict:
@@ -366,11 +837,11 @@ class Event(object):
 
     @property
     def begin(self) -> datetime:
-        return self.scheduled_itinerary.begin if self.scheduled_itinerary else None
+        return self._scheduled_itinerary.begin if self._scheduled_itinerary else None
 
     @property
     def end(self) -> datetime:
-        return self.scheduled_itinerary.end if self.scheduled_itinerary else None
+        return self._scheduled_itinerary.end if self._scheduled_itinerary else None
 
     @property
     def report(self) -> datetime:
@@ -380,9 +851,25 @@ class Event(object):
     def release(self) -> datetime:
         return self.end
 
+    @property
+    def begin_minutes(self) -> int:
+        return self._scheduled_itinerary.begin_minutes
+
+    @property
+    def end_minutes(self) -> int:
+        return self._scheduled_itinerary.end_minutes
+
+    @property
+    def report_minutes(self) -> int:
+        return self.begin_minutes
+
+    @property
+    def release_minutes(self) -> int:
+        return self.end_minutes
+
     @property
     def duration(self) -> Duration:
-        return Duration.from_timedelta(self.end - self.begin)
+        return Duration(self.end_minutes - self.begin_minutes)
 
     def compute_credits(self, creditator=None):
         self._credits = {'block': Duration(0), 'dh': Duration(0), 'daily': Duration(0)}
@@ -390,14 +877,15 @@ class Event(object):
     def astimezone(self, timezone='local'):
         """Change event's itineraries to given timezone"""
         if timezone != 'local':
-            self.scheduled_itinerary.astimezone(begin_timezone=timezone,
-                                                end_timezone=timezone)
+            self._scheduled_itinerary.astimezone(begin_timezone=timezone,
+                                                 end_timezone=timezone)
         else:
-            self.scheduled_itinerary.astimezone(begin_timezone=self.route.origin.timezone,
-                                                end_timezone=self.route.destination.timezone)
+            self._scheduled_itinerary.astimezone(begin_timezone=self.route.origin.timezone,
+                                                 end_timezone=self.route.destination.timezone)
+        self.changed()
 
     def __str__(self) -> str:
-        if self.scheduled_itinerary:
+        if self._scheduled_itinerary:
             template = "{0.route.name} {0.begin:%d%b} BEGIN {0.begin:%H%M} END {0.end:%H%M}"
         else:
             template = "{0.route.name}"
@@ -410,7 +898,9 @@ class GroundDuty(Event):
     Ground duties do account for some credits
     """
 
-    def __init__(self, route: Route, scheduled_itinerary: Itinerary = None, position: str = None,
+    __slots__ = ('position', 'equipment')
+
+    def __init__(self, route: Route, scheduled_itinerary: BaseItinerary = None, position: str = None,
                  equipment=None, event_id: int = None) -> None:
         super().__init__(route=route, scheduled_itinerary=scheduled_itinerary, event_id=event_id)
         self.position = position
@@ -451,41 +941,80 @@ class GroundDuty(Event):
         return template.format(self, rpt=rpt, rls=rls, turn=turn, block=block)
 
 
+# flights.* followed by the route, its airports and the equipment, as Flight.from_stream_rows expects them
+FLIGHT_STREAM_SELECT = ('SELECT flights.*, routes.name, routes.origin, routes.destination, '
+                        '       origins.continent, origins.tz_city, origins.viaticum_zone, '
+                        '       destinations.continent, destinations.tz_city, destinations.viaticum_zone, '
+                        '       equipments.cabin_members{duty_days} '
+                        'FROM public.flights '
+                        '    INNER JOIN public.routes ON routes.route_id = flights.route_id '
+                        '    INNER JOIN public.airports AS origins ON origins.iata_code = routes.origin '
+                        '    INNER JOIN public.airports AS destinations ON destinations.iata_code = routes.destination '
+                        '    LEFT JOIN public.equipments ON equipments.airplane_code = flights.equipment '
+                        '{duty_days_join}'
+                        'WHERE flights.scheduled_begin >= %s AND flights.scheduled_begin < %s '
+                        'ORDER BY flights.scheduled_begin;')
+# One row for every duty day a flight is in, followed by its trip_id, trip_date and dh
+FLIGHT_STREAM_DUTY_DAYS = ', duty_days.trip_id, duty_days.trip_date, duty_days.dh'
+FLIGHT_STREAM_DUTY_DAYS_JOIN = '    INNER JOIN public.duty_days ON duty_days.flight_id = flights.flight_id '
+# Flights matching any of the aligned airline_iata_code, route_id and UTC date arrays
+FLIGHTS_BY_KEYS = ('SELECT flights.* FROM public.flights '
+                   '    INNER JOIN unnest(%s::text[], %s::integer[], %s::date[]) '
+                   '            AS keys (airline_iata_code, route_id, dated) '
+                   '       ON flights.airline_iata_code = keys.airline_iata_code '
+                   '      AND flights.route_id = keys.route_id '
+                   '      AND flights.scheduled_begin >= keys.dated '
+                   '      AND flights.scheduled_begin < keys.dated + 1;')
+
+
 class Flight(GroundDuty):
 
-    def __init__(self, route: Route, scheduled_itinerary: Itinerary = None, actual_itinerary: Itinerary = None,
+    __slots__ = ('_actual_itinerary', 'carrier', 'dh')
+
+    def __init__(self, route: Route, scheduled_itinerary: BaseItinerary = None, actual_itinerary: BaseItinerary = None,
                  equipment: Equipment = None, carrier: str = 'AM', event_id: int = None, dh=False, position=None):
         """
         Holds those necessary fields to represent a Flight Itinerary
         """
         super().__init__(route=route, scheduled_itinerary=scheduled_itinerary, equipment=equipment,
                          event_id=event_id, position=position)
-        self.actual_itinerary = actual_itinerary
+        self._actual_itinerary = actual_itinerary
         self.carrier = carrier
         self.dh = dh
         # self.is_flight = True
 
+    @property
+    def actual_itinerary(self) -> BaseItinerary:
+        return self._actual_itinerary
+
+    @actual_itinerary.setter
+    def actual_itinerary(self, itinerary: BaseItinerary):
+        self._actual_itinerary = itinerary
+        self.changed()
+
     @property
     def begin(self) -> datetime:
-        return self.actual_itinerary.begin if self.actual_itinerary else self.scheduled_itinerary.begin
+        return self._actual_itinerary.begin if self._actual_itinerary else self._scheduled_itinerary.begin
 
     @begin.setter
     def begin(self, new_begin: datetime):
-        if self.actual_itinerary:
-            self.actual_itinerary.begin = new_begin
+        if self._actual_itinerary:
+            self._actual_itinerary.begin = new_begin
         else:
-            self.scheduled_itinerary.begin = new_begin
+            self._scheduled_itinerary.begin = new_begin
+        self.changed()
 
     @property
     def end(self) -> datetime:
-        return self.actual_itinerary.end if self.actual_itinerary else self.scheduled_itinerary.end
+        return self._actual_itinerary.end if self._actual_itinerary else self._scheduled_itinerary.end
 
     @end.setter
     def end(self, new_end: datetime):
-        if self.actual_itinerary:
-            self.actual_itinerary.end = new_end
+        if self._actual_itinerary:
+            self._actual_itinerary.end = new_end
         else:
-            self.scheduled_itinerary.end = new_end
+            self._scheduled_itinerary.end = new_end
+        self.changed()
 
     @property
     def name(self) -> str:
@@ -504,22 +1033,41 @@ class Flight(GroundDuty):
     @property
     def report(self) -> datetime:
         """Flight's report time"""
-        if not self.scheduled_itinerary:
-            return self.actual_itinerary.begin - timedelta(hours=1)
+        if not self._scheduled_itinerary:
+            return self._actual_itinerary.begin - timedelta(hours=1)
         else:
-            return self.scheduled_itinerary.begin - timedelta(hours=1)
+            return self._scheduled_itinerary.begin - timedelta(hours=1)
 
     @property
     def release(self) -> datetime:
         """Flights's release time """
-        if not self.actual_itinerary:
-            return self.scheduled_itinerary.end + timedelta(minutes=30)
+        if not self._actual_itinerary:
+            return self._scheduled_itinerary.end + timedelta(minutes=30)
         else:
-            return self.actual_itinerary.end + timedelta(minutes=30)
+            return self._actual_itinerary.end + timedelta(minutes=30)
+
+    @property
+    def begin_minutes(self) -> int:
+        return self._actual_itinerary.begin_minutes if self._actual_itinerary else self._scheduled_itinerary.begin_minutes
+
+    @property
+    def end_minutes(self) -> int:
+        return self._actual_itinerary.end_minutes if self._actual_itinerary else self._scheduled_itinerary.end_minutes
+
+    @property
+    def report_minutes(self) -> int:
+        """report as minutes from the epoch"""
+        itinerary = self._scheduled_itinerary if self._scheduled_itinerary else self._actual_itinerary
+        return itinerary.begin_minutes - 60
+
+    @property
+    def release_minutes(self) -> int:
+        itinerary = self._actual_itinerary if self._actual_itinerary else self._scheduled_itinerary
+        return itinerary.end_minutes + 30
 
     def __eq__(self, other):
         """Two flights are said to be equal if the carrier, route, scheduled itinerary and duration are the same"""
-        return self.carrier == other.carrier and self.scheduled_itinerary == other.scheduled_itinerary and \
+        return self.carrier == other.carrier and self._scheduled_itinerary == other._scheduled_itinerary and \
                self.duration == other.duration and self.route == other.route
 
     def compute_credits(self, creditator=None):
@@ -556,7 +1104,7 @@ class Flight(GroundDuty):
     def retrieve_matching_flights(self):
         """Load from Data Base. """
         built_flights = []
-        scheduled_begin = self.scheduled_itinerary.begin.replace(tzinfo=None)
+        scheduled_begin = self._scheduled_itinerary.begin.replace(tzinfo=None)
         with CursorFromConnectionPool() as cursor:
             cursor.execute('SELECT * FROM public.flights '
                            '    WHERE airline_iata_code = %s '
@@ -592,15 +1140,26 @@ class Flight(GroundDuty):
                                             origin=self.route.origin,
                                             destination=self.route.destination)
         if not self.event_id:
+            scheduled_begin = self._scheduled_itinerary.begin.replace(tzinfo=None)
             with CursorFromConnectionPool() as cursor:
                 cursor.execute('INSERT INTO public.flights('
                                '            airline_iata_code, route_id, scheduled_begin, '
                                '            scheduled_block, equipment) '
                                'VALUES (%s, %s, %s, %s, %s) '
+                               'ON CONFLICT DO NOTHING '
                                'RETURNING flight_id; ',
-                               (self.carrier, self.route.route_id, self.scheduled_itinerary.begin.replace(tzinfo=None),
+                               (self.carrier, self.route.route_id, scheduled_begin,
                                 self.duration.as_timedelta(), self.equipment.airplane_code))
-                self.event_id = cursor.fetchone()[0]
+                flight_data = cursor.fetchone()
+                if not flight_data:
+                    # Stored meanwhile by a concurrent transaction
+                    cursor.execute('SELECT flight_id FROM public.flights '
+                                   '    WHERE airline_iata_code = %s '
+                                   '      AND route_id = %s '
+                                   '      AND scheduled_begin = %s;',
+                                   (self.carrier, self.route.route_id, scheduled_begin))
+                    flight_data = cursor.fetchone()
+                self.event_id = flight_data[0]
         return self.event_id
 
     # def merge_to_db(self) -> int:
@@ -725,6 +1284,26 @@ class Flight(GroundDuty):
                             equipment=equipment, carrier=carrier_code, event_id=flight_id))
         return built_flights
 
+    @classmethod
+    def from_row(cls, flight_data: tuple, route: Route) -> 'Flight':
+        """Build a Flight from a row of the flights table"""
+        flight_id = flight_data[0]
+        carrier_code = flight_data[1]
+        scheduled_begin = flight_data[3]
+        scheduled_block = flight_data[4]
+        equipment = Equipment.load_from_db(flight_data[5])
+        actual_begin = flight_data[6]
+        actual_block = flight_data[7]
+        scheduled_itinerary = EpochItinerary.from_timedelta(begin=scheduled_begin, a_timedelta=scheduled_block)
+        if actual_begin:
+            actual_itinerary = EpochItinerary.from_timedelta(begin=actual_begin, a_timedelta=actual_block)
+        else:
+            actual_itinerary = None
+        return cls(route=route, scheduled_itinerary=scheduled_itinerary,
+                   actual_itinerary=actual_itinerary,
+                   equipment=equipment, carrier=carrier_code,
+                   event_id=flight_id)
+
     @classmethod
     def fetch_all_matching(cls, airline_iata_code: str, scheduled_begin: datetime, route: Route) -> list:
         """Load from Data Base. """
@@ -738,28 +1317,102 @@ class Flight(GroundDuty):
             flights_data = cursor.fetchall()
             if flights_data:
                 for flight_data in flights_data:
-                    flight_id = flight_data[0]
-                    carrier_code = flight_data[1]
-                    scheduled_begin = flight_data[3]
-                    scheduled_block = flight_data[4]
-                    equipment = Equipment.load_from_db(flight_data[5])
-                    actual_begin = flight_data[6]
-                    actual_block = flight_data[7]
-                    scheduled_itinerary = Itinerary.from_timedelta(begin=pytz.utc.localize(scheduled_begin),
-                                                                   a_timedelta=scheduled_block)
-                    if actual_begin:
-                        actual_itinerary = Itinerary.from_timedelta(begin=pytz.utc.localize(actual_begin),
-                                                                    a_timedelta=actual_block)
-                    else:
-                        actual_itinerary = None
-                    flight = cls(route=route, scheduled_itinerary=scheduled_itinerary,
-                                 actual_itinerary=actual_itinerary,
-                                 equipment=equipment, carrier=carrier_code,
-                                 event_id=flight_id)
-                    built_flights.append(flight)
+                    built_flights.append(cls.from_row(flight_data, route))
 
         return built_flights
 
+    @classmethod
+    def fetch_all_matching_many(cls, flight_keys) -> dict:
+        """Load, with a single query, all flights matching any of the given flight_keys
+
+        flight_keys are (airline_iata_code, route, dated) tuples, dated being the UTC date of the flight.
+        Returns a dict with a (airline_iata_code, route_id, dated) key and the list of matching flights
+        for each requested key, as fetch_all_matching would have returned them one at a time"""
+        routes = dict()
+        matching_flights = dict()
+        for airline_iata_code, route, dated in flight_keys:
+            routes[route.route_id] = route
+            matching_flights[(airline_iata_code, route.route_id, dated)] = []
+        if not matching_flights:
+            return matching_flights
+
+        airline_iata_codes, route_ids, dates = (list(field) for field in zip(*matching_flights))
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute(FLIGHTS_BY_KEYS, (airline_iata_codes, route_ids, dates))
+            flights_data = cursor.fetchall()
+        Equipment.load_many({flight_data[5] for flight_data in flights_data})
+        for flight_data in flights_data:
+            flight_key = (flight_data[1], flight_data[2], flight_data[3].date())
+            matching_flights[flight_key].append(cls.from_row(flight_data, routes[flight_data[2]]))
+        return matching_flights
+
+    @classmethod
+    async def fetch_all_matching_async(cls, airline_iata_code: str, scheduled_begin: datetime, route: Route) -> list:
+        """Same as fetch_all_matching, for the asyncio database layer"""
+        matching_flights = await cls.fetch_all_matching_many_async([(airline_iata_code, route,
+                                                                     scheduled_begin.date())])
+        return matching_flights[(airline_iata_code, route.route_id, scheduled_begin.date())]
+
+    @classmethod
+    async def fetch_all_matching_many_async(cls, flight_keys) -> dict:
+        """Same as fetch_all_matching_many, for the asyncio database layer"""
+        routes = dict()
+        matching_flights = dict()
+        for airline_iata_code, route, dated in flight_keys:
+            routes[route.route_id] = route
+            matching_flights[(airline_iata_code, route.route_id, dated)] = []
+        if not matching_flights:
+            return matching_flights
+
+        airline_iata_codes, route_ids, dates = (list(field) for field in zip(*matching_flights))
+        async with AsyncCursorFromConnectionPool() as cursor:
+            await cursor.execute(FLIGHTS_BY_KEYS, (airline_iata_codes, route_ids, dates))
+            flights_data = await cursor.fetchall()
+        await Equipment.load_many_async({flight_data[5] for flight_data in flights_data})
+        for flight_data in flights_data:
+            flight_key = (flight_data[1], flight_data[2], flight_data[3].date())
+            matching_flights[flight_key].append(cls.from_row(flight_data, routes[flight_data[2]]))
+        return matching_flights
+
+    @classmethod
+    def from_stream_rows(cls, flights_data):
+        """Yield a Flight for each FLIGHT_STREAM_SELECT row, rows may be any iterable, i.e. a server side cursor
+
+        If rows include duty days, the flight is marked as DH when its duty day says so"""
+        for row in flights_data:
+            route = Route._routes_by_id.get(row[2])
+            if not route:
+                origin = Airport._airports.get(row[9]) or \
+                    Airport(iata_code=row[9], timezone=pytz.timezone(row[11] + '/' + row[12]), viaticum=row[13])
+                destination = Airport._airports.get(row[10]) or \
+                    Airport(iata_code=row[10], timezone=pytz.timezone(row[14] + '/' + row[15]), viaticum=row[16])
+                route = Route(name=row[8], origin=origin, destination=destination, route_id=row[2])
+            if row[5] not in Equipment._equipments:
+                Equipment(airplane_code=row[5], cabin_members=row[17])
+            flight = cls.from_row(row, route)
+            if len(row) > 18 and row[20]:
+                flight.dh = True
+            yield flight
+
+    @classmethod
+    def iter_from_db(cls, begin: datetime, end: datetime, itersize: int = 2000, rows: bool = False,
+                     duty_days: bool = False):
+        """Lazily iterate over all stored flights scheduled to begin within [begin, end), naive datetimes being UTC
+
+        Rows are read thru a server side cursor itersize at a time, so memory stays the same for any period.
+        rows=True yields the FLIGHT_STREAM_SELECT tuples instead of building Flights,
+        duty_days=True yields the flight once for every duty day it is in, see FLIGHT_STREAM_DUTY_DAYS"""
+        query = FLIGHT_STREAM_SELECT.format(duty_days=FLIGHT_STREAM_DUTY_DAYS if duty_days else '',
+                                            duty_days_join=FLIGHT_STREAM_DUTY_DAYS_JOIN if duty_days else '')
+        # Naive datetimes are taken as UTC, same as to_epoch_minutes does
+        begin, end = (dt.astimezone(pytz.utc).replace(tzinfo=None) if dt.tzinfo else dt for dt in (begin, end))
+        with ServerCursorFromConnectionPool(itersize=itersize) as cursor:
+            cursor.execute(query, (begin, end))
+            if rows:
+                yield from cursor
+            else:
+                yield from cls.from_stream_rows(cursor)
+
     def update_to_db(self):
         with CursorFromConnectionPool() as cursor:
             cursor.execute('UPDATE public.flights '
@@ -769,20 +1422,101 @@ class Flight(GroundDuty):
                            (self.carrier, self.route.route_id, self.begin.replace(tzinfo=None),
                             self.duration.as_timedelta(), self.equipment.airplane_code, self.event_id))
 
+    @classmethod
+    def save_many(cls, cursor, flights: list) -> None:
+        """Store all flights with a single multi row INSERT using the given cursor
+
+        Flights are told apart by their carrier, route_id and scheduled_begin. Each distinct flight is
+        inserted once and its flight_id is set on every Flight object sharing its key, flights stored
+        by somebody else in the meantime get their existing flight_id instead"""
+        flights_by_key = dict()
+        for flight in flights:
+            if not flight.route.route_id:
+                flight.route = Route.load_from_db(name=flight.route.name,
+                                                  origin=flight.route.origin,
+                                                  destination=flight.route.destination)
+            scheduled_begin = flight.scheduled_itinerary.begin.astimezone(pytz.utc).replace(tzinfo=None)
+            flights_by_key.setdefault((flight.carrier, flight.route.route_id, scheduled_begin), []).append(flight)
+        if not flights_by_key:
+            return
+
+        flights_data = execute_values(cursor,
+                                      'INSERT INTO public.flights('
+                                      '            airline_iata_code, route_id, scheduled_begin, '
+                                      '            scheduled_block, equipment) '
+                                      'VALUES %s '
+                                      'ON CONFLICT DO NOTHING '
+                                      'RETURNING flight_id, airline_iata_code, route_id, scheduled_begin;',
+                                      [key + (same_flights[0].duration.as_timedelta(),
+                                              same_flights[0].equipment.airplane_code)
+                                       for key, same_flights in flights_by_key.items()],
+                                      page_size=len(flights_by_key), fetch=True)
+        conflicting_keys = set(flights_by_key)
+        for flight_id, *key in flights_data:
+            conflicting_keys.discard(tuple(key))
+            for flight in flights_by_key[tuple(key)]:
+                flight.event_id = flight_id
+
+        if conflicting_keys:
+            flights_data = execute_values(cursor,
+                                          'SELECT flight_id, flights.airline_iata_code, flights.route_id, '
+                                          '       flights.scheduled_begin '
+                                          'FROM public.flights '
+                                          '    INNER JOIN (VALUES %s) AS keys (airline_iata_code, route_id, '
+                                          '                                    scheduled_begin) '
+                                          '       ON flights.airline_iata_code = keys.airline_iata_code '
+                                          '      AND flights.route_id = keys.route_id '
+                                          '      AND flights.scheduled_begin = keys.scheduled_begin;',
+                                          list(conflicting_keys), page_size=len(conflicting_keys), fetch=True)
+            for flight_id, *key in flights_data:
+                for flight in flights_by_key[tuple(key)]:
+                    flight.event_id = flight_id
+
+    async def save_to_db_async(self, cursor) -> int:
+        """Same as save_to_db, for the asyncio database layer, within the given cursor's transaction"""
+        if not self.route.route_id:
+            self.route = await Route.load_from_db_async(name=self.route.name,
+                                                        origin=self.route.origin,
+                                                        destination=self.route.destination)
+        if not self.event_id:
+            scheduled_begin = self._scheduled_itinerary.begin.astimezone(pytz.utc).replace(tzinfo=None)
+            await cursor.execute('INSERT INTO public.flights('
+                                 '            airline_iata_code, route_id, scheduled_begin, '
+                                 '            scheduled_block, equipment) '
+                                 'VALUES (%s, %s, %s, %s, %s) '
+                                 'ON CONFLICT DO NOTHING '
+                                 'RETURNING flight_id; ',
+                                 (self.carrier, self.route.route_id, scheduled_begin,
+                                  self.duration.as_timedelta(), self.equipment.airplane_code))
+            flight_data = await cursor.fetchone()
+            if not flight_data:
+                # Stored meanwhile by a concurrent transaction
+                await cursor.execute('SELECT flight_id FROM public.flights '
+                                     '    WHERE airline_iata_code = %s '
+                                     '      AND route_id = %s '
+                                     '      AND scheduled_begin = %s;',
+                                     (self.carrier, self.route.route_id, scheduled_begin))
+                flight_data = await cursor.fetchone()
+            self.event_id = flight_data[0]
+        return self.event_id
+
     def astimezone(self, timezone='local'):
-        """Change event's itineraries to given timezone"""
+        """Change event's itineraries to given timezone, flights read from a roster have no scheduled one"""
         if timezone != 'local':
-            self.scheduled_itinerary.astimezone(begin_timezone=timezone,
-                                                end_timezone=timezone)
-            if self.actual_itinerary:
-                self.actual_itinerary.astimezone(begin_timezone=timezone,
-                                                 end_timezone=timezone)
+            if self._scheduled_itinerary:
+                self._scheduled_itinerary.astimezone(begin_timezone=timezone,
+                                                     end_timezone=timezone)
+            if self._actual_itinerary:
+                self._actual_itinerary.astimezone(begin_timezone=timezone,
+                                                  end_timezone=timezone)
         else:
-            self.scheduled_itinerary.astimezone(begin_timezone=self.route.origin.timezone,
-                                                end_timezone=self.route.destination.timezone)
-            if self.actual_itinerary:
-                self.actual_itinerary.astimezone(begin_timezone=self.route.origin.timezone,
-                                                 end_timezone=self.route.destination.timezone)
+            if self._scheduled_itinerary:
+                self._scheduled_itinerary.astimezone(begin_timezone=self.route.origin.timezone,
+                                                     end_timezone=self.route.destination.timezone)
+            if self._actual_itinerary:
+                self._actual_itinerary.astimezone(begin_timezone=self.route.origin.timezone,
+                                                  end_timezone=self.route.destination.timezone)
+        self.changed()
 
     def __str__(self):
         template = """
@@ -798,10 +1532,39 @@ class DutyDay(object):
     but rather the collection of Events to be served within a given Duty.
     """
 
+    __slots__ = ('_events', '_credits', '_report', '_cache', '_trip')
+
     def __init__(self) -> None:
-        self.events = []
+        self._events = MemberList(self)
         self._credits = {}
         self._report = None
+        self._cache = None
+        self._trip = None
+
+    @property
+    def events(self) -> list:
+        return self._events
+
+    @events.setter
+    def events(self, events: list):
+        self._events[:] = events
+
+    def changed(self):
+        """Forget memoised values, the trip holding this duty day forgets its own too"""
+        self._cache = None
+        if self._trip:
+            self._trip.changed()
+
+    def _joined(self, event):
+        event._holders = event.holders + (self,) if event._holders is not None else self
+
+    def _left(self, event):
+        holders = event.holders
+        for position, holder in enumerate(holders):
+            if holder is self:
+                holders = holders[:position] + holders[position + 1:]
+                event._holders = holders if len(holders) > 1 else (holders[0] if holders else None)
+                break
 
     @property
     def begin(self):
@@ -811,27 +1574,41 @@ class DutyDay(object):
     def end(self):
         return self.events[-1].end
 
-    @property
+    @memoised
     def report(self):
         return self._report if self._report else self.events[0].report
 
+    @report.setter
+    def report(self, report: datetime):
+        """Report at some other time than the first event's"""
+        self._report = report
+        self.changed()
+
     @property
     def release(self):
         return self.events[-1].release
 
     @property
+    def report_minutes(self) -> int:
+        return to_epoch_minutes(self._report) if self._report else self.events[0].report_minutes
+
+    @property
+    def release_minutes(self) -> int:
+        return self.events[-1].release_minutes
+
+    @memoised
     def delay(self):
-        delay = Duration.from_timedelta(self.begin - self.report) - Duration(60)
+        delay = Duration(self.events[0].begin_minutes - self.report_minutes) - Duration(60)
         return delay
 
-    @property
+    @memoised
     def duration(self):
         """How long is the DutyDay"""
-        return Duration.from_timedelta(self.release - self.report)
+        return Duration(self.release_minutes - self.report_minutes)
 
-    @property
+    @memoised
     def turns(self):
-        return [Duration.from_timedelta(j.begin - i.end) for i, j in zip(self.events[:-1], self.events[1:])]
+        return [Duration(j.begin_minutes - i.end_minutes) for i, j in zip(self.events[:-1], self.events[1:])]
 
     @property
     def origin(self):
@@ -869,9 +1646,7 @@ class DutyDay(object):
             all_events = self.events + other.events
         else:
             all_events = other.events + self.events
-        self.events = []
-        for event in all_events:
-            self.events.append(event)
+        self.events = all_events
 
     def save_to_db(self, container_trip):
         with CursorFromConnectionPool() as cursor:
@@ -902,6 +1677,54 @@ class DutyDay(object):
                            'WHERE duty_day_id = %s;',
                            (release, flight_to_trip_id))
 
+    @classmethod
+    def save_many(cls, cursor, trips: list) -> None:
+        """Store the duty_days rows for every flight in trips with a single multi row INSERT
+
+        All flights should have been stored already. As save_to_db does, report is kept in the row for the
+        duty day's first flight and rel in the row for its last one"""
+        duty_days_data = dict()
+        for trip in trips:
+            for duty_day in trip.duty_days:
+                report = duty_day.report.astimezone(pytz.utc).replace(tzinfo=None)
+                release = duty_day.release.astimezone(pytz.utc).replace(tzinfo=None)
+                for flight in duty_day.events:
+                    key = (flight.event_id, trip.number, trip.dated)
+                    if key not in duty_days_data:
+                        duty_days_data[key] = [report, None, flight.dh]
+                    report = None
+                duty_days_data[key][1] = release
+        if duty_days_data:
+            execute_values(cursor,
+                           'INSERT INTO public.duty_days('
+                           '            flight_id, trip_id, trip_date, '
+                           '            report, rel, dh) '
+                           'VALUES %s '
+                           'ON CONFLICT DO NOTHING;',
+                           [key + tuple(duty_day_data) for key, duty_day_data in duty_days_data.items()],
+                           page_size=len(duty_days_data))
+
+    async def save_to_db_async(self, cursor, container_trip):
+        """Same as save_to_db, for the asyncio database layer, within the given cursor's transaction"""
+        report = self.report.astimezone(pytz.utc).replace(tzinfo=None)
+        release = self.release.astimezone(pytz.utc).replace(tzinfo=None)
+        duty_days_data = dict()
+        for flight in self.events:
+            if not flight.event_id:
+                # First store flight in DB
+                await flight.save_to_db_async(cursor)
+            key = (flight.event_id, container_trip.number, container_trip.dated)
+            if key not in duty_days_data:
+                duty_days_data[key] = [report, None, flight.dh]
+            report = None
+        duty_days_data[key][1] = release
+        await cursor.executemany('INSERT INTO public.duty_days('
+                                 '            flight_id, trip_id, trip_date, '
+                                 '            report, rel, dh) '
+                                 'VALUES (%s, %s, %s, %s, %s, %s) '
+                                 'ON CONFLICT DO NOTHING;',
+                                 [key + tuple(duty_day_data) for key, duty_day_data in duty_days_data.items()])
+
     def astimezone(self, timezone='local'):
         """Change event's itineraries to given timezone"""
         for event in self.events:
@@ -935,6 +1758,33 @@ class DutyDay(object):
         return body
 
 
+# Every column needed to build a trip, its duty days and flights, their routes, airports and equipments
+TRIP_GRAPH_SELECT = ('SELECT trips.number, trips.dated, trips.crew_position, trips.crew_base, '
+                     '       bases.continent, bases.tz_city, bases.viaticum_zone, '
+                     '       duty_days.report, duty_days.rel, duty_days.dh, '
+                     '       flights.flight_id, flights.airline_iata_code, flights.route_id, flights.scheduled_begin, '
+                     '       flights.scheduled_block, flights.equipment, flights.actual_begin, flights.actual_block, '
+                     '       routes.name, routes.origin, routes.destination, '
+                     '       origins.continent, origins.tz_city, origins.viaticum_zone, '
+                     '       destinations.continent, destinations.tz_city, destinations.viaticum_zone, '
+                     '       equipments.cabin_members '
+                     'FROM public.trips '
+                     '    INNER JOIN public.airports AS bases ON bases.iata_code = trips.crew_base '
+                     '    LEFT JOIN (public.duty_days '
+                     '               INNER JOIN public.flights ON flights.flight_id = duty_days.flight_id '
+                     '               INNER JOIN public.routes ON routes.route_id = flights.route_id '
+                     '               INNER JOIN public.airports AS origins ON origins.iata_code = routes.origin '
+                     '               INNER JOIN public.airports AS destinations '
+                     '                       ON destinations.iata_code = routes.destination '
+                     '               LEFT JOIN public.equipments ON equipments.airplane_code = flights.equipment) '
+                     '           ON duty_days.trip_id = trips.number AND duty_days.trip_date = trips.dated ')
+TRIP_GRAPH_ORDER = 'ORDER BY trips.dated, trips.number, flights.scheduled_begin;'
+TRIP_GRAPH_BY_KEYS = (TRIP_GRAPH_SELECT +
+                      'WHERE (trips.number, trips.dated) IN '
+                      '      (SELECT * FROM unnest(%s::integer[], %s::date[])) ' +
+                      TRIP_GRAPH_ORDER)
+
+
 class Trip(object):
     """
     A trip_match is a collection of DutyDays for a specific crew_base
@@ -949,38 +1799,95 @@ class Trip(object):
         self.crew_position = crew_position
         self.trip_base = trip_base
         self._credits = {}
-        self.duty_days = []
+        self._cache = None
+        self._duty_days = MemberList(self)
 
     @classmethod
     def load_by_id(cls, trip_number: str, dated):
-        trip = Trip.load_trip_info(trip_number=trip_number, dated=dated)
+        """Load the whole trip, with its duty days and flights, with a single query"""
+        trips = cls.load_many([(trip_number, dated)])
+        if not trips:
+            raise UnstoredTrip(trip_number=trip_number, dated=dated)
+        return trips[0]
+
+    @classmethod
+    def load_many(cls, trip_keys) -> list:
+        """Load all trips for the given (number, dated) trip_keys with a single query
+
+        Trips not stored are left out, trips are sorted by dated and number"""
+        trip_keys = list(trip_keys)
+        if not trip_keys:
+            return []
         with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT duty_days.flight_id, report, rel, trip_date, dh FROM public.duty_days '
-                           'INNER JOIN flights ON duty_days.flight_id = flights.flight_id '
-                           'WHERE trip_id = %s AND trip_date = %s '
-                           'ORDER BY scheduled_begin ASC;',
-                           (int(trip_number), dated))
-            trip_data = cursor.fetchall()
-            duty_day = None
-            if trip_data:
-                for row in trip_data:
-                    if row[1]:
-                        # Beginning of a DutyDay
-                        duty_day = DutyDay()
-                    flight = Flight.load_from_db_by_id(flight_id=row[0])
-                    if not flight:
-                        print("Enter flight as DDMMYYYY AC#### ORG HHMM DES HHMM EQU")
-                        flight_data = input("v.gr. 23062018 0403 MEX 0700 JFK 1300 7S8")
-                        flight = Flight.from_string(flight_data)
-                        flight.save_to_db()
-                    if row[4]:
-                        # dh boolean indicates this flight is a DH flight
-                        flight.dh = True
-                    duty_day.append(flight)
-                    if row[2]:
-                        # Ending of a DutyDay
-                        trip.append(duty_day)
-        return trip
+            cursor.execute(TRIP_GRAPH_BY_KEYS, cls.trip_keys_arguments(trip_keys))
+            trips_data = cursor.fetchall()
+        return list(cls.from_graph_rows(trips_data))
+
+    @classmethod
+    async def load_by_id_async(cls, trip_number: str, dated):
+        """Same as load_by_id, for the asyncio database layer"""
+        trips = await cls.load_many_async([(trip_number, dated)])
+        if not trips:
+            raise UnstoredTrip(trip_number=trip_number, dated=dated)
+        return trips[0]
+
+    @classmethod
+    async def load_many_async(cls, trip_keys) -> list:
+        """Same as load_many, for the asyncio database layer"""
+        trip_keys = list(trip_keys)
+        if not trip_keys:
+            return []
+        async with AsyncCursorFromConnectionPool() as cursor:
+            await cursor.execute(TRIP_GRAPH_BY_KEYS, cls.trip_keys_arguments(trip_keys))
+            trips_data = await cursor.fetchall()
+        return list(cls.from_graph_rows(trips_data))
+
+    @staticmethod
+    def trip_keys_arguments(trip_keys: list) -> tuple:
+        """The numbers and the dates within (number, dated) trip_keys, as unnest takes them"""
+        return [int(number) for number, dated in trip_keys], [dated for number, dated in trip_keys]
+
+    @classmethod
+    def from_graph_rows(cls, trips_data):
+        """Yield a Trip for each run of consecutive TRIP_GRAPH_SELECT rows sharing number and dated
+
+        Rows should be ordered as TRIP_GRAPH_ORDER does. Rows may be any iterable, i.e. a server side cursor,
+        so a trip is yielded as soon as its last row is read"""
+        trip = None
+        duty_day = None
+        for row in trips_data:
+            if not trip or (int(trip.number), trip.dated) != (row[0], row[1]):
+                if trip:
+                    yield trip
+                trip_base = Airport._airports.get(row[3]) or \
+                    Airport(iata_code=row[3], timezone=pytz.timezone(row[4] + '/' + row[5]), viaticum=row[6])
+                trip = cls(number=str(row[0]).zfill(4), dated=row[1], crew_position=row[2], trip_base=trip_base)
+                duty_day = None
+            if row[10] is None:
+                # Trip has no duty days
+                continue
+            if row[7]:
+                # Beginning of a DutyDay
+                duty_day = DutyDay()
+            route = Route._routes_by_id.get(row[12])
+            if not route:
+                origin = Airport._airports.get(row[19]) or \
+                    Airport(iata_code=row[19], timezone=pytz.timezone(row[21] + '/' + row[22]), viaticum=row[23])
+                destination = Airport._airports.get(row[20]) or \
+                    Airport(iata_code=row[20], timezone=pytz.timezone(row[24] + '/' + row[25]), viaticum=row[26])
+                route = Route(name=row[18], origin=origin, destination=destination, route_id=row[12])
+            if row[15] not in Equipment._equipments:
+                Equipment(airplane_code=row[15], cabin_members=row[27])
+            flight = Flight.from_row(row[10:18], route)
+            if row[9]:
+                # dh boolean indicates this flight is a DH flight
+                flight.dh = True
+            duty_day.append(flight)
+            if row[8]:
+                # Ending of a DutyDay
+                trip.append(duty_day)
+        if trip:
+            yield trip
 
     @classmethod
     def load_trip_info(cls, trip_number: str, dated):
@@ -1001,6 +1908,34 @@ class Trip(object):
             else:
                 raise UnstoredTrip(trip_number=trip_number, dated=dated)
 
+    @classmethod
+    async def load_trip_info_async(cls, trip_number: str, dated):
+        """Same as load_trip_info, for the asyncio database layer"""
+        async with AsyncCursorFromConnectionPool() as cursor:
+            await cursor.execute('SELECT * '
+                                 'FROM trips '
+                                 'WHERE number = %s AND dated = %s ',
+                                 (int(trip_number), dated))
+            trip_data = await cursor.fetchone()
+        if trip_data:
+            airport = await Airport.load_from_db_async(trip_data[7])
+            return cls(number=trip_number, dated=trip_data[1], crew_position=trip_data[6], trip_base=airport)
+        else:
+            raise UnstoredTrip(trip_number=trip_number, dated=dated)
+
+    @classmethod
+    async def fetch_stored_keys_async(cls, trip_keys) -> set:
+        """Return which of the given (number, dated) trip_keys are already stored, numbers as int"""
+        trip_keys = list(trip_keys)
+        if not trip_keys:
+            return set()
+        async with AsyncCursorFromConnectionPool() as cursor:
+            await cursor.execute('SELECT number, dated FROM public.trips '
+                                 '    INNER JOIN unnest(%s::integer[], %s::date[]) AS keys (number, dated) '
+                                 '    USING (number, dated);',
+                                 cls.trip_keys_arguments(trip_keys))
+            return {(number, dated) for number, dated in await cursor.fetchall()}
+
     @property
     def report(self):
         return self.duty_days[0].report
@@ -1010,25 +1945,36 @@ class Trip(object):
         return self.duty_days[-1].release
 
     @property
+    def report_minutes(self) -> int:
+        return self.duty_days[0].report_minutes
+
+    @property
+    def release_minutes(self) -> int:
+        return self.duty_days[-1].release_minutes
+
+    @memoised
     def rests(self):
         """Returns a list of all calculated rests between each duty_day"""
-        return [Duration.from_timedelta(j.report - i.release) for i, j in zip(self.duty_days[:-1], self.duty_days[1:])]
+        return [Duration(j.report_minutes - i.release_minutes) for i, j in zip(self.duty_days[:-1], self.duty_days[1:])]
 
     @property
     def layovers(self):
         """Returns a list of all layover stations """
         return [duty_day.events[-1].destination for duty_day in self.duty_days]
 
-    @property
+    @memoised
     def duration(self):
         "Returns total time away from base or TAFB"
-        return Duration.from_timedelta(self.release - self.report)
+        return Duration(self.release_minutes - self.report_minutes)
+
+    @memoised
+    def _elapsed_dates(self):
+        delta = self.release.date() - self.report.date()
+        return [self.report.date() + timedelta(days=i) for i in range(delta.days + 1)]
 
     def get_elapsed_dates(self):
         """Returns a list of dates in range [self.report, self.release]"""
-        delta = self.release.date() - self.report.date()
-        all_dates = [self.report.date() + timedelta(days=i) for i in range(delta.days + 1)]
-        return all_dates
+        return self._elapsed_dates
 
     def compute_credits(self, creditator=None):
 
@@ -1046,6 +1992,25 @@ class Trip(object):
             self._credits.update({'total': self._credits['block'] + self._credits['dh'],
                                   'tafb': self.duration})
 
+    @property
+    def duty_days(self) -> list:
+        return self._duty_days
+
+    @duty_days.setter
+    def duty_days(self, duty_days: list):
+        self._duty_days[:] = duty_days
+
+    def changed(self):
+        """Forget memoised values"""
+        self._cache = None
+
+    def _joined(self, duty_day):
+        duty_day._trip = self
+
+    def _left(self, duty_day):
+        if duty_day._trip is self:
+            duty_day._trip = None
+
     def append(self, duty_day):
         """Simply append a duty_day"""
         self.duty_days.append(duty_day)
@@ -1122,41 +2087,184 @@ class Trip(object):
         """Save to db should only be concerned with saving a trip regardless of
            its previous status, i.e. if it has been stored before or not
 
+        The whole trip is saved within a single transaction, so it is never left half saved
         """
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT * FROM public.trips '
-                           'WHERE trips.number=%s AND trips.dated=%s', (self.number, self.dated))
-            trip_data = cursor.fetchone()
+        with UnitOfWork():
+            with CursorFromConnectionPool() as cursor:
+                cursor.execute('SELECT * FROM public.trips '
+                               'WHERE trips.number=%s AND trips.dated=%s', (self.number, self.dated))
+                trip_data = cursor.fetchone()
+
+                if not trip_data:
+                    cursor.execute('INSERT INTO public.trips (number, dated, crew_position, crew_base) '
+                                   'VALUES (%s, %s, %s, %s);', (self.number, self.dated, self.crew_position,
+                                                                self.trip_base.iata_code))
+                else:
+                    raise PreviouslyStoredTrip
 
-            if not trip_data:
-                cursor.execute('INSERT INTO public.trips (number, dated, crew_position, crew_base) '
-                               'VALUES (%s, %s, %s, %s);', (self.number, self.dated, self.crew_position,
-                                                            self.trip_base.iata_code))
-            else:
-                raise PreviouslyStoredTrip
+            for duty_day in self.duty_days:
+                duty_day.save_to_db(self)
 
-        for duty_day in self.duty_days:
-            duty_day.save_to_db(self)
+    @classmethod
+    def save_many(cls, trips: list) -> list:
+        """Save all trips with a few multi row INSERTs inside a single transaction
+
+        Previously stored trips are skipped, as save_to_db would raise PreviouslyStoredTrip for them.
+        New flights are stored once, even if many trips share them, and their flight_id is set on every
+        Flight object. Returns the trips that were saved"""
+        if not trips:
+            return []
+        new_flights = [flight for trip in trips for duty_day in trip.duty_days for flight in duty_day.events
+                       if not flight.event_id]
+        try:
+            with UnitOfWork(), CursorFromConnectionPool() as cursor:
+                stored_keys = execute_values(cursor,
+                                             'INSERT INTO public.trips (number, dated, crew_position, crew_base) '
+                                             'VALUES %s '
+                                             'ON CONFLICT DO NOTHING '
+                                             'RETURNING number, dated;',
+                                             [(trip.number, trip.dated, trip.crew_position, trip.trip_base.iata_code)
+                                              for trip in trips],
+                                             page_size=len(trips), fetch=True)
+                stored_keys = {(int(number), dated) for number, dated in stored_keys}
+                saved_trips = []
+                for trip in trips:
+                    if (int(trip.number), trip.dated) in stored_keys:
+                        # A trip repeated within trips is stored only once
+                        stored_keys.remove((int(trip.number), trip.dated))
+                        saved_trips.append(trip)
+                Flight.save_many(cursor, [flight for trip in saved_trips for duty_day in trip.duty_days
+                                          for flight in duty_day.events if not flight.event_id])
+                DutyDay.save_many(cursor, saved_trips)
+        except Exception:
+            # Nothing was stored, flights should not keep their rolled back ids
+            for flight in new_flights:
+                flight.event_id = None
+            raise
+        return saved_trips
+
+    async def save_to_db_async(self):
+        """Same as save_to_db, for the asyncio database layer
+
+        The whole trip is saved within a single transaction, raises PreviouslyStoredTrip if it was stored before"""
+        new_flights = [flight for duty_day in self.duty_days for flight in duty_day.events if not flight.event_id]
+        try:
+            async with AsyncCursorFromConnectionPool() as cursor:
+                await cursor.execute('INSERT INTO public.trips (number, dated, crew_position, crew_base) '
+                                     'VALUES (%s, %s, %s, %s) '
+                                     'ON CONFLICT DO NOTHING '
+                                     'RETURNING number;',
+                                     (int(self.number), self.dated, self.crew_position, self.trip_base.iata_code))
+                if not await cursor.fetchone():
+                    raise PreviouslyStoredTrip
+                for duty_day in self.duty_days:
+                    await duty_day.save_to_db_async(cursor, self)
+        except Exception:
+            # Nothing was stored, flights should not keep their rolled back ids
+            for flight in new_flights:
+                flight.event_id = None
+            raise
 
 
 class Line(object):
-    """ Represents an ordered sequence of events for a given month"""
+    """ Represents an ordered sequence of events for a given month
+
+    duties are kept ordered by report time, together with their report and release times as epoch minutes,
+    so overlapping duties and the next duty are found by bisection instead of scanning the whole line.
+    Duties changed after being added should be set again, i.e. line[-1] = trip, or the line sorted"""
 
     def __init__(self, month: str, year: str, crew_member: CrewMember = None) -> None:
-        self.duties = []
+        self._duties = []
         self.month = month
         self.year = year
         self.crew_member = crew_member
         self._credits = {}
+        self._reports = []
+        self._releases = []
+        # Latest release among duties[:i + 1], ascending even when duties overlap
+        self._latest_releases = []
+        self._duties_by_id = {}
+
+    @property
+    def duties(self) -> tuple:
+        """All duties in report order, change them thru the line itself so it stays ordered"""
+        return tuple(self._duties)
+
+    @staticmethod
+    def duty_id(duty):
+        """Trips are identified by their number, any other duty by its event_id"""
+        return duty.number if isinstance(duty, Trip) else getattr(duty, 'event_id', None)
 
     def append(self, duty):
-        self.duties.append(duty)
+        """Insert duty after all others reporting at or before it"""
+        report = duty.report_minutes
+        index = bisect_right(self._reports, report)
+        self._duties.insert(index, duty)
+        self._reports.insert(index, report)
+        self._releases.insert(index, duty.release_minutes)
+        # Worked out by _update_latest_releases
+        self._latest_releases.insert(index, None)
+        self._update_latest_releases(index)
+        duty_id = self.duty_id(duty)
+        if duty_id is not None:
+            self._duties_by_id.setdefault(duty_id, []).append(duty)
+        return index
+
+    def _remove(self, index: int):
+        """Take out the duty at index, returns it"""
+        duty = self._duties.pop(index)
+        del self._reports[index]
+        del self._releases[index]
+        del self._latest_releases[index]
+        self._update_latest_releases(index)
+        duty_id = self.duty_id(duty)
+        same_id = self._duties_by_id.get(duty_id, [])
+        for position, other in enumerate(same_id):
+            if other is duty:
+                del same_id[position]
+                break
+        if not same_id:
+            self._duties_by_id.pop(duty_id, None)
+        return duty
+
+    def _update_latest_releases(self, index):
+        """Work out _latest_releases again from index onward, after a duty was inserted or removed at index
+
+        Beyond index, they are the same as before once one of them is"""
+        latest = self._latest_releases[index - 1] if index else None
+        for position in range(index, len(self._releases)):
+            release = self._releases[position]
+            latest = release if latest is None else max(latest, release)
+            if self._latest_releases[position] == latest:
+                break
+            self._latest_releases[position] = latest
+
+    def _overlapping(self, begin: int, end: int) -> list:
+        last = bisect_left(self._reports, end)
+        # Duties before first were all released by begin
+        first = bisect_right(self._latest_releases, begin, 0, last)
+        return [self._duties[index] for index in range(first, last) if self._releases[index] > begin]
+
+    def overlapping(self, begin: datetime, end: datetime) -> list:
+        """Duties worked at some time within (begin, end), in report order"""
+        return self._overlapping(to_epoch_minutes(begin), to_epoch_minutes(end))
+
+    def conflicts(self, duty, minimum_rest: Duration = Duration(0)) -> list:
+        """Duties, other than duty, worked within minimum_rest of it"""
+        return [other for other in self._overlapping(duty.report_minutes - minimum_rest.minutes,
+                                                     duty.release_minutes + minimum_rest.minutes)
+                if other is not duty]
+
+    def next_duty(self, after: datetime):
+        """First duty reporting at or after the given time, None if there is none"""
+        index = bisect_left(self._reports, to_epoch_minutes(after))
+        return self._duties[index] if index < len(self._duties) else None
 
     def compute_credits(self, creditator=None):
         self._credits['block'] = Duration(0)
         self._credits['dh'] = Duration(0)
         self._credits['daily'] = Duration(0)
-        for duty in self.duties:
+        for duty in self._duties:
             try:
                 cr = duty.compute_credits()
                 self._credits['block'] += duty._credits['block']
@@ -1172,38 +2280,48 @@ class Line(object):
         return credits_list
 
     def return_duty(self, dutyId):
-        """Return the corresponding duty for the given dutyId"""
-        return (duty for duty in self.duties if duty.id == dutyId)
+        """Return the first duty with the given trip number or event_id, None if there is none"""
+        same_id = self._duties_by_id.get(dutyId)
+        return same_id[0] if same_id else None
 
     def sort(self):
-        """Sort all duties by its report time"""
-        self.duties.sort(key=lambda duty: duty.report)
+        """Sort all duties by its report time, i.e. after some of them were changed"""
+        duties = self._duties
+        self._duties, self._reports, self._releases, self._latest_releases = [], [], [], []
+        self._duties_by_id = {}
+        for duty in sorted(duties, key=lambda duty: duty.report_minutes):
+            self.append(duty)
 
     def __delitem__(self, key):
-        del self.duties[key]
+        indices = range(len(self._duties))[key]
+        for index in sorted(indices if isinstance(key, slice) else [indices], reverse=True):
+            self._remove(index)
 
     def __getitem__(self, key):
         try:
-            item = self.duties[key]
+            item = self._duties[key]
         except:
             item = None
         return item
 
     def __setitem__(self, key, value):
-        self.duties[key] = value
+        """Replace the duty, or slice of duties, at key, values are moved to keep the line in report order"""
+        del self[key]
+        for duty in value if isinstance(key, slice) else [value]:
+            self.append(duty)
 
     def __iter__(self):
-        return iter(self.duties)
+        return iter(self._duties)
 
     def astimezone(self, timezone: pytz.timezone) -> None:
-        for duty in self.duties:
+        for duty in self._duties:
             if isinstance(duty, Trip):
                 duty.astimezone(timezone)
 
     def return_duty_days(self):
         """Turn all dutydays to a list called dd """
         dd = []
-        for element in self.duties:
+        for element in self._duties:
             if isinstance(element, Trip):
                 dd.extend(element.duty_days)
             elif isinstance(element, DutyDay):
@@ -1211,4 +2329,4 @@ class Line(object):
         return dd
 
     def __str__(self):
-        return "\n".join(str(d) for d in self.duties)
+        return "\n".join(str(d) for d in self._duties)
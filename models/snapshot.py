@@ -0,0 +1,338 @@
+"""Compact binary snapshots of trips, duty days, events and lines, read and written without the database
+
+A snapshot is a header followed by records, each one starting with a tag byte. Airports, routes and
+equipments are written only once, as definition records, the first time something uses them, and
+referred to afterwards by their position. Times are UTC minutes from the epoch, displayed timezones
+are not kept. Records are read back one at a time, so snapshots may be written and read while streaming
+
+    with SnapshotWriter(open('may.snapshot', 'wb')) as snapshot:
+        for trip in trips:
+            snapshot.write(trip)
+
+    trips = list(load('may.snapshot'))
+"""
+import struct
+from datetime import date
+
+import pytz
+
+from AdminApp.exceptions import SnapshotError
+from models.scheduleclasses import Airport, Route, Equipment, EpochItinerary, Event, GroundDuty, Flight, DutyDay, \
+    Trip, Line, CrewMember
+from models.timeclasses import from_epoch_minutes
+
+MAGIC = b'ATSNAP'
+VERSION = 1
+HEADER = struct.Struct('<6sH')
+
+AIRPORT, ROUTE, EQUIPMENT, EVENT, GROUND_DUTY, FLIGHT, DUTY_DAY, TRIP, LINE = b'ARQEGFDTL'
+
+# Stands for None in integer fields
+NULL = -2 ** 63
+NULL_STRING = 0xFFFF
+
+LENGTH = struct.Struct('<H')
+ROUTE_FIELDS = struct.Struct('<IIq')
+EQUIPMENT_FIELDS = struct.Struct('<i')
+# route, event_id and scheduled itinerary
+EVENT_FIELDS = struct.Struct('<Iqqq')
+GROUND_DUTY_FIELDS = struct.Struct('<i')
+# actual itinerary and dh
+FLIGHT_FIELDS = struct.Struct('<qq?')
+TRIP_FIELDS = struct.Struct('<iiH')
+DUTY_DAY_FIELDS = struct.Struct('<qH')
+LINE_FIELDS = struct.Struct('<I?')
+CREW_MEMBER_FIELDS = struct.Struct('<iq')
+
+
+def itinerary_minutes(itinerary) -> tuple:
+    return (NULL, NULL) if itinerary is None else (itinerary.begin_minutes, itinerary.end_minutes)
+
+
+def itinerary_from_minutes(begin: int, end: int):
+    return None if begin == NULL else EpochItinerary.from_minutes(begin, end)
+
+
+class SnapshotWriter(object):
+    """Write Trips, DutyDays, Events and Lines to a binary file object"""
+
+    def __init__(self, file):
+        self.file = file
+        # Routes and equipments can't be hashed, all three are kept by id together with their position
+        self.airports = dict()
+        self.routes = dict()
+        self.equipments = dict()
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        self.file.close()
+
+    def write_string(self, value: str):
+        if value is None:
+            self.file.write(LENGTH.pack(NULL_STRING))
+        else:
+            encoded = str(value).encode('utf-8')
+            self.file.write(LENGTH.pack(len(encoded)))
+            self.file.write(encoded)
+
+    def airport(self, airport: Airport) -> int:
+        """Position of airport in the snapshot, defining it if it is the first time it is used"""
+        if id(airport) not in self.airports:
+            self.file.write(bytes((AIRPORT,)))
+            self.write_string(airport.iata_code)
+            self.write_string(airport.timezone.zone if airport.timezone else None)
+            self.write_string(airport.viaticum)
+            self.airports[id(airport)] = (len(self.airports), airport)
+        return self.airports[id(airport)][0]
+
+    def route(self, route: Route) -> int:
+        if id(route) not in self.routes:
+            origin = self.airport(route.origin)
+            destination = self.airport(route.destination)
+            self.file.write(bytes((ROUTE,)))
+            self.write_string(route.name)
+            self.file.write(ROUTE_FIELDS.pack(origin, destination, NULL if route.route_id is None else route.route_id))
+            self.routes[id(route)] = (len(self.routes), route)
+        return self.routes[id(route)][0]
+
+    def equipment(self, equipment: Equipment) -> int:
+        """-1 for no equipment"""
+        if equipment is None:
+            return -1
+        if id(equipment) not in self.equipments:
+            self.file.write(bytes((EQUIPMENT,)))
+            self.write_string(equipment.airplane_code)
+            self.file.write(EQUIPMENT_FIELDS.pack(equipment.cabin_members or 0))
+            self.equipments[id(equipment)] = (len(self.equipments), equipment)
+        return self.equipments[id(equipment)][0]
+
+    def write_event(self, event: Event):
+        route = self.route(event.route)
+        equipment = self.equipment(event.equipment) if isinstance(event, GroundDuty) else -1
+        tag = FLIGHT if isinstance(event, Flight) else GROUND_DUTY if isinstance(event, GroundDuty) else EVENT
+        self.file.write(bytes((tag,)))
+        self.file.write(EVENT_FIELDS.pack(route, NULL if event.event_id is None else event.event_id,
+                                          *itinerary_minutes(event.scheduled_itinerary)))
+        if tag != EVENT:
+            self.file.write(GROUND_DUTY_FIELDS.pack(equipment))
+            self.write_string(event.position)
+        if tag == FLIGHT:
+            self.file.write(FLIGHT_FIELDS.pack(*itinerary_minutes(event.actual_itinerary), bool(event.dh)))
+            self.write_string(event.carrier)
+
+    def write_duty_day(self, duty_day: DutyDay):
+        # Define everything the events use before the duty day record begins
+        for event in duty_day.events:
+            self.route(event.route)
+            if isinstance(event, GroundDuty):
+                self.equipment(event.equipment)
+        self.file.write(bytes((DUTY_DAY,)))
+        self.file.write(DUTY_DAY_FIELDS.pack(duty_day.report_minutes if duty_day._report else NULL,
+                                             len(duty_day.events)))
+        for event in duty_day.events:
+            self.write_event(event)
+
+    def write_trip(self, trip: Trip):
+        trip_base = self.airport(trip.trip_base) if trip.trip_base else -1
+        for duty_day in trip.duty_days:
+            for event in duty_day.events:
+                self.route(event.route)
+                if isinstance(event, GroundDuty):
+                    self.equipment(event.equipment)
+        self.file.write(bytes((TRIP,)))
+        self.write_string(trip.number)
+        self.write_string(trip.crew_position)
+        self.file.write(TRIP_FIELDS.pack(trip.dated.toordinal(), trip_base, len(trip.duty_days)))
+        for duty_day in trip.duty_days:
+            self.write_duty_day(duty_day)
+
+    def write_line(self, line: Line):
+        """A line record is followed by the records of each of its duties"""
+        crew_member = line.crew_member
+        if crew_member and crew_member.base:
+            self.airport(crew_member.base)
+        self.file.write(bytes((LINE,)))
+        self.write_string(line.month)
+        self.write_string(line.year)
+        self.file.write(LINE_FIELDS.pack(len(line.duties), crew_member is not None))
+        if crew_member:
+            self.write_string(crew_member.crew_member_id)
+            self.write_string(crew_member.name)
+            self.write_string(crew_member.position)
+            self.write_string(crew_member.crew_group)
+            self.file.write(CREW_MEMBER_FIELDS.pack(self.airport(crew_member.base) if crew_member.base else -1,
+                                                    NULL if crew_member.seniority is None else crew_member.seniority))
+        for duty in line.duties:
+            self.write(duty)
+
+    def write(self, duty):
+        """Write a Trip, DutyDay, Event or Line"""
+        if isinstance(duty, Trip):
+            self.write_trip(duty)
+        elif isinstance(duty, DutyDay):
+            self.write_duty_day(duty)
+        elif isinstance(duty, Line):
+            self.write_line(duty)
+        else:
+            self.write_event(duty)
+
+
+class SnapshotReader(object):
+    """Iterate over the Trips, DutyDays, Events and Lines stored in a binary file object"""
+
+    def __init__(self, file):
+        self.file = file
+        self.airports = list()
+        self.routes = list()
+        self.equipments = list()
+        magic, version = HEADER.unpack(self.read(HEADER.size))
+        if magic != MAGIC:
+            raise SnapshotError("Not a snapshot file")
+        if version != VERSION:
+            raise SnapshotError("Snapshot version {} can't be read, only version {}".format(version, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        self.file.close()
+
+    def read(self, size: int) -> bytes:
+        data = self.file.read(size)
+        if len(data) != size:
+            raise SnapshotError("Snapshot ended within a record")
+        return data
+
+    def unpack(self, fields: struct.Struct) -> tuple:
+        return fields.unpack(self.read(fields.size))
+
+    def read_string(self):
+        length, = self.unpack(LENGTH)
+        return None if length == NULL_STRING else self.read(length).decode('utf-8')
+
+    def read_airport(self):
+        iata_code = self.read_string()
+        zone = self.read_string()
+        viaticum = self.read_string()
+        self.airports.append(Airport(iata_code=iata_code, timezone=pytz.timezone(zone) if zone else None,
+                                     viaticum=viaticum))
+
+    def read_route(self):
+        name = self.read_string()
+        origin, destination, route_id = self.unpack(ROUTE_FIELDS)
+        self.routes.append(Route(name=name, origin=self.airports[origin], destination=self.airports[destination],
+                                 route_id=None if route_id == NULL else route_id))
+
+    def read_equipment(self):
+        airplane_code = self.read_string()
+        cabin_members, = self.unpack(EQUIPMENT_FIELDS)
+        self.equipments.append(Equipment(airplane_code=airplane_code, cabin_members=cabin_members))
+
+    def read_event(self, tag: int) -> Event:
+        route, event_id, begin, end = self.unpack(EVENT_FIELDS)
+        route = self.routes[route]
+        event_id = None if event_id == NULL else event_id
+        scheduled_itinerary = itinerary_from_minutes(begin, end)
+        if tag == EVENT:
+            return Event(route=route, scheduled_itinerary=scheduled_itinerary, event_id=event_id)
+        equipment, = self.unpack(GROUND_DUTY_FIELDS)
+        equipment = self.equipments[equipment] if equipment >= 0 else None
+        position = self.read_string()
+        if tag == GROUND_DUTY:
+            return GroundDuty(route=route, scheduled_itinerary=scheduled_itinerary, position=position,
+                              equipment=equipment, event_id=event_id)
+        begin, end, dh = self.unpack(FLIGHT_FIELDS)
+        actual_itinerary = itinerary_from_minutes(begin, end)
+        carrier = self.read_string()
+        return Flight(route=route, scheduled_itinerary=scheduled_itinerary, actual_itinerary=actual_itinerary,
+                      equipment=equipment, carrier=carrier, event_id=event_id, dh=dh, position=position)
+
+    def read_duty_day(self) -> DutyDay:
+        report, events = self.unpack(DUTY_DAY_FIELDS)
+        duty_day = DutyDay()
+        if report != NULL:
+            duty_day.report = from_epoch_minutes(report)
+        for _ in range(events):
+            duty_day.append(self.read_event(self.read(1)[0]))
+        return duty_day
+
+    def read_trip(self) -> Trip:
+        number = self.read_string()
+        crew_position = self.read_string()
+        dated, trip_base, duty_days = self.unpack(TRIP_FIELDS)
+        trip = Trip(number=number, dated=date.fromordinal(dated), crew_position=crew_position,
+                    trip_base=self.airports[trip_base] if trip_base >= 0 else None)
+        for _ in range(duty_days):
+            tag = self.read(1)[0]
+            if tag != DUTY_DAY:
+                raise SnapshotError("Trip {} dated {} is incomplete".format(number, trip.dated))
+            trip.append(self.read_duty_day())
+        return trip
+
+    def read_line(self) -> Line:
+        month = self.read_string()
+        year = self.read_string()
+        duties, has_crew_member = self.unpack(LINE_FIELDS)
+        crew_member = None
+        if has_crew_member:
+            crew_member_id = self.read_string()
+            name = self.read_string()
+            position = self.read_string()
+            crew_group = self.read_string()
+            base, seniority = self.unpack(CREW_MEMBER_FIELDS)
+            crew_member = CrewMember(crew_member_id=crew_member_id, name=name, pos=position, crew_group=crew_group,
+                                     base=self.airports[base] if base >= 0 else None,
+                                     seniority=None if seniority == NULL else seniority)
+        line = Line(month=month, year=year, crew_member=crew_member)
+        while len(line.duties) < duties:
+            duty = self.read_record(self.read(1)[0])
+            if duty is not None:
+                line.append(duty)
+        return line
+
+    def read_record(self, tag: int):
+        """The object in the record starting with tag, None for airport, route and equipment definitions"""
+        if tag == AIRPORT:
+            self.read_airport()
+        elif tag == ROUTE:
+            self.read_route()
+        elif tag == EQUIPMENT:
+            self.read_equipment()
+        elif tag == TRIP:
+            return self.read_trip()
+        elif tag == DUTY_DAY:
+            return self.read_duty_day()
+        elif tag == LINE:
+            return self.read_line()
+        elif tag in (EVENT, GROUND_DUTY, FLIGHT):
+            return self.read_event(tag)
+        else:
+            raise SnapshotError("Unknown record {!r}".format(chr(tag)))
+
+    def __iter__(self):
+        while True:
+            tag = self.file.read(1)
+            if not tag:
+                return
+            duty = self.read_record(tag[0])
+            if duty is not None:
+                yield duty
+
+
+def dump(duties, path) -> int:
+    """Write every Trip, DutyDay, Event or Line in duties to path, returns how many were written"""
+    written = 0
+    with SnapshotWriter(open(path, 'wb')) as snapshot:
+        for duty in duties:
+            snapshot.write(duty)
+            written += 1
+    return written
+
+
+def load(path):
+    """Yield each Trip, DutyDay, Event or Line stored in path"""
+    with SnapshotReader(open(path, 'rb')) as snapshot:
+        yield from snapshot
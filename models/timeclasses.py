@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta, date
+from functools import lru_cache
 import dateutil.relativedelta
+import pytz
 
 from models.modelsregex import duration_fmt
 
@@ -7,8 +9,36 @@ date_format = "%d%m%Y"
 time_format = "%H%M"
 datetime_format = date_format + ' ' + time_format
 
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+MINUTE = timedelta(minutes=1)
+# How many (instant, timezone) conversions are remembered, a month of flights needs far fewer
+CONVERSIONS_CACHED = 2 ** 17
+
+
+def to_epoch_minutes(dt: datetime) -> int:
+    """Minutes elapsed from the epoch to dt, naive datetimes are taken as UTC"""
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return (dt - EPOCH) // MINUTE
+
+
+@lru_cache(maxsize=CONVERSIONS_CACHED)
+def from_epoch_minutes(minutes: int, timezone=None) -> datetime:
+    """Aware datetime for the given minutes from the epoch, in UTC unless another timezone is given
+
+    Results are shared, datetimes being immutable"""
+    dt = EPOCH + timedelta(minutes=minutes)
+    return dt.astimezone(timezone) if timezone else dt
+
+
+@lru_cache(maxsize=CONVERSIONS_CACHED)
+def to_timezone(dt: datetime, timezone) -> datetime:
+    """Same as dt.astimezone(timezone), each instant is converted only once into each timezone"""
+    return dt.astimezone(timezone)
+
 
 class Duration(object):
+    __slots__ = ('minutes',)
     default_format = '<4'
 
     def __init__(self, minutes: int):
@@ -66,7 +96,7 @@ class Duration(object):
         return self.__format__(Duration.default_format)
 
     def __repr__(self):
-        return "{__class__.__name__}({minutes})".format(__class__=self.__class__, **self.__dict__)
+        return "{__class__.__name__}({minutes})".format(__class__=self.__class__, minutes=self.minutes)
 
     def __format__(self, format_spec):
         """Depending on format_spec value, a Duration can be printed as follow:
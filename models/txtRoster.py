@@ -117,7 +117,7 @@ class Liner(object):
                     self.line.append(trip)
                 else:
                     # Still the same trip_match
-                    trip = self.line.duties[-1]
+                    trip = self.line[-1]
                     previous_duty_day = trip[-1]
                     rest = duty_day.report - previous_duty_day.release
                     # Checking for events worked in different calendar days but belonging to the same duty day
@@ -125,7 +125,7 @@ class Liner(object):
                         trip.pop()
                         duty_day.merge(previous_duty_day)
                     trip.append(duty_day)
-                    self.line.duties[-1] = trip
+                    self.line[-1] = trip
 
             elif roster_day['name'] in ['VA', 'X', 'XX', 'TO']:
                 roster_day['begin'] = '0001'
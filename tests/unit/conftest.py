@@ -0,0 +1,139 @@
+import pytest
+
+from data.asyncdatabase import AsyncDatabase
+from data.database import Database
+
+
+class FakeCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, statement, arguments=None):
+        if isinstance(statement, bytes):
+            statement = statement.decode()
+        self.connection.statements.append(statement)
+        self.connection.arguments.append(arguments)
+        rows = self.connection.results.pop(0) if self.connection.results else []
+        if isinstance(rows, Exception):
+            raise rows
+        self.rows = list(rows)
+
+    def mogrify(self, template, arguments):
+        """Used by psycopg2.extras.execute_values for each row it sends"""
+        self.connection.values.append(tuple(arguments))
+        return template
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def __iter__(self):
+        while self.rows:
+            yield self.rows.pop(0)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        self.close()
+
+
+class FakeConnection(object):
+    """Records every statement executed, with its arguments and the rows sent thru execute_values
+
+    Each statement executed takes the next rows within results as its own, none if there are no more.
+    An exception within results is raised by the statement taking it instead"""
+    encoding = 'UTF8'
+
+    def __init__(self, results=None):
+        self.statements = []
+        self.arguments = []
+        self.values = []
+        self.results = results if results is not None else []
+        self.closed = 0
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.statements.append('COMMIT')
+
+    def rollback(self):
+        self.statements.append('ROLLBACK')
+
+
+@pytest.fixture
+def query_results():
+    """Rows to be returned by each statement executed on any connection handed out, in order"""
+    return []
+
+
+@pytest.fixture
+def connections(monkeypatch, query_results):
+    """Every connection handed out by the pool"""
+    handed_out = []
+
+    def get_connection():
+        handed_out.append(FakeConnection(query_results))
+        return handed_out[-1]
+
+    def return_connection(connection):
+        connection.returned = True
+
+    monkeypatch.setattr(Database, 'get_connection', staticmethod(get_connection))
+    monkeypatch.setattr(Database, 'return_connection', staticmethod(return_connection))
+    return handed_out
+
+
+class FakeAsyncCursor(FakeCursor):
+    """Same as FakeCursor, for the asyncio database layer"""
+
+    async def execute(self, statement, arguments=None):
+        super().execute(statement, arguments)
+
+    async def executemany(self, statement, arguments):
+        super().execute(statement, arguments)
+
+    async def fetchone(self):
+        return super().fetchone()
+
+    async def fetchall(self):
+        return super().fetchall()
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncConnection(FakeConnection):
+    def cursor(self, name=None):
+        return FakeAsyncCursor(self)
+
+    async def commit(self):
+        super().commit()
+
+    async def rollback(self):
+        super().rollback()
+
+
+@pytest.fixture
+def async_connections(monkeypatch, query_results):
+    """Every connection handed out by the asyncio pool"""
+    handed_out = []
+
+    async def get_connection():
+        handed_out.append(FakeAsyncConnection(query_results))
+        return handed_out[-1]
+
+    async def return_connection(connection):
+        connection.returned = True
+
+    monkeypatch.setattr(AsyncDatabase, 'get_connection', staticmethod(get_connection))
+    monkeypatch.setattr(AsyncDatabase, 'return_connection', staticmethod(return_connection))
+    return handed_out
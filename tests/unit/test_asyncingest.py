@@ -0,0 +1,98 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import psycopg
+import pytz
+
+from AdminApp.asyncingest import is_resolved, resolve, persist, IngestCounts, DONE
+from AdminApp.filereaders import trips_as_dict_from_file
+from AdminApp.objectbuilders import references_of
+from models.scheduleclasses import Airport, Route, Equipment, EpochItinerary, Flight, DutyDay, Trip
+
+pbs_file = Path(__file__).parent.parent / 'fixtures' / 'pbs_trips.txt'
+
+
+def test_is_resolved():
+    trips_as_dict = list(trips_as_dict_from_file(pbs_file, crew_position='SOB', trip_base='MEX'))
+    iata_codes, route_keys, airplane_codes = references_of(trips_as_dict)
+    for trip_dict in trips_as_dict:
+        assert is_resolved(trip_dict, iata_codes, route_keys, airplane_codes)
+    assert not is_resolved(trips_as_dict[1], iata_codes - {'JFK'}, route_keys, airplane_codes)
+    assert not is_resolved(trips_as_dict[0], iata_codes, route_keys, set())
+
+
+def trip_dict(number, equipment):
+    return {'number': number, 'dated': '01MAY2019', 'trip_base': 'ZQA',
+            'duty_days': [{'flights': [{'name': 'AM0300', 'origin': 'ZQA', 'destination': 'ZQB',
+                                        'equipment': equipment}]}]}
+
+
+def test_resolve(async_connections, query_results):
+    query_results.extend([[('ZQA', 'America', 'Mexico_City', 'low_cost'), ('ZQB', 'America', 'Cancun', 'low_cost')],
+                          [('Z1A', 9)],
+                          [(301, date(2019, 5, 1))],
+                          [(9931, '0300', 'ZQA', 'ZQB')]])
+    trips_batch = [trip_dict('0301', 'Z1A'), trip_dict('0302', 'Z1A'), trip_dict('0303', 'Z1B')]
+    counts = IngestCounts()
+
+    async def resolve_batch():
+        batches, resolved = asyncio.Queue(), asyncio.Queue()
+        await batches.put(trips_batch)
+        await batches.put(DONE)
+        await resolve(batches, resolved, counts)
+        return await resolved.get(), await resolved.get()
+
+    (unstored_trips, routes), done = asyncio.run(resolve_batch())
+    # Stored trips are dropped, those with unknown references are left unbuilt
+    assert unstored_trips == [trips_batch[1]]
+    assert counts.unbuilt_trips == [trips_batch[2]]
+    assert [route.route_id for route in routes] == [9931]
+    assert done is DONE
+    statements = [connection.statements[0] for connection in async_connections]
+    assert statements[:2] == ['SELECT * FROM airports WHERE iata_code = ANY(%s);',
+                              'SELECT * FROM equipments WHERE airplane_code = ANY(%s);']
+    assert sorted(zip(*async_connections[2].arguments[0])) == \
+        [(301, date(2019, 5, 1)), (302, date(2019, 5, 1)), (303, date(2019, 5, 1))]
+    assert statements[3].startswith('SELECT route_id, name, origin, destination FROM public.routes')
+
+
+def build_trip(number):
+    """A trip with a single flight, whose references are already loaded"""
+    mex = Airport(iata_code='ZPA', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    gdl = Airport(iata_code='ZPB', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    route = Route(name='0400', origin=mex, destination=gdl, route_id=9941)
+    begin = datetime(2019, 5, 1, 13, tzinfo=pytz.utc)
+    trip = Trip(number=number, dated=begin.date(), crew_position='SOB', trip_base=mex)
+    duty_day = DutyDay()
+    duty_day.append(Flight(route=route, equipment=Equipment('Z2A', 9),
+                           scheduled_itinerary=EpochItinerary.from_timedelta(begin, timedelta(hours=1))))
+    trip.append(duty_day)
+    return trip
+
+
+def test_persist(async_connections, query_results):
+    trips = [build_trip('0401'), build_trip('0402'), build_trip('0403')]
+    query_results.extend([[(401,)], [(61,)], [],
+                          # Collides with a concurrent transaction once
+                          psycopg.errors.SerializationFailure('could not serialize'), [(402,)], [(62,)], [],
+                          # Stored before
+                          []])
+    counts = IngestCounts()
+
+    async def persist_trips():
+        built = asyncio.Queue()
+        for trip in trips + [DONE]:
+            await built.put(trip)
+        await persist(built, counts)
+
+    asyncio.run(persist_trips())
+    assert counts.saved == 2
+    assert [trip.duty_days[0].events[0].event_id for trip in trips] == [61, 62, None]
+    # One transaction for each attempt
+    assert [connection.statements[-1] for connection in async_connections] == \
+        ['COMMIT', 'ROLLBACK', 'COMMIT', 'ROLLBACK']
+    assert async_connections[0].statements[2].startswith('INSERT INTO public.duty_days(')
+    # Report an hour before the flight, release half an hour after it
+    assert async_connections[0].arguments[2] == [(61, '0401', date(2019, 5, 1), datetime(2019, 5, 1, 12),
+                                                  datetime(2019, 5, 1, 14, 30), False)]
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytz
+import pytest
+
+hypothesis = pytest.importorskip('hypothesis')
+from hypothesis import given, settings, strategies as st
+
+from models.batchcreditator import BatchCreditator, FIELDS
+from models.creditator import Creditator
+from models.scheduleclasses import Airport, Route, EpochItinerary, GroundDuty, Flight, DutyDay, Trip, Line
+
+AIRPORTS = [Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost'),
+            Airport(iata_code='CUN', timezone=pytz.timezone('America/Cancun'), viaticum='low_cost'),
+            Airport(iata_code='MAD', timezone=pytz.timezone('Europe/Madrid'), viaticum='high_cost'),
+            Airport(iata_code='NRT', timezone=pytz.timezone('Asia/Tokyo'), viaticum='high_cost')]
+MONTH_BEGIN = datetime(2019, 4, 22, tzinfo=pytz.utc)
+TIMEZONES = ['local', pytz.utc, pytz.timezone('America/Mexico_City')]
+
+
+def minutes(least: int, most: int):
+    """Half hours between least and most minutes, so edges such as a 01:30 release are often hit"""
+    return st.integers(least // 30, most // 30).map(lambda half_hours: timedelta(minutes=30 * half_hours))
+
+
+@st.composite
+def duty_days(draw, begin: datetime) -> DutyDay:
+    duty_day = DutyDay()
+    origin = AIRPORTS[0]
+    for number in range(draw(st.integers(1, 4))):
+        destination = draw(st.sampled_from(AIRPORTS))
+        route = Route(name='{:04d}'.format(number), origin=origin, destination=destination, route_id=None)
+        itinerary = EpochItinerary.from_timedelta(begin, draw(minutes(30, 900)))
+        if draw(st.integers(0, 9)) == 0:
+            event = GroundDuty(route=route, scheduled_itinerary=itinerary, position='SOB')
+        else:
+            event = Flight(route=route, scheduled_itinerary=itinerary, dh=draw(st.booleans()))
+            if draw(st.booleans()):
+                event.actual_itinerary = EpochItinerary.from_timedelta(
+                    begin + draw(minutes(-30, 120)), draw(minutes(30, 900)))
+        duty_day.append(event)
+        origin = destination
+        begin = event.end + draw(minutes(30, 400))
+    return duty_day
+
+
+@st.composite
+def lines(draw) -> Line:
+    line = Line(month='MAY', year='2019')
+    begin = MONTH_BEGIN + draw(minutes(0, 30 * 24 * 60))
+    for number in range(draw(st.integers(1, 5))):
+        if draw(st.integers(0, 4)) == 0:
+            duty = draw(duty_days(begin))
+            release = duty.release
+        else:
+            duty = Trip(number='{:04d}'.format(number), dated=begin.date(), crew_position='SOB',
+                        trip_base=AIRPORTS[0])
+            for _ in range(draw(st.integers(1, 4))):
+                duty.append(draw(duty_days(begin)))
+                begin = duty.release + draw(minutes(0, 2000))
+            release = duty.release
+        duty.astimezone(draw(st.sampled_from(TIMEZONES)))
+        line.append(duty)
+        begin = release + draw(minutes(0, 4 * 24 * 60))
+    return line
+
+
+@settings(max_examples=200, deadline=None)
+@given(st.lists(lines(), min_size=1, max_size=3))
+def test_same_credits_as_creditator(crew_lines):
+    credits = BatchCreditator(month_scope=5).credits_from_lines(crew_lines)
+    creditator = Creditator(month_scope=5)
+    for line, line_credits in zip(crew_lines, credits):
+        creditator.credits_from_line(line)
+        for field in FIELDS:
+            assert line_credits[field] == line._credits[field], field
+
+
+def test_month_credits():
+    line = Line(month='MAY', year='2019')
+    trip = Trip(number='0458', dated=datetime(2019, 5, 4).date(), crew_position='SOB', trip_base=AIRPORTS[0])
+    begin = datetime(2019, 5, 4, 23, tzinfo=pytz.utc)
+    for day in range(7):
+        duty_day = DutyDay()
+        duty_day.append(Flight(route=Route(name='0458', origin=AIRPORTS[0], destination=AIRPORTS[1], route_id=None),
+                               scheduled_itinerary=EpochItinerary.from_timedelta(begin + timedelta(days=day),
+                                                                                 timedelta(hours=8))))
+        trip.append(duty_day)
+    line.append(trip)
+
+    credits = BatchCreditator(month_scope=5).credits_from_lines([line])
+    assert credits.column('7day').tolist() == [1]
+    assert credits[0]['block'].minutes == 7 * 8 * 60
+    Creditator(month_scope=5).credits_from_line(line)
+    assert {field: str(value) for field, value in Creditator.month_credits(credits[0]).items()} == \
+        {field: str(value) for field, value in Creditator.month_credits(line._credits).items()}
+    assert str(credits[0]) == line._credits['template'].format(**line._credits)
@@ -0,0 +1,174 @@
+from datetime import date, datetime, timedelta
+
+import psycopg2
+import pytest
+import pytz
+
+from data.database import CursorFromConnectionPool
+from models.scheduleclasses import Airport, Equipment, Route, Flight, EpochItinerary, DutyDay, Trip, FLIGHTS_BY_KEYS, \
+    ROUTES_SELECT
+
+
+def test_airport_load_many(connections, query_results):
+    Airport(iata_code='ZAA', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    query_results.append([('ZAB', 'America', 'Cancun', 'high_cost')])
+    airports = Airport.load_many(['zaa', 'ZAB', 'ZAC'])
+
+    # Only those not loaded before are queried, unknown ones are skipped
+    assert connections[0].statements == ['SELECT * FROM airports WHERE iata_code = ANY(%s);', 'COMMIT']
+    assert sorted(connections[0].arguments[0][0]) == ['ZAB', 'ZAC']
+    assert sorted(airport.iata_code for airport in airports) == ['ZAA', 'ZAB']
+    assert Airport.load_from_db('ZAB').timezone == pytz.timezone('America/Cancun')
+
+    Airport.load_many(['ZAA', 'ZAB'])
+    assert len(connections) == 1
+
+
+def test_equipment_load_many(connections, query_results):
+    query_results.append([('Z7A', 9), ('Z7B', 12)])
+    equipments = Equipment.load_many(['z7a', 'Z7B'])
+
+    assert connections[0].statements[0] == 'SELECT * FROM equipments WHERE airplane_code = ANY(%s);'
+    assert sorted(connections[0].arguments[0][0]) == ['Z7A', 'Z7B']
+    assert sorted((equipment.airplane_code, equipment.cabin_members) for equipment in equipments) == \
+        [('Z7A', 9), ('Z7B', 12)]
+    Equipment.load_many(['Z7A'])
+    assert len(connections) == 1
+
+
+def test_route_load_many(connections, query_results):
+    for iata_code in ('ZRA', 'ZRB'):
+        Airport(iata_code=iata_code, timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    query_results.append([(9901, '0001', 'ZRA', 'ZRB'), (9902, '0002', 'ZRB', 'ZRA')])
+    routes = Route.load_many([('0001', 'ZRA', 'ZRB'), ('0002', 'ZRB', 'ZRA'), ('0003', 'ZRA', 'ZRB')])
+
+    # Whole keys are matched, aligned column by column
+    assert connections[0].statements[0] == ROUTES_SELECT
+    assert sorted(zip(*connections[0].arguments[0])) == \
+        [('0001', 'ZRA', 'ZRB'), ('0002', 'ZRB', 'ZRA'), ('0003', 'ZRA', 'ZRB')]
+    assert sorted(route.route_id for route in routes) == [9901, 9902]
+    assert Route.load_from_db('0002', Airport('ZRB'), Airport('ZRA')).route_id == 9902
+    Route.load_many([('0001', 'ZRA', 'ZRB')])
+    assert len(connections) == 1
+
+
+def test_fetch_all_matching_many(connections, query_results):
+    mex = Airport(iata_code='ZFA', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    gdl = Airport(iata_code='ZFB', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    outbound = Route(name='0100', origin=mex, destination=gdl, route_id=9911)
+    inbound = Route(name='0101', origin=gdl, destination=mex, route_id=9912)
+    Equipment(airplane_code='Z8A', cabin_members=9)
+    query_results.append([(1, 'AM', 9911, datetime(2019, 5, 1, 13), timedelta(hours=1), 'Z8A', None, None),
+                          (2, 'AM', 9911, datetime(2019, 5, 1, 19), timedelta(hours=1), 'Z8B', None, None),
+                          (3, 'AM', 9911, datetime(2019, 5, 1, 21), timedelta(hours=1), 'Z8B', None, None)])
+    query_results.append([('Z8B', 12)])
+    flight_keys = [('AM', outbound, date(2019, 5, 1)), ('AM', inbound, date(2019, 5, 1)),
+                   ('AM', outbound, date(2019, 5, 1))]
+    matching_flights = Flight.fetch_all_matching_many(flight_keys)
+
+    # A single query for all distinct keys, every key gets a list even if nothing matches
+    assert connections[0].statements[0] == FLIGHTS_BY_KEYS
+    assert connections[0].arguments[0] == (['AM', 'AM'], [9911, 9912], [date(2019, 5, 1), date(2019, 5, 1)])
+    assert [flight.event_id for flight in matching_flights[('AM', 9911, date(2019, 5, 1))]] == [1, 2, 3]
+    assert matching_flights[('AM', 9912, date(2019, 5, 1))] == []
+    assert matching_flights[('AM', 9911, date(2019, 5, 1))][0].route is outbound
+    # Equipments not loaded before are read at once
+    assert connections[1].statements[0] == 'SELECT * FROM equipments WHERE airplane_code = ANY(%s);'
+    assert connections[1].arguments[0] == (['Z8B'],)
+    assert matching_flights[('AM', 9911, date(2019, 5, 1))][2].equipment.cabin_members == 12
+
+    assert Flight.fetch_all_matching_many([]) == {}
+    assert len(connections) == 2
+
+
+def build_trip(number, route, begins, equipment):
+    """A trip with a single duty day holding a flight for each begin"""
+    trip = Trip(number=number, dated=begins[0].date(), crew_position='SOB', trip_base=route.origin)
+    duty_day = DutyDay()
+    for begin in begins:
+        duty_day.append(Flight(route=route, equipment=equipment,
+                               scheduled_itinerary=EpochItinerary.from_timedelta(begin, timedelta(hours=1))))
+    trip.append(duty_day)
+    return trip
+
+
+def trip_references():
+    mex = Airport(iata_code='ZSA', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    gdl = Airport(iata_code='ZSB', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    return Route(name='0200', origin=mex, destination=gdl, route_id=9921), Equipment('Z9A', 9)
+
+
+def test_flight_save_many(connections, query_results):
+    route, equipment = trip_references()
+    first = datetime(2019, 5, 1, 13, tzinfo=pytz.utc)
+    second = datetime(2019, 5, 1, 19, tzinfo=pytz.utc)
+    flights = build_trip('0200', route, [first, second], equipment).duty_days[0].events
+    # A flight shared by two trips
+    flights.append(Flight(route=route, equipment=equipment,
+                          scheduled_itinerary=EpochItinerary.from_timedelta(first, timedelta(hours=1))))
+    # Second flight was stored meanwhile, so it only comes back from the SELECT
+    query_results.append([(11, 'AM', 9921, datetime(2019, 5, 1, 13))])
+    query_results.append([(12, 'AM', 9921, datetime(2019, 5, 1, 19))])
+    with CursorFromConnectionPool() as cursor:
+        Flight.save_many(cursor, flights)
+
+    insert, select, _ = connections[0].statements
+    assert insert.startswith('INSERT INTO public.flights(') and 'VALUES (%s,%s,%s,%s,%s),(%s,%s,%s,%s,%s) ' in insert
+    assert insert.endswith('ON CONFLICT DO NOTHING RETURNING flight_id, airline_iata_code, route_id, scheduled_begin;')
+    assert sorted(connections[0].values[:2]) == [
+        ('AM', 9921, datetime(2019, 5, 1, 13), timedelta(hours=1), 'Z9A'),
+        ('AM', 9921, datetime(2019, 5, 1, 19), timedelta(hours=1), 'Z9A')]
+    assert select.startswith('SELECT flight_id') and 'VALUES (%s,%s,%s)' in select
+    assert connections[0].values[2:] == [('AM', 9921, datetime(2019, 5, 1, 19))]
+    assert [flight.event_id for flight in flights] == [11, 12, 11]
+
+
+def test_duty_day_save_many(connections):
+    route, equipment = trip_references()
+    trip = build_trip('0201', route, [datetime(2019, 5, 1, 13, tzinfo=pytz.utc),
+                                      datetime(2019, 5, 1, 15, tzinfo=pytz.utc)], equipment)
+    for event_id, flight in enumerate(trip.duty_days[0].events, 21):
+        flight.event_id = event_id
+    with CursorFromConnectionPool() as cursor:
+        DutyDay.save_many(cursor, [trip])
+
+    assert connections[0].statements[0].endswith('VALUES (%s,%s,%s,%s,%s,%s),(%s,%s,%s,%s,%s,%s) '
+                                                 'ON CONFLICT DO NOTHING;')
+    duty_day = trip.duty_days[0]
+    # Report goes in the duty day's first row, rel in its last one
+    assert connections[0].values == [
+        (21, '0201', date(2019, 5, 1), duty_day.report.astimezone(pytz.utc).replace(tzinfo=None), None, False),
+        (22, '0201', date(2019, 5, 1), None, duty_day.release.astimezone(pytz.utc).replace(tzinfo=None), False)]
+
+
+def test_trip_save_many(connections, query_results):
+    route, equipment = trip_references()
+    new_trip = build_trip('0202', route, [datetime(2019, 5, 2, 13, tzinfo=pytz.utc)], equipment)
+    stored_trip = build_trip('0203', route, [datetime(2019, 5, 2, 15, tzinfo=pytz.utc)], equipment)
+    query_results.append([(202, date(2019, 5, 2))])
+    query_results.append([(31, 'AM', 9921, datetime(2019, 5, 2, 13))])
+
+    assert Trip.save_many([new_trip, stored_trip]) == [new_trip]
+    # All within one transaction, flights of previously stored trips are left alone
+    assert len(connections) == 1
+    assert [statement.split(' ')[2] for statement in connections[0].statements[:3]] == \
+        ['public.trips', 'public.flights(', 'public.duty_days(']
+    assert connections[0].statements[-1] == 'COMMIT'
+    assert connections[0].values[:2] == [('0202', date(2019, 5, 2), 'SOB', 'ZSA'),
+                                         ('0203', date(2019, 5, 2), 'SOB', 'ZSA')]
+    assert new_trip.duty_days[0].events[0].event_id == 31
+    assert stored_trip.duty_days[0].events[0].event_id is None
+
+
+def test_trip_save_many_rolls_back(connections, query_results):
+    route, equipment = trip_references()
+    trip = build_trip('0204', route, [datetime(2019, 5, 3, 13, tzinfo=pytz.utc)], equipment)
+    query_results.append([(204, date(2019, 5, 3))])
+    query_results.append([(41, 'AM', 9921, datetime(2019, 5, 3, 13))])
+    query_results.append(psycopg2.IntegrityError('duty_days'))
+
+    with pytest.raises(psycopg2.IntegrityError):
+        Trip.save_many([trip])
+    assert connections[0].statements[-1] == 'ROLLBACK'
+    # Rolled back flights are not left with their ids
+    assert trip.duty_days[0].events[0].event_id is None
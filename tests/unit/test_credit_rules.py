@@ -0,0 +1,41 @@
+from models.creditator import Creditator, DutyType, get_rules_for
+from models.timeclasses import Duration
+
+RULES = """
+[DEFAULT]
+regular = 07:30 10:00 09:00 12:00
+transoceanic = 08:00 13:00 10:00 15:00
+special trans = 08:00 16:00 10:00 16:00
+long haul = 08:00 13:00 10:00 15:00
+
+[EJE]
+regular = 08:00 10:00 09:30 12:00
+
+[EJE B]
+regular = 08:30 10:00 09:30 12:00
+"""
+
+
+def test_default_rules():
+    rules = Creditator('SOB', 'A').rules
+    assert rules.ordinary_block[DutyType.REGULAR] == Duration(7 * 60 + 30)
+    assert rules.maximum_duty[DutyType.SPECIAL_TRANS] == Duration(16 * 60)
+    assert rules.ordinary_duty[DutyType.LONG_HAUL] == Duration(10 * 60)
+    assert str(DutyType.SPECIAL_TRANS) == 'special trans'
+
+
+def test_rules_are_shared_by_all_creditators():
+    assert Creditator('SOB', 'A').rules is Creditator('SOB', 'A', month_scope=5).rules
+
+
+def test_rules_by_position_and_group(tmp_path):
+    rules_file = tmp_path / 'credit_rules.ini'
+    rules_file.write_text(RULES)
+    sob = get_rules_for('SOB', 'A', str(rules_file))
+    eje = get_rules_for('EJE', 'A', str(rules_file))
+    eje_b = get_rules_for('EJE', 'B', str(rules_file))
+    assert sob.ordinary_block[DutyType.REGULAR] == Duration(7 * 60 + 30)
+    assert eje.ordinary_block[DutyType.REGULAR] == Duration(8 * 60)
+    assert eje_b.ordinary_block[DutyType.REGULAR] == Duration(8 * 60 + 30)
+    # Limits not given for EJE are those in DEFAULT
+    assert eje.ordinary_block[DutyType.TRANSOCEANIC] == sob.ordinary_block[DutyType.TRANSOCEANIC]
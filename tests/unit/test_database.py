@@ -0,0 +1,87 @@
+import pytest
+
+from data import database
+from data.database import Database, UnitOfWork, CursorFromConnectionPool, PoolTimeout
+from tests.unit.conftest import FakeConnection
+
+
+def test_cursors_share_unit_of_work_connection(connections):
+    with UnitOfWork():
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute('INSERT 1')
+        with UnitOfWork(), CursorFromConnectionPool() as cursor:
+            cursor.execute('INSERT 2')
+    assert len(connections) == 1
+    assert connections[0].statements == ['INSERT 1', 'INSERT 2', 'COMMIT']
+    assert connections[0].returned
+    assert UnitOfWork.current() is None
+
+
+def test_unit_of_work_rolls_back(connections):
+    with pytest.raises(ValueError):
+        with UnitOfWork(), CursorFromConnectionPool() as cursor:
+            cursor.execute('INSERT 1')
+            raise ValueError
+    assert connections[0].statements == ['INSERT 1', 'ROLLBACK']
+    assert connections[0].returned
+
+
+def test_failing_savepoint_keeps_neighbours(connections):
+    with UnitOfWork() as unit_of_work:
+        with pytest.raises(ValueError):
+            with unit_of_work.savepoint(), CursorFromConnectionPool() as cursor:
+                cursor.execute('INSERT 1')
+                raise ValueError
+        with unit_of_work.savepoint(), CursorFromConnectionPool() as cursor:
+            cursor.execute('INSERT 2')
+    statements = [statement.split(' savepoint_')[0] for statement in connections[0].statements]
+    assert statements == ['SAVEPOINT', 'INSERT 1', 'ROLLBACK TO SAVEPOINT', 'SAVEPOINT', 'INSERT 2',
+                          'RELEASE SAVEPOINT', 'COMMIT']
+
+
+class FakePool(object):
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.connections = [FakeConnection() for _ in range(maxconn)]
+
+    def getconn(self):
+        return self.connections.pop(0)
+
+    def putconn(self, connection, close=False):
+        if close:
+            self.connections.append(FakeConnection())
+        else:
+            self.connections.append(connection)
+
+
+def test_pool_wait_timeout(monkeypatch):
+    monkeypatch.setattr(database.pool, 'ThreadedConnectionPool', FakePool)
+    Database.initialise(maxconn=1, wait_timeout=0.01)
+    connection = Database.get_connection()
+    with pytest.raises(PoolTimeout):
+        Database.get_connection()
+    Database.return_connection(connection)
+    assert Database.get_connection() is connection
+    stats = Database.pool_stats()
+    assert stats['checkouts'] == 2
+    assert stats['timeouts'] == 1
+
+
+def test_pool_discards_broken_connections(monkeypatch):
+    monkeypatch.setattr(database.pool, 'ThreadedConnectionPool', FakePool)
+    Database.initialise(maxconn=1)
+    connection = Database.get_connection()
+    connection.closed = 1
+    Database.return_connection(connection)
+    assert Database.get_connection() is not connection
+    assert Database.pool_stats()['discarded'] == 1
+
+
+def test_pool_health_check(monkeypatch):
+    monkeypatch.setattr(database.pool, 'ThreadedConnectionPool', FakePool)
+    Database.initialise(maxconn=1)
+    connection = Database.get_connection()
+    # Only closed connections are looked for by default, without a round trip
+    assert connection.statements == []
+    Database.return_connection(connection)
+    Database.initialise(maxconn=1, health_check=True)
+    assert Database.get_connection().statements == ['SELECT 1;', 'ROLLBACK']
@@ -58,3 +58,10 @@ def test_as_timedelta():
     assert td.total_seconds() == 30*60
 
 
+class TestSlots:
+
+    def test_repr(self):
+        assert repr(Duration(40)) == 'Duration(40)'
+
+    def test_no_instance_dict(self):
+        assert not hasattr(Duration(40), '__dict__')
@@ -0,0 +1,168 @@
+import copy
+from datetime import datetime, timedelta
+
+import pytz
+import pytest
+
+from models.scheduleclasses import Airport, Route, Itinerary, EpochItinerary, Flight, DutyDay, Trip
+from models.timeclasses import Duration, to_epoch_minutes, from_epoch_minutes, to_timezone
+
+mexico_city = pytz.timezone('America/Mexico_City')
+
+
+def test_epoch_minutes_round_trip():
+    dt = datetime(2019, 5, 1, 13, 25, tzinfo=pytz.utc)
+    assert from_epoch_minutes(to_epoch_minutes(dt)) == dt
+    # Naive datetimes are taken as UTC
+    assert to_epoch_minutes(dt.replace(tzinfo=None)) == to_epoch_minutes(dt)
+    assert from_epoch_minutes(to_epoch_minutes(dt), mexico_city).strftime('%H%M') == '0825'
+
+
+def test_conversions_are_shared_between_itineraries():
+    begin = datetime(2019, 5, 1, 13, 25, tzinfo=pytz.utc)
+    first = Itinerary.from_timedelta(begin, timedelta(minutes=135))
+    second = Itinerary.from_timedelta(begin, timedelta(minutes=135))
+    for itinerary in (first, second):
+        itinerary.astimezone(mexico_city, mexico_city)
+    hits = to_timezone.cache_info().hits
+    assert first.begin is second.begin
+    assert to_timezone.cache_info().hits > hits
+    assert first.begin == begin.astimezone(mexico_city)
+    assert first.begin.utcoffset() == begin.astimezone(mexico_city).utcoffset()
+
+
+@pytest.fixture
+def itineraries():
+    begin = datetime(2019, 5, 1, 13, 25, tzinfo=pytz.utc)
+    return (Itinerary.from_timedelta(begin, timedelta(minutes=135)),
+            EpochItinerary.from_timedelta(begin, timedelta(minutes=135)))
+
+
+def test_epoch_itinerary_matches_itinerary(itineraries):
+    itinerary, epoch_itinerary = itineraries
+    assert epoch_itinerary == itinerary
+    assert (epoch_itinerary.begin, epoch_itinerary.end) == (itinerary.begin, itinerary.end)
+    assert epoch_itinerary.duration == itinerary.duration == Duration(135)
+    assert epoch_itinerary.begin_minutes == itinerary.begin_minutes
+
+
+def test_epoch_itinerary_displayed_timezone(itineraries):
+    itinerary, epoch_itinerary = itineraries
+    for an_itinerary in itineraries:
+        an_itinerary.astimezone(mexico_city, mexico_city)
+    assert str(epoch_itinerary) == str(itinerary) == '01May BEGIN 0825 END 1040'
+    # Only the displayed timezone changes, not the stored instant
+    assert epoch_itinerary._begin.tzinfo is pytz.utc
+
+
+def test_epoch_itinerary_holds_minutes_only(itineraries):
+    itinerary, epoch_itinerary = itineraries
+    assert not hasattr(epoch_itinerary, '__dict__')
+    assert {name for cls in type(epoch_itinerary).__mro__ for name in getattr(cls, '__slots__', ())} == \
+        {'begin_minutes', 'end_minutes', 'begin_timezone_displayed', 'end_timezone_displayed'}
+    assert copy.deepcopy(epoch_itinerary) == epoch_itinerary
+
+
+def build_trip(itinerary_class):
+    mex = Airport(iata_code='MEX', timezone=mexico_city, viaticum='low_cost')
+    gdl = Airport(iata_code='GDL', timezone=mexico_city, viaticum='low_cost')
+    route = Route(name='0100', origin=mex, destination=gdl, route_id=None)
+    trip = Trip(number='0123', dated=datetime(2019, 5, 1).date(), crew_position='SOB', trip_base=mex)
+    for begins in ((datetime(2019, 5, 1, 13), datetime(2019, 5, 1, 16)), (datetime(2019, 5, 2, 12),)):
+        duty_day = DutyDay()
+        for begin in begins:
+            itinerary = itinerary_class.from_timedelta(pytz.utc.localize(begin), timedelta(hours=2))
+            duty_day.append(Flight(route=route, scheduled_itinerary=itinerary))
+        trip.append(duty_day)
+    return trip
+
+
+def test_integer_arithmetic_matches_datetime_arithmetic():
+    trip = build_trip(Itinerary)
+    epoch_trip = build_trip(EpochItinerary)
+    assert epoch_trip.duty_days[0].turns == trip.duty_days[0].turns == [Duration(60)]
+    assert epoch_trip.duty_days[0].duration == trip.duty_days[0].duration == Duration(390)
+    assert epoch_trip.rests == trip.rests == [Duration(990)]
+    assert epoch_trip.duration == trip.duration == Duration(1590)
+    assert epoch_trip.report == trip.report
+    assert epoch_trip.release == trip.release
+    assert epoch_trip.report_minutes == to_epoch_minutes(trip.report)
+
+
+def test_memoised_values_follow_changes():
+    trip = build_trip(EpochItinerary)
+    duty_day = trip.duty_days[0]
+    assert duty_day.duration is duty_day.duration
+    assert trip.rests == [Duration(990)]
+
+    duty_day.append(Flight(route=duty_day.events[0].route,
+                           scheduled_itinerary=EpochItinerary.from_timedelta(
+                               pytz.utc.localize(datetime(2019, 5, 1, 20)), timedelta(hours=1))))
+    assert duty_day.duration == Duration(570)
+    assert trip.rests == [Duration(810)]
+
+    duty_day.events[-1].actual_itinerary = EpochItinerary.from_timedelta(
+        pytz.utc.localize(datetime(2019, 5, 1, 23)), timedelta(hours=1, minutes=30))
+    assert duty_day.duration == Duration(780)
+
+    trip.pop()
+    assert trip.rests == []
+    assert trip.get_elapsed_dates() == [datetime(2019, 5, 1).date(), datetime(2019, 5, 2).date()]
+    trip.astimezone('local')
+    assert trip.get_elapsed_dates() == [datetime(2019, 5, 1).date()]
+
+
+def test_memoised_values_follow_changes_of_members():
+    trip = build_trip(EpochItinerary)
+    first, second = trip.duty_days
+    assert first.turns == [Duration(60)]
+    assert trip.duration == Duration(1590)
+
+    first.events[-1].begin = pytz.utc.localize(datetime(2019, 5, 1, 16, 30))
+    assert first.turns == [Duration(90)]
+    first.report = pytz.utc.localize(datetime(2019, 5, 1, 11))
+    assert first.duration == Duration(450)
+    assert trip.duration == Duration(1650)
+
+    trip.duty_days.pop()
+    assert trip.duration == Duration(450)
+    trip.duty_days[0] = second
+    assert trip.rests == [] and trip.duration == Duration(210)
+    # A duty day taken out of a trip no longer changes it
+    first.events.clear()
+    assert trip.duration == Duration(210)
+    assert first._trip is None and second._trip is trip
+
+
+def test_memoised_values_are_kept_by_each_instance():
+    trip, other = build_trip(EpochItinerary), build_trip(EpochItinerary)
+    duration = trip.duty_days[0].duration
+    other.duty_days[0].events.pop()
+    assert trip.duty_days[0].duration is duration
+    assert other.duty_days[0].duration == Duration(210)
+
+
+def test_copies_keep_their_members():
+    trip = build_trip(Itinerary)
+    # Routes and airports are flyweights, shared by copies
+    route = trip.duty_days[0].events[0].route
+    copied = copy.deepcopy(trip, {id(route): route, id(trip.trip_base): trip.trip_base})
+    assert [duty_day._trip for duty_day in copied.duty_days] == [copied, copied]
+    flight = copied.duty_days[0].events[0]
+    assert flight.holders == (copied.duty_days[0],)
+    copied.duty_days[0].events.pop()
+    assert copied.duty_days[0].duration == Duration(210)
+    assert trip.duty_days[0].duration == Duration(390)
+
+
+def test_shared_flight_changes_every_holder():
+    trip, other = build_trip(EpochItinerary), build_trip(EpochItinerary)
+    flight = trip.duty_days[1].events[0]
+    other.duty_days[1].events[0] = flight
+    assert flight.holders == (trip.duty_days[1], other.duty_days[1])
+    assert trip.duration == other.duration == Duration(1590)
+
+    flight.end = pytz.utc.localize(datetime(2019, 5, 2, 15))
+    assert trip.duration == other.duration == Duration(1650)
+    trip.duty_days[1].events.pop()
+    assert flight.holders == (other.duty_days[1],)
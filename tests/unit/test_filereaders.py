@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from AdminApp.exceptions import TripsTotalNotFound
+from AdminApp.filereaders import page_number_remover, number_of_trips_in_pbs_file, create_trips_as_dict, \
+    trip_blocks_from_file, trips_total_from_file, trips_as_dict_from_file, trips_as_dict_from_files, \
+    pbs_lines, TripTokenizer
+
+pbs_file = Path(__file__).parent.parent / 'fixtures' / 'pbs_trips.txt'
+
+
+@pytest.fixture(scope='module')
+def regex_trips():
+    """Trips as read by the original, whole file, regex path"""
+    return create_trips_as_dict(page_number_remover(pbs_file), crew_position='SOB', trip_base='MEX')
+
+
+def test_trip_blocks_have_no_page_numbers():
+    blocks = list(trip_blocks_from_file(pbs_file))
+    assert len(blocks) == 3
+    for block in blocks:
+        assert block.startswith('#')
+        assert block.endswith('TAFB')
+        assert '=====' not in block
+
+
+def test_trips_total_from_file():
+    assert trips_total_from_file(pbs_file) == number_of_trips_in_pbs_file(page_number_remover(pbs_file))
+
+
+def test_streamed_trips_match_regex_trips(regex_trips):
+    streamed_trips = list(trips_as_dict_from_file(pbs_file, crew_position='SOB', trip_base='MEX'))
+    assert streamed_trips == regex_trips
+
+
+def test_parallel_trips_match_regex_trips(regex_trips):
+    eje_trips = [dict(trip_as_dict, crew_position='EJE') for trip_as_dict in regex_trips]
+    trips_per_file = trips_as_dict_from_files([(pbs_file, 'SOB', 'MEX'), (pbs_file, 'EJE', 'MEX')],
+                                              max_workers=2, chunk_size=1)
+    assert trips_per_file == [regex_trips, eje_trips]
+
+
+def test_tokenizer_drops_unfinished_trip(regex_trips):
+    lines = list(pbs_lines(pbs_file))
+    totals_line = next(index for index, line in enumerate(lines) if 'TOTALS' in line)
+    del lines[totals_line]
+    tokenized_trips = list(TripTokenizer(crew_position='SOB', trip_base='MEX').trips(lines))
+    assert tokenized_trips == regex_trips[1:]
+
+
+def test_empty_file(tmp_path):
+    empty_file = tmp_path / 'empty.txt'
+    empty_file.write_text('')
+    assert list(trips_as_dict_from_file(empty_file, crew_position='SOB', trip_base='MEX')) == []
+
+
+@pytest.mark.parametrize('content', ['', 'No trips in here\n'])
+def test_file_without_trips_total(tmp_path, content):
+    pbs_file_without_total = tmp_path / 'no_total.txt'
+    pbs_file_without_total.write_text(content)
+    with pytest.raises(TripsTotalNotFound):
+        trips_total_from_file(pbs_file_without_total)
@@ -0,0 +1,57 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from models.scheduleclasses import Flight, Route
+
+MEX = ('MEX', 'America', 'Mexico_City', 'low_cost')
+CUN = ('CUN', 'America', 'Cancun', 'low_cost')
+
+
+def stream_row(flight_id, route_id, scheduled_begin, origin, destination, actual_begin=None, duty_day=()):
+    """A FLIGHT_STREAM_SELECT row, optionally followed by its duty day's trip_id, trip_date and dh"""
+    actual_block = timedelta(minutes=130) if actual_begin else None
+    return (flight_id, 'AM', route_id, scheduled_begin, timedelta(minutes=125), '7S8', actual_begin, actual_block,
+            '0{}'.format(route_id), origin[0], destination[0]) + origin[1:] + destination[1:] + (4,) + duty_day
+
+
+def test_flights_are_built_lazily():
+    rows = iter([stream_row(1, 9501, datetime(2019, 5, 1, 14), MEX, CUN),
+                 stream_row(2, 9502, datetime(2019, 5, 1, 18), CUN, MEX, actual_begin=datetime(2019, 5, 1, 18, 20))])
+    flights = Flight.from_stream_rows(rows)
+    first = next(flights)
+    assert (first.event_id, first.name, first.route.origin.iata_code) == (1, '09501', 'MEX')
+    assert first.duration.minutes == 125
+    assert first.actual_itinerary is None
+    second = next(flights)
+    assert second.actual_itinerary.duration.minutes == 130
+    assert list(flights) == []
+
+
+def test_routes_are_shared_and_dh_comes_from_duty_days():
+    rows = [stream_row(3, 9503, datetime(2019, 5, 2, 14), MEX, CUN, duty_day=(4051, datetime(2019, 5, 2).date(), True)),
+            stream_row(3, 9503, datetime(2019, 5, 2, 14), MEX, CUN, duty_day=(4052, datetime(2019, 5, 2).date(), False))]
+    deadhead, flight = Flight.from_stream_rows(rows)
+    assert deadhead.route is flight.route is Route._routes_by_id.get(9503)
+    assert (deadhead.dh, flight.dh) == (True, False)
+    assert flight.equipment.cabin_members == 4
+
+
+@pytest.fixture
+def server_timezone(monkeypatch):
+    """The process runs on Mexico City time"""
+    monkeypatch.setenv('TZ', 'America/Mexico_City')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_naive_limits_are_utc(connections, query_results, server_timezone):
+    query_results.append([stream_row(5, 9505, datetime(2019, 5, 3, 14), MEX, CUN)])
+    mexico_city = pytz.timezone('America/Mexico_City')
+    flights = list(Flight.iter_from_db(datetime(2019, 5, 3), mexico_city.localize(datetime(2019, 5, 3, 19))))
+    assert [flight.event_id for flight in flights] == [5]
+    assert connections[0].arguments[0] == (datetime(2019, 5, 3), datetime(2019, 5, 4))
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytz
+import pytest
+
+from models.creditator import Creditator
+from models.flighttable import FlightTable
+from models.scheduleclasses import Airport, Route, Equipment, EpochItinerary, Flight
+from models.timeclasses import Duration
+
+
+@pytest.fixture
+def flights():
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    cun = Airport(iata_code='CUN', timezone=pytz.timezone('America/Cancun'), viaticum='low_cost')
+    routes = [Route(name='0530', origin=mex, destination=cun, route_id=9301),
+              Route(name='0531', origin=cun, destination=mex, route_id=9302)]
+    equipment = Equipment(airplane_code='7S8', cabin_members=4)
+    flights = list()
+    begin = datetime(2019, 4, 30, 20, tzinfo=pytz.utc)
+    for number in range(8):
+        scheduled_begin = begin + timedelta(hours=5 * number)
+        itinerary = EpochItinerary.from_timedelta(scheduled_begin, timedelta(minutes=125))
+        flights.append(Flight(route=routes[number % 2], scheduled_itinerary=itinerary, equipment=equipment,
+                              event_id=number + 1, dh=number == 3))
+    flights[1].actual_itinerary = EpochItinerary.from_timedelta(begin + timedelta(hours=5, minutes=20),
+                                                                timedelta(minutes=130))
+    return flights
+
+
+def test_totals_match_flights(flights):
+    table = FlightTable.from_flights(flights)
+    assert len(table) == 8
+    assert table.block_total() == sum((flight.duration for flight in flights if not flight.dh), Duration(0))
+    assert table.dh_total() == flights[3].duration
+    assert table.block_by_route() == {9301: Duration(4 * 125), 9302: Duration(2 * 125 + 130)}
+    assert table.block_by_month() == {(2019, 4): Duration(125), (2019, 5): Duration(5 * 125 + 130)}
+
+
+def test_night_minutes_match_creditator(flights):
+    table = FlightTable.from_flights(flights)
+    for flight in flights:
+        flight.astimezone('local')
+    assert list(table.night_minutes()) == [Creditator.calculate_night_time(flight).minutes for flight in flights]
+    assert list(table.night_minutes(pytz.utc)) == [5, 130, 0, 0, 0, 65, 125, 0]
+
+
+def test_rows_back_to_flights(flights):
+    table = FlightTable.from_flights(flights)
+    for flight, rebuilt in zip(flights, table.flights()):
+        assert rebuilt == flight
+        assert (rebuilt.event_id, rebuilt.dh, rebuilt.equipment) == (flight.event_id, flight.dh, flight.equipment)
+        assert rebuilt.begin == flight.begin
+    assert len(table.select(table.dh)) == 1
+
+
+def test_from_rows():
+    rows = [(1, 'AM', 9301, '0530', 'MEX', 'CUN', 25000000, 125, '7S8', None, None),
+            (2, 'AM', 9302, '0531', 'CUN', 'MEX', 25000300, 125, '7S8', 25000320, 130)]
+    table = FlightTable.from_rows(rows)
+    assert list(table.begin) == [25000000, 25000320]
+    assert list(table.end) == [25000125, 25000450]
+    assert len(FlightTable.from_rows([])) == 0
@@ -0,0 +1,141 @@
+import random
+from datetime import datetime, timedelta
+
+import pytz
+
+from models.creditator import Creditator, IncrementalLineCredits, LINE_TOTALS
+from models.scheduleclasses import Airport, Route, EpochItinerary, Flight, DutyDay, Trip, Line
+
+AIRPORTS = [Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost'),
+            Airport(iata_code='CUN', timezone=pytz.timezone('America/Cancun'), viaticum='low_cost'),
+            Airport(iata_code='MAD', timezone=pytz.timezone('Europe/Madrid'), viaticum='high_cost')]
+MONTH_BEGIN = datetime(2019, 4, 26, tzinfo=pytz.utc)
+
+
+def half_hours(rnd, least, most):
+    return timedelta(minutes=30 * rnd.randint(least // 30, most // 30))
+
+
+def duty_day(rnd, begin):
+    duty_day = DutyDay()
+    origin = AIRPORTS[0]
+    for number in range(rnd.randint(1, 3)):
+        destination = rnd.choice(AIRPORTS)
+        route = Route(name='{:04d}'.format(number), origin=origin, destination=destination, route_id=None)
+        duty_day.append(Flight(route=route, dh=rnd.random() < 0.2,
+                               scheduled_itinerary=EpochItinerary.from_timedelta(begin, half_hours(rnd, 60, 600))))
+        origin = destination
+        begin = duty_day.events[-1].end + half_hours(rnd, 30, 180)
+    return duty_day
+
+
+def trip(rnd, number, begin):
+    trip = Trip(number='{:04d}'.format(number), dated=begin.date(), crew_position='SOB', trip_base=AIRPORTS[0])
+    for _ in range(rnd.randint(1, 4)):
+        trip.append(duty_day(rnd, begin))
+        begin = trip.release + half_hours(rnd, 540, 1500)
+    return trip
+
+
+def delay(rnd, duty_day):
+    """First flight is either flown late or rescheduled, which moves the duty day's report as well"""
+    flight = duty_day.events[0]
+    itinerary = EpochItinerary.from_timedelta(flight.begin + half_hours(rnd, -240, 480),
+                                              flight.duration.as_timedelta() + half_hours(rnd, 0, 120))
+    if rnd.random() < 0.5:
+        flight.actual_itinerary = itinerary
+    else:
+        flight.scheduled_itinerary = itinerary
+
+
+def itinerary_copy(itinerary):
+    return itinerary and EpochItinerary.from_minutes(itinerary.begin_minutes, itinerary.end_minutes)
+
+
+def rebuilt(line) -> Line:
+    """Same line built anew, so none of the credits memoised thru the edits are reused"""
+    copy = Line(month=line.month, year=line.year)
+    for trip in line.duties:
+        trip_copy = Trip(number=trip.number, dated=trip.dated, crew_position=trip.crew_position,
+                         trip_base=trip.trip_base)
+        for duty_day in trip.duty_days:
+            duty_day_copy = DutyDay()
+            for flight in duty_day.events:
+                duty_day_copy.append(Flight(route=flight.route, dh=flight.dh,
+                                            scheduled_itinerary=itinerary_copy(flight.scheduled_itinerary),
+                                            actual_itinerary=itinerary_copy(flight.actual_itinerary)))
+            trip_copy.append(duty_day_copy)
+        copy.append(trip_copy)
+    return copy
+
+
+def assert_same_credits(line, line_credits):
+    """Incremental credits match those of a separately built line, calculated from scratch"""
+    copy = rebuilt(line)
+    assert line_credits.credits_list == Creditator(month_scope=5).credits_from_line(copy)
+    assert {field: line._credits[field] for field in LINE_TOTALS + ('7day',)} == \
+        {field: copy._credits[field] for field in LINE_TOTALS + ('7day',)}
+
+
+def test_same_credits_as_creditator():
+    rnd = random.Random(2019)
+    for _ in range(30):
+        line = Line(month='MAY', year='2019')
+        begin = MONTH_BEGIN
+        for number in range(rnd.randint(2, 10)):
+            line.append(trip(rnd, number, begin))
+            begin = line.duties[-1].release + half_hours(rnd, 0, 1500)
+        creditator = Creditator(month_scope=5)
+        line_credits = IncrementalLineCredits(line, creditator)
+        assert_same_credits(line, line_credits)
+
+        for number in range(100, 120):
+            edit = rnd.randint(0, 3)
+            if edit == 0:
+                # A delay within a single duty day
+                changed = rnd.choice(line.duties)
+                touched = rnd.choice(changed.duty_days)
+                delay(rnd, touched)
+                line.sort()
+                line_credits.refresh(changed=[changed], duty_days=[touched])
+            elif edit == 1 and len(line.duties) > 1:
+                # Trip removed from the line
+                del line[rnd.randrange(len(line.duties))]
+                line_credits.refresh()
+            elif edit == 2:
+                # Trip reassigned into the line
+                begin = MONTH_BEGIN + half_hours(rnd, 0, 35 * 24 * 60)
+                line.append(trip(rnd, number, begin))
+                line_credits.refresh()
+            else:
+                # Trip swapped for another one
+                index = rnd.randrange(len(line.duties))
+                line[index] = trip(rnd, number, line.duties[index].report + half_hours(rnd, -2000, 2000))
+                line_credits.refresh()
+            assert_same_credits(line, line_credits)
+
+
+def test_seventh_days_follow_a_moved_trip():
+    line = Line(month='MAY', year='2019')
+    begin = datetime(2019, 5, 1, 12, tzinfo=pytz.utc)
+    trips = []
+    for day in range(0, 12, 3):
+        trips.append(Trip(number='{:04d}'.format(day), dated=(begin + timedelta(days=day)).date(),
+                          crew_position='SOB', trip_base=AIRPORTS[0]))
+        for duty in range(3):
+            trips[-1].append(DutyDay())
+            route = Route(name='0400', origin=AIRPORTS[0], destination=AIRPORTS[1], route_id=None)
+            trips[-1].duty_days[-1].append(Flight(route=route, scheduled_itinerary=EpochItinerary.from_timedelta(
+                begin + timedelta(days=day + duty), timedelta(hours=4))))
+        line.append(trips[-1])
+    creditator = Creditator(month_scope=5)
+    line_credits = IncrementalLineCredits(line, creditator)
+    assert line._credits['7day'] == 1
+
+    del line[1]
+    line_credits.refresh()
+    assert line._credits['7day'] == 0
+    line.append(trips[1])
+    line_credits.refresh()
+    assert line._credits['7day'] == 1
+    assert_same_credits(line, line_credits)
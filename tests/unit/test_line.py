@@ -0,0 +1,107 @@
+import random
+from datetime import datetime, timedelta
+
+import pytz
+import pytest
+
+from models.scheduleclasses import Airport, Route, EpochItinerary, Flight, DutyDay, Trip, Line
+from models.timeclasses import Duration
+
+
+def duty_day(route, begin: datetime, hours: int = 2) -> DutyDay:
+    """A DutyDay with a single flight, reporting an hour before begin"""
+    duty_day = DutyDay()
+    itinerary = EpochItinerary.from_timedelta(pytz.utc.localize(begin), timedelta(hours=hours))
+    duty_day.append(Flight(route=route, scheduled_itinerary=itinerary))
+    return duty_day
+
+
+@pytest.fixture
+def route():
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    return Route(name='0402', origin=mex, destination=mex, route_id=None)
+
+
+@pytest.fixture
+def line(route):
+    line = Line(month='MAY', year=2019)
+    for day in (5, 1, 3):
+        trip = Trip(number='04{:02d}'.format(day), dated=datetime(2019, 5, day).date(), crew_position='SOB',
+                    trip_base=route.origin)
+        trip.append(duty_day(route, datetime(2019, 5, day, 13)))
+        line.append(trip)
+    return line
+
+
+def test_duties_are_kept_in_report_order(line):
+    assert [trip.number for trip in line] == ['0401', '0403', '0405']
+    assert line.return_duty('0403') is line[1]
+
+
+def test_overlapping(line):
+    assert [trip.number for trip in line.overlapping(pytz.utc.localize(datetime(2019, 5, 3, 15)),
+                                                     pytz.utc.localize(datetime(2019, 5, 5, 12, 30)))] == \
+        ['0403', '0405']
+    assert line.overlapping(pytz.utc.localize(datetime(2019, 5, 3, 16)),
+                            pytz.utc.localize(datetime(2019, 5, 5, 12))) == []
+
+
+def test_next_duty(line):
+    assert line.next_duty(pytz.utc.localize(datetime(2019, 5, 1, 13))).number == '0403'
+    assert line.next_duty(pytz.utc.localize(datetime(2019, 5, 6))) is None
+
+
+def test_conflicts(line, route):
+    long_duty_day = duty_day(route, datetime(2019, 5, 1, 20), hours=14)
+    assert [trip.number for trip in line.conflicts(long_duty_day)] == []
+    assert [trip.number for trip in line.conflicts(long_duty_day, minimum_rest=Duration(12 * 60))] == ['0401']
+    line.append(long_duty_day)
+    assert line[1] is long_duty_day
+    assert line.conflicts(long_duty_day) == []
+
+
+def test_changed_duty_is_moved(line, route):
+    trip = line[0]
+    trip.duty_days[0] = duty_day(route, datetime(2019, 5, 4, 13))
+    line[0] = trip
+    assert [trip.number for trip in line] == ['0403', '0401', '0405']
+    del line[0]
+    assert line.next_duty(pytz.utc.localize(datetime(2019, 5, 1))).number == '0401'
+
+
+def test_slice_replaced(line, route):
+    late, early = duty_day(route, datetime(2019, 5, 9, 13)), duty_day(route, datetime(2019, 5, 2, 13))
+    line[0:2] = [late, early]
+    assert list(line) == [early, line.return_duty('0405'), late]
+    assert line.next_duty(pytz.utc.localize(datetime(2019, 5, 3))) is line[1]
+    assert line.return_duty('0401') is None
+
+
+def test_duties_are_read_only(line, route):
+    with pytest.raises(AttributeError):
+        line.duties.append(duty_day(route, datetime(2019, 5, 9, 13)))
+    assert len(line.duties) == len(line._reports) == 3
+
+
+def test_changes_keep_the_index(route):
+    rnd = random.Random(16)
+    line = Line(month='MAY', year=2019)
+    for number in range(60):
+        line.append(duty_day(route, datetime(2019, 5, 1) + timedelta(hours=rnd.randrange(30 * 24)),
+                             hours=rnd.randrange(1, 30)))
+    for _ in range(200):
+        index = rnd.randrange(len(line.duties))
+        if rnd.random() < 0.3:
+            del line[index]
+            line.append(duty_day(route, datetime(2019, 5, 1) + timedelta(hours=rnd.randrange(30 * 24)),
+                                 hours=rnd.randrange(1, 30)))
+        else:
+            line[index] = duty_day(route, datetime(2019, 5, 1) + timedelta(hours=rnd.randrange(30 * 24)),
+                                   hours=rnd.randrange(1, 30))
+        rebuilt = Line(month='MAY', year=2019)
+        for duty in line:
+            rebuilt.append(duty)
+        assert (line._reports, line._releases, line._latest_releases) == \
+            (rebuilt._reports, rebuilt._releases, rebuilt._latest_releases)
+    del line[10:20]
+    assert len(line.duties) == 50 and line._reports == sorted(line._reports)
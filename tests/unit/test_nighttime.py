@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from models.creditator import Creditator
+from models.nighttime import DAY, local_minutes, night_minutes, early_morning_minutes, night_minutes_array, \
+    early_morning_minutes_array
+from models.scheduleclasses import Airport, Route, EpochItinerary, Flight
+
+
+def legacy_night_time(begin: int, end: int) -> int:
+    """Creditator.calculate_night_time as it was, on times of day, for legs crossing midnight at most once"""
+    def overlapping(a, b):
+        return max(0, min(a[1], b[1]) - max(a[0], b[0]))
+    if begin > end:
+        return overlapping([22 * 60, DAY], [begin, DAY]) + overlapping([0, 5 * 60], [0, end])
+    return overlapping([0, 5 * 60], [begin, end]) + overlapping([22 * 60, DAY], [begin, end])
+
+
+def legacy_early_morning(begin: int, end: int) -> bool:
+    return (59 < begin < 4 * 60 + 59) or (59 < end < 4 * 60 + 59)
+
+
+def minute_by_minute(begin: int, end: int, window_begin: int, window_end: int) -> int:
+    if window_begin < window_end:
+        return sum(window_begin <= minute % DAY < window_end for minute in range(begin, end))
+    return sum(not (window_end <= minute % DAY < window_begin) for minute in range(begin, end))
+
+
+def test_same_as_legacy_within_a_single_midnight():
+    # Any leg under 19 hours crosses midnight once at most
+    for begin in range(DAY, 2 * DAY, 5):
+        for duration in range(0, 19 * 60, 5):
+            end = begin + duration
+            assert night_minutes(begin, end) == legacy_night_time(begin % DAY, end % DAY), (begin, end)
+            if duration and legacy_early_morning(begin % DAY, end % DAY):
+                assert early_morning_minutes(begin, end) > 0
+
+
+def test_early_morning_classification_is_legacy():
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'))
+    route = Route(name='0002', origin=mex, destination=mex, route_id=None)
+    day = datetime(2019, 5, 1, tzinfo=pytz.utc)
+    for begin in range(0, DAY, 15):
+        for duration in range(0, 19 * 60, 15):
+            flight = Flight(route=route, scheduled_itinerary=EpochItinerary.from_timedelta(
+                day + timedelta(minutes=begin), timedelta(minutes=duration)))
+            assert Creditator.has_early_morning_time(flight) == \
+                legacy_early_morning(begin, (begin + duration) % DAY), (begin, duration)
+
+
+def test_multi_day_and_long_haul_legs():
+    rnd = random.Random(25)
+    begins = [rnd.randrange(-2 * DAY, 400 * DAY) for _ in range(400)]
+    ends = [begin + rnd.randrange(0, 3 * DAY) for begin in begins]
+    for begin, end in zip(begins, ends):
+        assert night_minutes(begin, end) == minute_by_minute(begin, end, 22 * 60, 5 * 60)
+        assert early_morning_minutes(begin, end) == minute_by_minute(begin, end, 59, 4 * 60 + 59)
+    assert night_minutes_array(begins, ends).tolist() == [night_minutes(*leg) for leg in zip(begins, ends)]
+    assert early_morning_minutes_array(np.array(begins), np.array(ends)).tolist() == \
+        [early_morning_minutes(*leg) for leg in zip(begins, ends)]
+    # A 26 hours leg leaving at 01:00 flies through two nights
+    assert night_minutes(DAY + 60, 2 * DAY + 3 * 60) == 4 * 60 + 2 * 60 + 3 * 60
+    # A duty spanning the whole early morning overlaps it
+    assert early_morning_minutes(23 * 60, DAY + 6 * 60) == 4 * 60
+
+
+def test_clocks_of_different_timezones():
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'))
+    mad = Airport(iata_code='MAD', timezone=pytz.timezone('Europe/Madrid'))
+    flight = Flight(route=Route(name='0001', origin=mex, destination=mad, route_id=None),
+                    scheduled_itinerary=EpochItinerary.from_timedelta(datetime(2019, 5, 4, 4, 30, tzinfo=pytz.utc),
+                                                                      timedelta(hours=10, minutes=30)))
+    flight.astimezone('local')
+    # 23:30 at MEX until 17:00 at MAD
+    assert (flight.begin.hour, flight.end.hour) == (23, 17)
+    assert local_minutes(flight.end) - local_minutes(flight.begin) == DAY - 6 * 60 - 30
+    assert Creditator.calculate_night_time(flight).minutes == 30 + 5 * 60
+    # Read backwards on both clocks, the leg is taken as crossing midnight
+    assert night_minutes(12 * 60, 8 * 60) == 2 * 60 + 5 * 60
@@ -0,0 +1,15 @@
+from datetime import date
+
+from AdminApp.objectbuilders import duty_day_dates
+
+
+def test_duty_day_dates():
+    trip_dict = {'dated': '01MAY2019',
+                 'duty_days': [{'day': '01', 'month': 'MAY'}, {'day': '03', 'month': 'MAY'}]}
+    assert list(duty_day_dates(trip_dict)) == [date(2019, 5, 1), date(2019, 5, 3)]
+
+
+def test_duty_day_dates_into_next_year():
+    trip_dict = {'dated': '31DEC2019',
+                 'duty_days': [{'day': '31', 'month': 'DEC'}, {'day': '01', 'month': 'JAN'}]}
+    assert list(duty_day_dates(trip_dict)) == [date(2019, 12, 31), date(2020, 1, 1)]
@@ -0,0 +1,65 @@
+from datetime import date, datetime, timedelta
+
+import pytz
+import pytest
+
+pytest.importorskip('pyarrow')
+import pyarrow.dataset as ds
+
+from AdminApp.parquetexport import export_trips, open_dataset
+from models.scheduleclasses import Airport, Route, Equipment, EpochItinerary, Flight, DutyDay, Trip
+
+
+def build_trip(number: str, dated: date, base: Airport, destination: Airport, position='SOB') -> Trip:
+    equipment = Equipment(airplane_code='7S8', cabin_members=4)
+    trip = Trip(number=number, dated=dated, crew_position=position, trip_base=base)
+    duty_day = DutyDay()
+    begin = pytz.utc.localize(datetime.combine(dated, datetime.min.time()) + timedelta(hours=14))
+    for leg, (origin, arrival) in enumerate(((base, destination), (destination, base))):
+        itinerary = EpochItinerary.from_timedelta(begin + timedelta(hours=3 * leg), timedelta(minutes=125))
+        duty_day.append(Flight(route=Route(name='05{}0'.format(leg), origin=origin, destination=arrival,
+                                           route_id=int(number) * 10 + leg),
+                               scheduled_itinerary=itinerary, equipment=equipment, event_id=int(number) * 10 + leg))
+    trip.append(duty_day)
+    return trip
+
+
+@pytest.fixture
+def trips():
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    gdl = Airport(iata_code='GDL', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    cun = Airport(iata_code='CUN', timezone=pytz.timezone('America/Cancun'), viaticum='low_cost')
+    return [build_trip('1001', date(2019, 4, 30), mex, cun),
+            build_trip('1002', date(2019, 5, 2), mex, cun),
+            build_trip('1003', date(2019, 5, 3), gdl, cun, position='JSB')]
+
+
+def test_partitioned_by_month_base_and_position(trips, tmp_path):
+    assert export_trips(trips, tmp_path, batch_size=2) == 3
+    assert sorted(path.relative_to(tmp_path / 'trips').parent.as_posix()
+                  for path in (tmp_path / 'trips').rglob('*.parquet')) == \
+        ['month=2019-04/base=MEX/position=SOB',
+         'month=2019-05/base=GDL/position=JSB',
+         'month=2019-05/base=MEX/position=SOB']
+
+
+def test_number_and_empty_trips(trips, tmp_path):
+    # Leading zeros are kept, trips without duty days are neither written nor counted
+    trips[0].number = '0101'
+    empty = Trip(number='0102', dated=date(2019, 5, 5), crew_position='SOB', trip_base=trips[0].trip_base)
+    assert export_trips(trips[:1] + [empty], tmp_path) == 1
+    assert [row['number'] for row in open_dataset(tmp_path, 'trips').to_table().to_pylist()] == ['0101']
+
+
+def test_credits_and_flights(trips, tmp_path):
+    export_trips(trips, tmp_path)
+    exported = open_dataset(tmp_path, 'trips').to_table(filter=ds.field('month') == '2019-05').to_pylist()
+    assert sorted(row['number'] for row in exported) == ['1002', '1003']
+    assert all(row['block'] == 250 and row['dh'] == 0 for row in exported)
+    assert {row['tafb'] for row in exported} == {trips[1].duration.minutes}
+
+    flights = open_dataset(tmp_path, 'flights').to_table(filter=ds.field('base') == 'GDL').to_pylist()
+    assert [(flight['flight_id'], flight['origin'], flight['scheduled_block']) for flight in flights] == \
+        [(10030, 'GDL', 125), (10031, 'CUN', 125)]
+    assert flights[0]['scheduled_begin'] == trips[2].duty_days[0].events[0].begin
+    assert open_dataset(tmp_path, 'duty_days').count_rows() == 3
@@ -0,0 +1,26 @@
+import csv
+import shutil
+from pathlib import Path
+
+from UserApp.payroll import run_payroll, payroll_row
+
+ROSTER = Path(__file__).parent.parent / 'fixtures' / 'roster_201905.txt'
+
+
+def test_payroll_row():
+    row = payroll_row(str(ROSTER))
+    assert (row['crew_member_id'], row['position'], row['base'], row['month']) == ('102711', 'SOB', 'MEX', '5')
+    assert row['block'] == '10:10'
+    assert row['dh'] == '05:45'
+
+
+def test_failed_rosters_are_left_out(tmp_path):
+    for name in ('201905-102711.txt', '201905-102712.txt'):
+        shutil.copy(str(ROSTER), str(tmp_path / name))
+    (tmp_path / '201905-999999.txt').write_text('not a roster')
+
+    rows, failures = run_payroll(tmp_path, max_workers=2)
+    assert [row['file'] for row in rows] == ['201905-102711.txt', '201905-102712.txt']
+    assert [file_name for file_name, error in failures] == ['201905-999999.txt']
+    with open(str(tmp_path / 'payroll.csv'), newline='') as fp:
+        assert list(csv.DictReader(fp)) == rows
@@ -0,0 +1,88 @@
+import gc
+
+import pytz
+
+from models.registry import Registry
+from models.scheduleclasses import Airport, Route
+
+
+class Value(object):
+    pass
+
+
+def test_hits_and_misses():
+    registry = Registry()
+    value = Value()
+    registry['key'] = value
+    assert registry.get('key') is value
+    assert registry.get('other') is None
+    registry.record_load(3)
+    assert registry.stats() == dict(size=1, hits=1, misses=1, loads=3, evictions=0)
+
+
+def test_bounded_registry_drops_least_recently_used():
+    registry = Registry(maxsize=2)
+    values = [Value() for _ in range(3)]
+    registry['a'] = values[0]
+    registry['b'] = values[1]
+    registry.get('a')
+    registry['c'] = values[2]
+    assert 'b' not in registry
+    assert registry.get('a') is values[0]
+    assert registry.evictions == 1
+
+
+def test_weak_registry_forgets_unused_values():
+    registry = Registry(weak=True)
+    value = Value()
+    registry['key'] = value
+    assert registry.get('key') is value
+    del value
+    gc.collect()
+    assert 'key' not in registry
+
+
+def test_weak_bounded_registry_keeps_values_in_use():
+    registry = Registry(weak=True, maxsize=1)
+    in_use = Value()
+    registry['a'] = in_use
+    registry['b'] = Value()
+    registry['c'] = Value()
+    gc.collect()
+    assert registry.get('a') is in_use
+    assert 'b' not in registry
+
+
+def test_route_keys_do_not_collide():
+    mexico_city = pytz.timezone('America/Mexico_City')
+    first = Route(name='12', origin=Airport('3AB', mexico_city), destination=Airport('CDE', mexico_city),
+                  route_id=9101)
+    second = Route(name='123', origin=Airport('ABC', mexico_city), destination=Airport('DE', mexico_city),
+                   route_id=9102)
+    assert first is not second
+    assert Route._routes.get(('12', '3AB', 'CDE')) is first
+    assert Route._routes_by_id.get(9102) is second
+
+
+def test_load_counts_a_single_miss(connections, query_results):
+    query_results.append([('ZMA', 'America', 'Mexico_City', 'low_cost')])
+    Airport._airports.reset_stats()
+    Airport.load_from_db('ZMA')
+    Airport.load_from_db('ZMA')
+    assert Airport._airports.stats()['misses'] == 1
+    assert Airport._airports.stats()['hits'] == 1
+    assert Airport._airports.stats()['loads'] == 1
+
+
+def test_route_initialise_bounds_routes():
+    mexico_city = pytz.timezone('America/Mexico_City')
+    origin, destination = Airport('ZNA', mexico_city), Airport('ZNB', mexico_city)
+    try:
+        Route.initialise(maxsize=1)
+        first = Route(name='0001', origin=origin, destination=destination, route_id=9111)
+        Route(name='0002', origin=origin, destination=destination, route_id=9112)
+        assert ('0001', 'ZNA', 'ZNB') not in Route._routes
+        # Still in use, so found again by route_id
+        assert Route(name='0001', origin=origin, destination=destination, route_id=9111) is first
+    finally:
+        Route.initialise()
@@ -0,0 +1,79 @@
+import io
+from datetime import date, datetime, timedelta
+
+import pytz
+import pytest
+
+from AdminApp.exceptions import SnapshotError
+from models.scheduleclasses import Airport, Route, Equipment, EpochItinerary, Flight, GroundDuty, DutyDay, Trip, \
+    Line, CrewMember
+from models.snapshot import SnapshotWriter, SnapshotReader, dump, load
+
+
+@pytest.fixture
+def trip():
+    mex = Airport(iata_code='MEX', timezone=pytz.timezone('America/Mexico_City'), viaticum='low_cost')
+    mad = Airport(iata_code='MAD', timezone=pytz.timezone('Europe/Madrid'), viaticum='high_cost')
+    equipment = Equipment(airplane_code='789', cabin_members=9)
+    trip = Trip(number='0001', dated=date(2019, 5, 1), crew_position='SOB', trip_base=mex)
+    for begin, origin, destination in ((datetime(2019, 5, 1, 23), mex, mad), (datetime(2019, 5, 3, 11), mad, mex)):
+        duty_day = DutyDay()
+        itinerary = EpochItinerary.from_timedelta(pytz.utc.localize(begin), timedelta(hours=10, minutes=5))
+        duty_day.append(Flight(route=Route(name='0001', origin=origin, destination=destination, route_id=None),
+                               scheduled_itinerary=itinerary, equipment=equipment, event_id=7))
+        trip.append(duty_day)
+    trip.duty_days[1].events[0].dh = True
+    trip.duty_days[1].events[0].actual_itinerary = EpochItinerary.from_timedelta(
+        pytz.utc.localize(datetime(2019, 5, 3, 11, 40)), timedelta(hours=10))
+    return trip
+
+
+def round_trip(*duties) -> list:
+    snapshot = io.BytesIO()
+    writer = SnapshotWriter(snapshot)
+    for duty in duties:
+        writer.write(duty)
+    return list(SnapshotReader(io.BytesIO(snapshot.getvalue())))
+
+
+def test_trip_round_trip(trip):
+    loaded, = round_trip(trip)
+    assert (loaded.number, loaded.dated, loaded.crew_position, loaded.trip_base) == \
+        (trip.number, trip.dated, trip.crew_position, trip.trip_base)
+    for flight, loaded_flight in zip(trip.get_event_list(), loaded.get_event_list()):
+        assert loaded_flight == flight
+        assert loaded_flight.actual_itinerary == flight.actual_itinerary
+        assert (loaded_flight.dh, loaded_flight.event_id, loaded_flight.equipment) == \
+            (flight.dh, flight.event_id, flight.equipment)
+    assert loaded.rests == trip.rests
+    assert loaded.duration == trip.duration
+
+
+def test_trip_without_base(trip):
+    trip.trip_base = None
+    loaded, = round_trip(trip)
+    assert loaded.trip_base is None
+    assert [flight.event_id for flight in loaded.get_event_list()] == [7, 7]
+
+
+def test_line_round_trip(trip, tmp_path):
+    mex = trip.trip_base
+    line = Line(month='MAY', year='2019', crew_member=CrewMember(crew_member_id='123456', name='XICO', pos='SOB',
+                                                                 base=mex, seniority=87))
+    line.append(trip)
+    reserve = GroundDuty(route=Route(name='R1', origin=mex, destination=mex, route_id=None), position='SOB',
+                         scheduled_itinerary=EpochItinerary.from_timedelta(
+                             pytz.utc.localize(datetime(2019, 5, 6, 12)), timedelta(hours=8)))
+    line.append(reserve)
+    assert dump([line, trip], tmp_path / 'may.snapshot') == 2
+
+    loaded_line, loaded_trip = load(tmp_path / 'may.snapshot')
+    assert loaded_line.crew_member.seniority == 87
+    assert [duty.report for duty in loaded_line] == [trip.report, reserve.report]
+    assert loaded_line[1].position == 'SOB'
+    assert loaded_trip.number == trip.number
+
+
+def test_unknown_file():
+    with pytest.raises(SnapshotError):
+        SnapshotReader(io.BytesIO(b'not a snapshot'))
@@ -0,0 +1,55 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from AdminApp.exceptions import UnstoredTrip
+from models.scheduleclasses import Trip, TRIP_GRAPH_BY_KEYS
+
+
+def graph_row(number, dated, report, rel, dh, flight_id, route_id, begin, name, origin, destination):
+    """A row as returned by TRIP_GRAPH_SELECT, airports in America/Mexico_City"""
+    return (number, dated, 'SOB', 'MEX', 'America', 'Mexico_City', 'low_cost',
+            report, rel, dh,
+            flight_id, 'AM', route_id, begin, timedelta(hours=2), '7S8', None, None,
+            name, origin, destination,
+            'America', 'Mexico_City', 'low_cost', 'America', 'Mexico_City', 'low_cost',
+            9)
+
+
+def test_from_graph_rows():
+    dated = date(2019, 5, 1)
+    trips_data = [
+        graph_row(123, dated, datetime(2019, 5, 1, 12), None, False, 1, 9001, datetime(2019, 5, 1, 13), '0100', 'MEX',
+                  'GDL'),
+        graph_row(123, dated, None, datetime(2019, 5, 1, 18), True, 2, 9002, datetime(2019, 5, 1, 16), '0101', 'GDL',
+                  'MEX'),
+        graph_row(124, dated, datetime(2019, 5, 1, 6), datetime(2019, 5, 1, 9), False, 3, 9001,
+                  datetime(2019, 5, 1, 7), '0100', 'MEX', 'GDL'),
+        graph_row(125, dated, None, None, None, None, None, None, None, None, None),
+    ]
+    first, second, third = Trip.from_graph_rows(trips_data)
+
+    assert (first.number, first.dated, first.trip_base.iata_code) == ('0123', dated, 'MEX')
+    assert len(first.duty_days) == 1
+    assert [flight.event_id for flight in first.duty_days[0].events] == [1, 2]
+    assert [flight.dh for flight in first.duty_days[0].events] == [False, True]
+    assert first.duty_days[0].events[1].name == 'DH0101'
+    # Flyweights are shared between trips
+    assert second.duty_days[0].events[0].route is first.duty_days[0].events[0].route
+    assert third.number == '0125'
+    assert third.duty_days == []
+
+
+def test_load_by_id_async(async_connections, query_results):
+    dated = date(2019, 5, 1)
+    query_results.append([graph_row(126, dated, datetime(2019, 5, 1, 12), datetime(2019, 5, 1, 15), False, 4, 9001,
+                                    datetime(2019, 5, 1, 13), '0100', 'MEX', 'GDL')])
+    trip = asyncio.run(Trip.load_by_id_async('0126', dated))
+
+    assert (trip.number, trip.dated) == ('0126', dated)
+    assert [flight.event_id for flight in trip.duty_days[0].events] == [4]
+    assert async_connections[0].statements[0] == TRIP_GRAPH_BY_KEYS
+    assert async_connections[0].arguments[0] == ([126], [dated])
+    with pytest.raises(UnstoredTrip):
+        asyncio.run(Trip.load_by_id_async('0127', dated))